@@ -7,208 +7,48 @@
 
 import streamlit as st
 import pandas as pd
-import random
-from io import BytesIO
+import numpy as np
+from types import SimpleNamespace
 from typing import Dict, List, Tuple
-import calendar, html
-from datetime import date
-
-# Optional deps
-try:
-    import xlsxwriter
-    XLSX_AVAILABLE = True
-except Exception:
-    XLSX_AVAILABLE = False
-
-try:
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import A4, landscape
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    REPORTLAB_AVAILABLE = True
-except Exception:
-    REPORTLAB_AVAILABLE = False
+import calendar, html, inspect, math, hashlib, json, logging, os, sqlite3, time
+
+from rota.engine import (AREAS, SHIFTS, LETTER_TO_AREA, SHIFT_COLS_ORDER, ORTOOLS_AVAILABLE,
+                         DEFAULT_COV, DEFAULT_GROUP_MAP, GROUP_CAP, FIXED_SHIFT, DEFAULT_MAX_NIGHT, DEFAULT_MAX_WEEK,
+                         DEFAULT_FACILITY, frame_hash, RotaConfig, RotaState, CoverageStats, sheet_day_doctor)
+from rota import engine, render, profiling
+from rota.jobs import Job
+from rota.export import XLSX_AVAILABLE, REPORTLAB_AVAILABLE, export_excel, export_pdf, horizon_excel
+from rota.i18n import I18N, AREA_LABEL, SHIFT_LABEL
+from rota.store import RotaStore
+from rota.roster import OPENPYXL_AVAILABLE, MAX_OFFDAYS, import_roster, roster_frame
+from rota.metrics import FairnessStats
+from rota.audit import audit_rota, audit_summary
+from rota.compact import CompactRota
+from rota.session import doc_key, evict_doctor, sweep, drop_widgets, footprint
 
 st.set_page_config(page_title="ED Rota Pro", layout="wide")
 
-# ================= i18n =================
-I18N = {
-    "ar": {
-        "general": "عام",
-        "language": "اللغة",
-        "arabic": "العربية",
-        "english": "English",
-        "year": "السنة",
-        "month": "الشهر",
-        "days": "عدد الأيام",
-        "rules": "القواعد",
-        "coverage": "التغطية لكل منطقة/وردية",
-        "group_caps": "سقوف المجموعات الشهرية (افتراضي للمضافين الجدد)",
-        "colors": "الألوان",
-        "area_colors": "ألوان المناطق",
-        "templates": "قالب ألوان",
-        "calm": "هادئة",
-        "contrast": "عالية التباين",
-        "apply_template": "تطبيق القالب",
-        "yellow": "أصفر",
-        "green": "أخضر",
-        "blue": "أزرق",
-        "red": "أحمر",
-        "reset_colors": "استعادة الألوان الافتراضية",
-        "run_tab": "توليد",
-        "run": "توليد عشوائي وفق القيود",
-        "balance": "موازنة العبء وملء النواقص",
-        "balanced_ok": "تمت موازنة النواقص قدر الإمكان.",
-        "view_mode": "طريقة العرض",
-        "view_day_doctor": "يوم × طبيب",
-        "view_doctor_day": "طبيب × يوم",
-        "view_day_shift": "يوم × شفت",
-        "cards_view": "عرض الشبكة (بطاقات)",
-        "gaps": "النواقص",
-        "remain": "السعة المتبقية",
-        "export": "تصدير",
-        "download_xlsx": "تنزيل Excel (منسّق)",
-        "download_pdf": "تنزيل PDF (مطبوع)",
-        "pdf_na": "تعذّر إنشاء PDF لعدم توفر مكتبة ReportLab على الخادم.",
-        "doctors_tab": "الأطباء وتفضيلاتهم",
-        "add_list": "إضافة أطباء (سطر لكل اسم)",
-        "append": "إضافة",
-        "remove_doc": "حذف طبيب",
-        "remove": "حذف",
-        "edit_one": "تعديل طبيب",
-        "doctor": "الطبيب",
-        "group": "المجموعة",
-        "cap": "السقف الشهري (عدد الشفتات)",
-        "allowed_shifts": "الفترات المسموح بها",
-        "offdays": "أيام الإجازة (حتى 3 أيام)",
-        "rules_global": "قواعد عامة",
-        "min_off": "أقل عدد أيام إجازة/شهر",
-        "max_consec": "أقصى أيام عمل متتالية",
-        "min_rest": "أقل ساعات راحة بين الشفتات",
-        "adv_rules": "قيود متقدمة",
-        "max_night": "أقصى شفتات ليلية/شهر (للطبيب)",
-        "max_week": "أقصى شفتات/أسبوع (للطبيب)",
-        "holidays": "تواريخ العطل (أيام الشهر، مفصولة بفواصل)",
-        "avoid_holidays": "يفضّل عدم العمل في العطل",
-        "day": "اليوم",
-        "need_generate": "شغّل التوليد أولاً.",
-        "weekday": ["الاثنين","الثلاثاء","الأربعاء","الخميس","الجمعة","السبت","الأحد"],
-        "by_shift_grid": "شبكة يوم × شفت (بطاقات = أسماء الأطباء)",
-        "seed": "بذرة العشوائية (اختياري)",
-        "no_solution_warn": "تم التوليد العشوائي، قد تبقى نواقص إذا لم تتوافر أهلية كافية.",
-        "inline_edit": "التحرير داخل الجدول (Doctor×Day)",
-        "inline_hint": "حرّر الخلايا مباشرة؛ اتركها فارغة للراحة أو اختر كودًا (F1..C3).",
-        "apply_changes": "تطبيق التغييرات",
-        "validate_constraints": "التحقق من القيود قبل التطبيق",
-        "force_override": "تجاوز القيود (لا يُنصح)",
-        "invalid_edits": "تغييرات مرفوضة (مخالفة للقيود)",
-        "applied_ok": "تم تطبيق التغييرات.",
-        "daily_table": "جدول المناطق اليومي (قابل للسحب)",
-        "assigned": "مسند",
-        "required": "المطلوب",
-        "ok": "مكتمل",
-        "short": "نقص",
-        "off_calendar": "اختر أيام الإجازة لهذا الطبيب (حد أقصى 3)",
-        "clear_off": "مسح الإجازات",
-    },
-    "en": {
-        "general": "General",
-        "language": "Language",
-        "arabic": "Arabic",
-        "english": "English",
-        "year": "Year",
-        "month": "Month",
-        "days": "Days",
-        "rules": "Rules",
-        "coverage": "Coverage per area/shift",
-        "group_caps": "Group monthly caps (defaults for new doctors)",
-        "colors": "Colors",
-        "area_colors": "Area colors",
-        "templates": "Color template",
-        "calm": "Calm",
-        "contrast": "High Contrast",
-        "apply_template": "Apply template",
-        "yellow": "Yellow",
-        "green": "Green",
-        "blue": "Blue",
-        "red": "Red",
-        "reset_colors": "Reset to defaults",
-        "run_tab": "Generate",
-        "run": "Randomize (respect constraints)",
-        "balance": "Balance workload & fill gaps",
-        "balanced_ok": "Balancing complete where possible.",
-        "view_mode": "View mode",
-        "view_day_doctor": "Day × Doctor",
-        "view_doctor_day": "Doctor × Day",
-        "view_day_shift": "Day × Shift",
-        "cards_view": "Cards grid",
-        "gaps": "Coverage gaps",
-        "remain": "Remaining capacity",
-        "export": "Export",
-        "download_xlsx": "Download Excel (styled)",
-        "download_pdf": "Download PDF (print)",
-        "pdf_na": "ReportLab not available on server; PDF export disabled.",
-        "doctors_tab": "Doctors & Preferences",
-        "add_list": "Add doctors (one per line)",
-        "append": "Append",
-        "remove_doc": "Remove doctor",
-        "remove": "Remove",
-        "edit_one": "Edit one doctor",
-        "doctor": "Doctor",
-        "group": "Group",
-        "cap": "Monthly cap (shifts)",
-        "allowed_shifts": "Allowed shifts",
-        "offdays": "Off-days (up to 3)",
-        "rules_global": "Global rules",
-        "min_off": "Min off-days / month",
-        "max_consec": "Max consecutive duty days",
-        "min_rest": "Min rest hours between shifts",
-        "adv_rules": "Advanced constraints",
-        "max_night": "Max night shifts / month (per doctor)",
-        "max_week": "Max shifts / week (per doctor)",
-        "holidays": "Holiday dates (month days, comma-separated)",
-        "avoid_holidays": "Prefer off on holidays",
-        "day": "Day",
-        "need_generate": "Run the generator first.",
-        "weekday": ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"],
-        "by_shift_grid": "Day × Shift grid (cards = doctor names)",
-        "seed": "Random seed (optional)",
-        "no_solution_warn": "Randomized; gaps may remain if eligibility is insufficient.",
-        "inline_edit": "Inline edit (Doctor×Day)",
-        "inline_hint": "Edit cells directly; leave blank for off, or pick a code (F1..C3).",
-        "apply_changes": "Apply changes",
-        "validate_constraints": "Validate constraints before applying",
-        "force_override": "Force override (not recommended)",
-        "invalid_edits": "Rejected edits (constraint violations)",
-        "applied_ok": "Changes applied.",
-        "daily_table": "Daily area table (scrollable)",
-        "assigned": "Assigned",
-        "required": "Required",
-        "ok": "OK",
-        "short": "Short",
-        "off_calendar": "Pick off-days for this doctor (max 3)",
-        "clear_off": "Clear off-days",
-    }
-}
-def L(k): return I18N[st.session_state.get("lang","en")][k]
+# ===== Profiling =====
+# one Recorder per rerun (reported at the bottom of the script); the sidebar debug toggle
+# adds a cProfile capture and the report panel. ROTA_PROFILE_LOG=path appends every rerun
+# there as a JSON line; the "rota.profile" logger gets a one-line summary at INFO.
+PROFILE_LOG = os.environ.get("ROTA_PROFILE_LOG", "")
+PROFILE_HISTORY = 50  # reruns kept in the session for the debug panel
+profiling.begin("rerun", cprofile=bool(st.session_state.get("debug_profile", False)))
+
+def report_profile(rec: profiling.Recorder) -> list:
+    """Log a finished Recorder (a rerun or a background job) and add it to the session history."""
+    logging.getLogger("rota.profile").info(rec.log_line())
+    if PROFILE_LOG:
+        try:
+            with open(PROFILE_LOG, "a", encoding="utf-8") as fh: fh.write(rec.to_json() + "\n")
+        except OSError:
+            pass
+    hist = st.session_state.setdefault("_profile_history", [])
+    hist.append(rec.as_dict()); del hist[:-PROFILE_HISTORY]
+    return hist
 
-# ===== Static labels =====
-AREAS = ["fast", "resp_triage", "acute", "resus"]
-SHIFTS = ["morning", "evening", "night"]
-AREA_LABEL = {
-    "en": {"fast":"Fast track","resp_triage":"Respiratory triage","acute":"Acute care unit","resus":"Resuscitation area"},
-    "ar": {"fast":"المسار السريع","resp_triage":"فرز تنفسي","acute":"العناية الحادة","resus":"الإنعاش"}
-}
-SHIFT_LABEL = {
-    "en": {"morning":"Morning 07:00–15:00","evening":"Evening 15:00–23:00","night":"Night 23:00–07:00"},
-    "ar": {"morning":"صباح 07:00–15:00","evening":"مساء 15:00–23:00","night":"ليل 23:00–07:00"}
-}
-AREA_CODE = {"fast":"F","resp_triage":"R","acute":"A","resus":"C"}
-SHIFT_CODE = {"morning":"1","evening":"2","night":"3"}
-DIGIT_TO_SHIFT = {"1":"morning","2":"evening","3":"night"}
-LETTER_TO_AREA = {"F":"fast","R":"resp_triage","A":"acute","C":"resus"}
-SHIFT_COLS_ORDER = ["F1","F2","F3","R1","R2","R3","A1","A2","A3","C1","C2","C3"]
-def code_for(area,shift): return f"{AREA_CODE[area]}{SHIFT_CODE[shift]}"
+def L(k): return I18N[st.session_state.get("lang","en")][k]
 
 # ===== Colors & Templates =====
 PALETTE = {"yellow":"#FFF7C2","green":"#E7F7E9","blue":"#E6F3FF","red":"#FDEAEA"}
@@ -216,6 +56,44 @@ DEFAULT_AREA_COLOR_NAMES = {"fast":"yellow","resp_triage":"green","acute":"blue"
 TEMPLATES = {"calm": {"fast":"yellow","resp_triage":"green","acute":"blue","resus":"red"},
              "contrast": {"fast":"red","resp_triage":"blue","acute":"yellow","resus":"green"}}
 
+# ===== Persistence =====
+STORE_PATH = os.environ.get("ROTA_DB", "rota_store.sqlite")
+CONFIG_FIELDS = ("year","month","days","cov","doctors","group_map","cap_map","allowed_shifts","offdays",
+                 "max_night_map","max_week_map","avoid_holidays_map","max_hours_map","holidays","min_off","max_consec",
+                 "min_rest","max_hours_week")
+# widgets that mirror config fields; dropped on restore so they re-read the loaded values
+CONFIG_WIDGETS = ("year_input","month_input","days_slider","min_off_input","max_consec_input","min_rest_input",
+                  "max_hours_week_input","hol_txt_rules")
+CONFIG_WIDGET_PREFIXES = ("cov_",)  # per-doctor widgets live under rota.session.doc_key
+
+@st.cache_resource(show_spinner=False)
+def _open_store(path: str) -> RotaStore:
+    return RotaStore(path)
+
+def get_store(create: bool = False):
+    """The shared RotaStore, or None if there is no database yet (and create is False) or it cannot be opened."""
+    if not create and not os.path.exists(STORE_PATH): return None
+    try:
+        return _open_store(STORE_PATH)
+    except sqlite3.Error:
+        return None
+
+def _drop_config_widgets():
+    ss = st.session_state
+    for k in list(ss.keys()):
+        if k not in CONFIG_FIELDS and (k in CONFIG_WIDGETS or k.startswith(CONFIG_WIDGET_PREFIXES)): del ss[k]
+    drop_widgets(ss)
+
+def restore_session(cfg: RotaConfig, df: pd.DataFrame) -> bool:
+    ss = st.session_state
+    # the editor widgets cover the built-in department only; custom facilities are CLI/JSON territory
+    if cfg.facility != DEFAULT_FACILITY: return False
+    for f in CONFIG_FIELDS: ss[f] = getattr(cfg, f)
+    _drop_config_widgets()
+    ss.result_df = df
+    ss.gaps, ss.remain = engine.rota_tables(cfg, df)
+    return True
+
 # ===== State =====
 def _init_session():
     ss = st.session_state
@@ -223,39 +101,12 @@ def _init_session():
     if "year" not in ss: ss.year = 2025
     if "month" not in ss: ss.month = 9
     if "days" not in ss: ss.days = 30
-    if "cov" not in ss: ss.cov = {
-        ("fast","morning"):2, ("fast","evening"):2, ("fast","night"):2,
-        ("resp_triage","morning"):1, ("resp_triage","evening"):1, ("resp_triage","night"):1,
-        ("acute","morning"):3, ("acute","evening"):4, ("acute","night"):3,
-        ("resus","morning"):3, ("resus","evening"):3, ("resus","night"):3,
-    }
-    if "group_map" not in ss:
-        ss.group_map = {
-            # seniors
-            "Dr. Abdullah Alnughamishi":"senior","Dr. Samar Alruwaysan":"senior","Dr. Ali Alismail":"senior",
-            "Dr. Hussain Alturifi":"senior","Dr. Abdullah Alkhalifah":"senior","Dr. Rayan Alaboodi":"senior",
-            "Dr. Jamal Almarshadi":"senior","Dr. Emad Abdulkarim":"senior","Dr. Marwan Alrayhan":"senior",
-            "Dr. Ahmed Almohimeed":"senior","Dr. Abdullah Alsindi":"senior","Dr. Yousef Alharbi":"senior",
-            # g1
-            "Dr.Sharif":"g1","Dr.Rashif":"g1","Dr.Jobi":"g1","Dr.Lucky":"g1",
-            # g2
-            "Dr.Bashir":"g2","Dr. AHMED MAMDOH":"g2","Dr. HAZEM ATTYAH":"g2","Dr. OMAR ALSHAMEKH":"g2","Dr. AYMEN MKHTAR":"g2",
-            # g3
-            "Dr.nashwa":"g3","Dr. Abdulaziz bin marahad":"g3","Dr. Mohmmed almutiri":"g3","Dr. Lulwah":"g3","Dr.Ibrahim":"g3",
-            "Dr. Kaldon":"g3","Dr. Osama":"g3","Dr. Salman":"g3","Dr. Hajer":"g3","Dr. Randa":"g3","Dr. Esa":"g3","Dr. Fahad":"g3",
-            "Dr. Abdulrahman1":"g3","Dr. Abdulrahman2":"g3","Dr. Mohammed alrashid":"g3",
-            # g4
-            "Dr.Lena":"g4","Dr.Essra":"g4","Dr.fahimah":"g4","Dr.mohammed bajaber":"g4","Dr.Sulaiman Abker":"g4",
-            # g5
-            "Dr.Shouq":"g5","Dr.Rayan":"g5","Dr abdullah aljalajl":"g5","Dr. AMIN MOUSA":"g5","Dr. AHMED ALFADLY":"g5",
-        }
+    if "cov" not in ss: ss.cov = dict(DEFAULT_COV)
+    if "group_caps" not in ss: ss.group_caps = dict(GROUP_CAP)  # default cap of a new doctor, per group
+    if "group_map" not in ss: ss.group_map = dict(DEFAULT_GROUP_MAP)
     if "doctors" not in ss: ss.doctors = list(ss.group_map.keys())
-    if "cap_map" not in ss:
-        GROUP_CAP = {"senior":16,"g1":18,"g2":18,"g3":18,"g4":18,"g5":18}
-        ss.cap_map = {n: GROUP_CAP[ss.group_map[n]] for n in ss.doctors}
+    if "cap_map" not in ss: ss.cap_map = {n: GROUP_CAP[ss.group_map[n]] for n in ss.doctors}
     if "allowed_shifts" not in ss:
-        FIXED_SHIFT = {"Dr.Sharif":{"night"}, "Dr.Rashif":{"morning"}, "Dr.Jobi":{"evening"},
-                       "Dr.Bashir":{"morning"}, "Dr.nashwa":{"morning"}, "Dr.Lena":{"morning"}}
         base = {n:set(SHIFTS) for n in ss.doctors}
         for n, only in FIXED_SHIFT.items():
             if n in base: base[n] = set(only)
@@ -264,10 +115,13 @@ def _init_session():
     if "min_off" not in ss: ss.min_off = 12
     if "max_consec" not in ss: ss.max_consec = 6
     if "min_rest" not in ss: ss.min_rest = 16
-    if "max_night_map" not in ss: ss.max_night_map = {n: 6 for n in ss.doctors}
-    if "max_week_map" not in ss: ss.max_week_map = {n: 5 for n in ss.doctors}
+    if "max_hours_week" not in ss: ss.max_hours_week = 0
+    if "max_night_map" not in ss: ss.max_night_map = {n: DEFAULT_MAX_NIGHT for n in ss.doctors}
+    if "max_week_map" not in ss: ss.max_week_map = {n: DEFAULT_MAX_WEEK for n in ss.doctors}
     if "avoid_holidays_map" not in ss: ss.avoid_holidays_map = {n: False for n in ss.doctors}
+    if "max_hours_map" not in ss: ss.max_hours_map = {n: 0 for n in ss.doctors}
     if "holidays" not in ss: ss.holidays = set()
+    if "absences" not in ss: ss.absences = {}  # {(year, month): {doctor: days}} recorded by repairs
     if "result_df" not in ss: ss.result_df = pd.DataFrame()
     if "gaps" not in ss: ss.gaps = pd.DataFrame()
     if "remain" not in ss: ss.remain = pd.DataFrame()
@@ -276,7 +130,8 @@ def _init_session():
         ss.area_color_names = DEFAULT_AREA_COLOR_NAMES.copy()
     if "area_colors" not in ss:
         ss.area_colors = {a: PALETTE[ss.area_color_names[a]] for a in AREAS}
-_init_session()
+with profiling.phase("init"):
+    _init_session()
 
 def LBL_AREA(a): return AREA_LABEL[st.session_state.lang][a]
 def LBL_SHIFT(s): return SHIFT_LABEL[st.session_state.lang][s]
@@ -287,238 +142,287 @@ def weekday_name(y:int, m:int, d:int) -> str:
     wd = calendar.weekday(y, m, d)
     return I18N[st.session_state.lang]["weekday"][wd]
 
-def is_weekend(y:int, m:int, d:int) -> bool:
-    wd = calendar.weekday(y, m, d)  # Mon=0
-    return wd in (4,5)  # Fri, Sat
-
-def iso_week(y:int, m:int, d:int) -> int:
-    return date(y,m,d).isocalendar()[1]
-
-def rest_ok(prev_shift: str, cur_shift: str, min_rest: int) -> bool:
-    start_cur = {"morning":7,"evening":15,"night":23}[cur_shift]
-    end_prev  = {"morning":15,"evening":23,"night":7}[prev_shift]
-    rest = start_cur - end_prev
-    if rest < 0: rest += 24
-    return rest >= int(min_rest)
-
-def constraints_ok(name:str, day:int, area:str, shift:str,
-                   assigned_map:Dict[Tuple[str,int],Tuple[str,str]],
-                   counts:Dict[str,int]) -> Tuple[bool,str]:
+def config_from_session(absences: bool = True, state=None) -> RotaConfig:
+    """Snapshot of the session inputs as the engine's explicit config object.
+
+    Repair absences are merged into the off-days unless absences=False (used when
+    the config is written back to the session). `state` replaces st.session_state,
+    e.g. with live_config_state() in code that runs off the script thread."""
+    ss = st.session_state if state is None else state
+    offdays = dict(ss.offdays)
+    for n, days in (ss.absences.get((int(ss.year), int(ss.month)), {}) if absences else {}).items():
+        offdays[n] = set(offdays.get(n, set())) | days
+    return RotaConfig(year=int(ss.year), month=int(ss.month), days=int(ss.days), cov=dict(ss.cov),
+                      doctors=list(ss.doctors), group_map=dict(ss.group_map), cap_map=dict(ss.cap_map),
+                      allowed_shifts=dict(ss.allowed_shifts), offdays=offdays,
+                      max_night_map=dict(ss.max_night_map), max_week_map=dict(ss.max_week_map),
+                      avoid_holidays_map=dict(ss.avoid_holidays_map), max_hours_map=dict(ss.max_hours_map),
+                      holidays=set(ss.holidays), min_off=int(ss.min_off), max_consec=int(ss.max_consec),
+                      min_rest=int(ss.min_rest), max_hours_week=int(ss.max_hours_week))
+
+def eligibility_matrix(cfg: RotaConfig = None) -> np.ndarray:
+    """engine.eligibility_matrix, rebuilt only when doctors, groups, off-days, holidays or
+    allowed shifts change; otherwise the tensor cached in the session is returned."""
+    ss = st.session_state
+    cfg = cfg or config_from_session()
+    sig = cfg.eligibility_signature()
+    cached = ss.get("_elig_cache")
+    if cached is not None and cached[0] == sig: return cached[1]
+    elig = engine.eligibility_matrix(cfg)
+    ss["_elig_cache"] = (sig, elig)
+    return elig
+
+def live_config_state() -> SimpleNamespace:
+    """The session's own CONFIG_FIELDS objects, for config_from_session(state=...) at download time.
+
+    The maps are shared, not copied, so edits made by a fragment since the last full
+    run are seen; the scalars are fixed, but changing one reruns the whole page."""
     ss = st.session_state
-    if day in ss.offdays.get(name,set()): return False, "off-day"
-    if ss.avoid_holidays_map.get(name, False) and (day in ss.holidays): return False, "holiday preference"
-
-    GROUP_AREAS = {
-        "senior":{"resus"},
-        "g1":{"resp_triage"},
-        "g2":{"acute"},
-        "g3":{"fast","acute"},
-        "g4":{"resp_triage","fast","acute"},
-        "g5":{"acute","resus"},
-    }
-    grp = ss.group_map[name]
-    if area not in GROUP_AREAS[grp]: return False, "area not allowed"
-    if shift not in ss.allowed_shifts.get(name,set(SHIFTS)): return False, "shift not allowed"
-    if (name, day) in assigned_map: return False, "already assigned"
-
-    cap = int(ss.cap_map[name]); taken = counts.get(name,0)
-    if taken >= cap: return False, "cap reached"
-    if taken >= (ss.days - ss.min_off): return False, "min off-days"
-
-    if shift == "night":
-        night_taken = 0
-        for (n,d),(_,sh) in assigned_map.items():
-            if n==name and sh=="night": night_taken += 1
-        if night_taken >= int(ss.max_night_map.get(name, 999)):
-            return False, "max night reached"
-
-    week = iso_week(int(ss.year), int(ss.month), int(day))
-    w_count = 0
-    for (n,d),(_,sh) in assigned_map.items():
-        if n==name and iso_week(int(ss.year), int(ss.month), int(d)) == week:
-            w_count += 1
-    if w_count >= int(ss.max_week_map.get(name, 999)): return False, "weekly limit"
-
-    if ss.min_rest > 0:
-        prev = assigned_map.get((name, day-1))
-        if prev:
-            _, p_shift = prev
-            if not rest_ok(p_shift, shift, ss.min_rest):
-                return False, "rest (prev→today)"
-        nxt = assigned_map.get((name, day+1))
-        if nxt:
-            _, n_shift = nxt
-            end_cur  = {"morning":15,"evening":23,"night":7}[shift]
-            start_nx = {"morning":7,"evening":15,"night":23}[n_shift]
-            rest2 = start_nx - end_cur
-            if rest2 < 0: rest2 += 24
-            if rest2 < int(ss.min_rest): return False, "rest (today→next)"
-
-    streak = 0; t = day-1
-    while t>=1 and ((name,t) in assigned_map):
-        streak += 1; t -= 1
-    if streak+1 > int(ss.max_consec): return False, "max consecutive days"
-    return True, "ok"
+    return SimpleNamespace(**{f: ss[f] for f in CONFIG_FIELDS})
 
+@profiling.timed()
 def recompute_tables(df: pd.DataFrame):
-    days = st.session_state.days
-    cnt = {(t,s,a):0 for t in range(days) for s,_ in enumerate(SHIFTS) for a,_ in enumerate(AREAS)}
-    for r in df.itertuples(index=False):
-        t = int(r.day)-1; s = SHIFTS.index(r.shift); a = AREAS.index(r.area)
-        cnt[(t,s,a)] += 1
-    gap_rows=[]
-    for t in range(days):
-        for s, sh in enumerate(SHIFTS):
-            for a, ar in enumerate(AREAS):
-                req = int(st.session_state.cov[(ar,sh)])
-                done = cnt[(t,s,a)]
-                if req-done>0:
-                    gap_rows.append({"day":t+1,"shift":sh,"area":ar,"abbr":code_for(ar,sh),
-                                     "required":req,"assigned":done,"short_by":req-done})
-    gaps = pd.DataFrame(gap_rows)
-    tot = df.groupby("doctor").size().to_dict()
-    rem = [{"doctor":n,"assigned":tot.get(n,0),"cap":int(st.session_state.cap_map[n]),
-            "remaining":max(0,int(st.session_state.cap_map[n])-tot.get(n,0))}
-           for n in st.session_state.doctors]
-    remain = pd.DataFrame(rem).sort_values(["remaining","doctor"], ascending=[False,True])
-    st.session_state.gaps = gaps
-    st.session_state.remain = remain
+    ss = st.session_state
+    ss.gaps = current_coverage(df).gaps()
+    ss.remain = engine.remaining_table(config_from_session(), df)
 
-def random_generate():
+def _seed_from_input():
     try:
-        if st.session_state.get("seed_input_txt",""):
-            random.seed(int(st.session_state["seed_input_txt"]))
-        else:
-            random.seed()
+        txt = st.session_state.get("seed_input_txt","")
+        return int(txt) if txt else None
     except:
-        random.seed()
-
-    days = st.session_state.days
-    docs = st.session_state.doctors
-    slots = []
-    for day in range(1, days+1):
-        for area in AREAS:
-            for shift in SHIFTS:
-                req = int(st.session_state.cov[(area, shift)])
-                slots += [(day, area, shift)]*req
-    random.shuffle(slots)
-
-    assigned_map: Dict[Tuple[str,int], Tuple[str,str]] = {}
-    counts = {n:0 for n in docs}
-
-    for (day, area, shift) in slots:
-        candidates = []
-        for name in docs:
-            ok, _ = constraints_ok(name, day, area, shift, assigned_map, counts)
-            if ok:
-                candidates.append(name)
-        if candidates:
-            def score(nm):
-                assigned = counts.get(nm,0)
-                wk_cnt = 0
-                for (n,d),(a,s) in assigned_map.items():
-                    if n==nm and is_weekend(int(st.session_state.year), int(st.session_state.month), int(d)):
-                        wk_cnt += 1
-                remaining = int(st.session_state.cap_map[nm]) - assigned
-                return (assigned, wk_cnt, -remaining)
-            candidates.sort(key=score)
-            pick = candidates[0]
-            assigned_map[(pick, day)] = (area, shift)
-            counts[pick] += 1
-
-    rows = [{"doctor":n,"day":d,"area":a,"shift":s,"code":code_for(a,s)}
-            for (n,d),(a,s) in assigned_map.items()]
-    df = pd.DataFrame(rows)
+        return None
+
+def _set_result(df: pd.DataFrame):
     st.session_state.result_df = df
+    st.session_state.pop("loaded_version", None)  # the rota is no longer the saved one
     recompute_tables(df)
-    st.warning(L("no_solution_warn"))
 
+# ---------- Background generation ----------
+# Each button captures its inputs here on the script thread and starts a Job; `apply`
+# runs on the script thread of the first rerun after the job ends (finish_job) and
+# returns the (level, message) shown above the Generate buttons.
+def job_running() -> bool:
+    return "job" in st.session_state
+
+def start_job(kind: str, work, apply):
+    """Start the job and rerun at once: the progress fragment sits above the tabs, so only
+    the next run draws it (with its Cancel button and auto-refresh)."""
+    if job_running(): return
+    st.session_state.job = (Job(kind, work).start(), apply)
+    st.rerun()
+
+def finish_job():
+    """Apply a finished job's result to the session (no-op while it is still running)."""
+    ss = st.session_state
+    job, apply = ss.job
+    if not job.done: return
+    del ss.job
+    if job.profile is not None: report_profile(job.profile)
+    if job.error is not None:
+        ss.job_msg = ("error", f"{L('job_failed')}: {job.error}"); return
+    level, msg = apply(job.result)
+    ss.job_msg = ("info", f"{L('job_cancelled')} {msg}") if job.cancelled else (level, msg)
+
+@profiling.timed()
+def random_generate():
+    cfg = config_from_session(); elig = eligibility_matrix(cfg); seed = _seed_from_input()
+    def apply(state):
+        _set_result(state.to_frame())
+        return "warning", L("no_solution_warn")
+    start_job("run", lambda job: engine.greedy_pass(cfg, elig, seed, progress=job.progress, cancel=job.cancel_event),
+              apply)
+
+@profiling.timed()
+def best_of_n_generate(n_restarts: int):
+    """engine.best_of_n from the sidebar seed; the winner is reproduced by entering
+    its seed and pressing Randomize. Its per-restart score table, best first, goes to restart_scores."""
+    cfg = config_from_session(); elig = eligibility_matrix(cfg); seed = _seed_from_input()
+    def apply(res):
+        ss = st.session_state
+        ss.best_seed, df, ss.restart_scores = res
+        _set_result(df)
+        return "success", f"{L('best_seed')}: {ss.best_seed}"
+    start_job("best", lambda job: engine.best_of_n(cfg, elig, n_restarts, seed, progress=job.progress,
+                                                   cancel=job.cancel_event), apply)
+
+@profiling.timed()
 def balance_workload():
-    if st.session_state.result_df.empty or st.session_state.gaps.empty:
+    ss = st.session_state
+    if ss.result_df.empty or ss.gaps.empty:
         return
-    df = st.session_state.result_df.copy()
-    assigned_map = {(r.doctor, int(r.day)):(r.area, r.shift) for r in df.itertuples(index=False)}
-    counts = df.groupby("doctor").size().to_dict()
-    gaps_sorted = st.session_state.gaps.sort_values(["short_by","day"], ascending=[False, True])
-    for row in gaps_sorted.itertuples(index=False):
-        need = int(row.short_by); day = int(row.day); area = row.area; shift = row.shift
-        for _ in range(need):
-            cands = []
-            for nm in st.session_state.doctors:
-                ok, _msg = constraints_ok(nm, day, area, shift, assigned_map, counts)
-                if ok:
-                    rem = int(st.session_state.cap_map[nm]) - counts.get(nm,0)
-                    wk = 0
-                    night_cnt = 0
-                    for (n,d),(a,s) in assigned_map.items():
-                        if n==nm and is_weekend(int(st.session_state.year), int(st.session_state.month), int(d)):
-                            wk += 1
-                        if n==nm and s=="night":
-                            night_cnt += 1
-                    cands.append((nm, rem, wk, night_cnt))
-            if not cands: break
-            cands.sort(key=lambda x: (-x[1], x[2], x[3], x[0]))
-            pick = cands[0][0]
-            assigned_map[(pick, day)] = (area, shift)
-            counts[pick] = counts.get(pick,0) + 1
-            df = pd.concat([df, pd.DataFrame([{
-                "doctor":pick,"day":day,"area":area,"shift":shift,"code":code_for(area,shift)
-            }])], ignore_index=True)
-    st.session_state.result_df = df
-    recompute_tables(df)
+    cfg = config_from_session(); elig = eligibility_matrix(cfg); df, gaps = ss.result_df, ss.gaps
+    def apply(df_new):
+        _set_result(df_new)
+        return "success", L("balanced_ok")
+    start_job("balance", lambda job: engine.balance(cfg, df, gaps, elig, progress=job.progress,
+                                                    cancel=job.cancel_event), apply)
+
+@profiling.timed()
+def solve_optimal(time_limit: float = 30.0, workers: int = 0):
+    """engine.solve_optimal warm-started from the current rota."""
+    cfg = config_from_session(); elig = eligibility_matrix(cfg); current = st.session_state.result_df
+    def apply(res):
+        status, df = res
+        if df is not None: _set_result(df)
+        if status == engine.KEPT_CURRENT: return "info", L("solve_kept")
+        if status in ("OPTIMAL", "FEASIBLE"): return "success", f"{L('solve_ok')}: {status}"
+        return "error", f"{L('solve_fail')} ({status})"
+    start_job("solve", lambda job: engine.solve_optimal(cfg, elig, current, time_limit, workers,
+                                                        progress=job.progress, cancel=job.cancel_event), apply)
+
+@profiling.timed()
+def improve_rota(budget_s: float):
+    ss = st.session_state
+    if ss.result_df.empty: return
+    cfg = config_from_session(); elig = eligibility_matrix(cfg); seed = _seed_from_input()
+    state = RotaState.from_frame(ss.result_df, cfg)
+    def work(job):
+        report = lambda frac, short, cost: job.report(frac=frac, short=short, cost=cost)
+        return engine.local_search(state, elig, budget_s, seed=seed, progress=report, cancel=job.cancel_event)
+    def apply(res):
+        state, stats = res
+        _set_result(state.to_frame())
+        return "success", (f"{L('improve_done')}: {L('gaps')} {stats['short_before']} → {stats['short_after']}, "
+                           f"cost {stats['cost_before']} → {stats['cost_after']} ({stats['iterations']} it)")
+    start_job("improve", work, apply)
+
+@st.fragment(run_every=0.5)
+def job_progress():
+    """Progress of the running job, redrawn on its own; a full rerun applies the result once it ends."""
+    if not job_running(): return
+    job, _apply = st.session_state.job
+    if job.done: st.rerun()
+    snap = job.snapshot()
+    parts = [f"{L('job_' + job.kind)}"]
+    if "filled" in snap: parts.append(f"{L('slots_filled')}: {snap['filled']}")
+    if "short" in snap: parts.append(f"{L('gaps')}: {snap['short']}")
+    parts.append(f"{snap['elapsed']:.1f} s")
+    c1, c2 = st.columns([4,1])
+    c1.progress(min(1.0, snap.get("frac", 0.0)), text=" · ".join(parts))
+    c2.button(L("job_cancel"), key="job_cancel_btn", on_click=job.cancel, disabled=job.cancelled,
+              use_container_width=True)
+
+@profiling.timed()
+def repair_absence(doc: str, days: set) -> pd.DataFrame:
+    """engine.repair for one doctor's new absence; records it so later runs keep them off those days."""
+    ss = st.session_state
+    cfg = config_from_session()
+    df_new, diff = engine.repair(cfg, ss.result_df, {doc: set(days)}, eligibility_matrix(cfg))
+    ss.absences.setdefault((int(ss.year), int(ss.month)), {}).setdefault(doc, set()).update(days)
+    ss.last_repair = diff
+    _set_result(df_new)
+    return diff
+
+def save_version(name: str):
+    ss = st.session_state
+    store = get_store(create=True)
+    if store is None: return
+    # repair absences stay session-side; the saved off-days are the ones entered in the calendar
+    cfg = config_from_session(absences=False)
+    store.save(name, cfg, ss.result_df)
 
-# ===== Views helpers =====
-def sheet_day_doctor(df: pd.DataFrame, days:int, doctors:List[str]) -> pd.DataFrame:
-    if df.empty:
-        return pd.DataFrame(index=range(1, days+1), columns=doctors)
-    p = df.pivot_table(index="day", columns="doctor", values="code", aggfunc="first")
-    return p.reindex(index=range(1, days+1), columns=doctors)
-
-def grid_doctor_day(df: pd.DataFrame, days:int, doctors:List[str]) -> pd.DataFrame:
-    g = pd.DataFrame(index=doctors, columns=[str(d) for d in range(1, days+1)])
-    g[:] = ""
-    if df.empty: return g
-    for r in df.itertuples(index=False):
-        g.at[r.doctor, str(int(r.day))] = str(r.code)
-    return g
-
-def day_shift_map(df: pd.DataFrame, days:int) -> Dict[int, Dict[str, List[str]]]:
-    m = {d:{c:[] for c in SHIFT_COLS_ORDER} for d in range(1, days+1)}
-    if df.empty: return m
-    for r in df.itertuples(index=False):
-        d = int(r.day); code = str(r.code)
-        if code in m[d]:
-            m[d][code].append(r.doctor)
-    for d in m:
-        for c in m[d]: m[d][c] = sorted(m[d][c])
-    return m
-
-def daily_counts(df: pd.DataFrame, days:int) -> Dict[int, Dict[str, Tuple[int,int,int]]]:
-    res = {d:{c:(0,0,0) for c in SHIFT_COLS_ORDER} for d in range(1, days+1)}
-    ct = df.groupby(["day","code"]).size().to_dict() if not df.empty else {}
-    req_map = {code_for(a,s): int(st.session_state.cov[(a,s)]) for a in AREAS for s in SHIFTS}
-    for d in range(1, days+1):
-        for c in SHIFT_COLS_ORDER:
-            a = ct.get((d,c), 0); r = req_map[c]
-            short = max(0, r - a)
-            res[d][c] = (a, r, short)
-    return res
-
-def area_totals_from_daily_counts(dc: Dict[int, Dict[str, Tuple[int,int,int]]]) -> Dict[int, Dict[str, Tuple[int,int,int]]]:
-    area_codes = {"fast": ["F1","F2","F3"], "resp_triage": ["R1","R2","R3"], "acute": ["A1","A2","A3"], "resus": ["C1","C2","C3"]}
-    out = {d:{a:(0,0,0) for a in AREAS} for d in dc.keys()}
-    for d in dc.keys():
-        for area, codes in area_codes.items():
-            A = R = 0
-            for c in codes:
-                a, r, _ = dc[d][c]
-                A += a; R += r
-            short = max(0, R - A)
-            out[d][area] = (A, R, short)
-    return out
+def load_version(name: str):
+    """on_click callback: runs before the widgets are rebuilt, so their keys can be reset.
+
+    The only way a session picks up a saved version: the store is shared by every user,
+    so a new session starts from its own defaults, never from someone else's last save."""
+    ss = st.session_state
+    store = get_store()
+    t0 = time.perf_counter()
+    y, m = int(ss.year), int(ss.month)
+    saved = store.load(y, m, name) if store else None
+    if saved and restore_session(*saved):
+        ss.loaded_version = f"{name} ({y}-{m:02d})"
+        ss["_load_ms"] = (time.perf_counter() - t0) * 1000
+
+def import_roster_file(data: bytes, filename: str, replace: bool) -> dict:
+    """Apply a roster file to every per-doctor map in one pass (one rerun instead of one per widget)."""
+    ss = st.session_state
+    cfg = config_from_session(absences=False)
+    caps = {g: int(ss.group_caps.get(g, GROUP_CAP[g])) for g in GROUP_CAP}
+    report = import_roster(cfg, data, filename, replace=replace, group_caps=caps)
+    for f in ("doctors","group_map","cap_map","allowed_shifts","offdays","max_night_map","max_week_map",
+              "avoid_holidays_map","max_hours_map"):
+        ss[f] = getattr(cfg, f)
+    _drop_config_widgets()
+    return report
+
+def plan_horizon(months: int, improve_s: float) -> engine.RollingHorizon:
+    """Schedule `months` consecutive months from the sidebar month, keeping the rota on screen as the first."""
+    ss = st.session_state
+    hz = engine.RollingHorizon(config_from_session())
+    first = None if ss.result_df.empty else ss.result_df
+    hz.add_month(df=first, seed=_seed_from_input(), improve_s=0.0 if first is not None else improve_s)
+    hz.run(months, seed=_seed_from_input(), improve_s=improve_s)
+    ss.horizon = hz
+    return hz
+
+# ---------- Derived data (recomputed only when its inputs change) ----------
+# Frames in the session are replaced, never mutated in place, so a frame's hash is
+# memoised by identity; everything derived from the rota is keyed on that hash plus
+# the settings it reads, and kept one version deep per name.
+FRAME_KEYS = 8
+
+def frame_key(df: pd.DataFrame) -> str:
+    """frame_hash(df), computed once per frame object."""
+    keys = st.session_state.setdefault("_frame_keys", {})
+    hit = keys.get(id(df))
+    if hit is not None and hit[0] is df: return hit[1]
+    h = frame_hash(df)
+    keys[id(df)] = (df, h)  # holding df keeps its id from being reused
+    while len(keys) > FRAME_KEYS: keys.pop(next(iter(keys)))
+    return h
+
+def memo(name: str, key, build):
+    """build() once per distinct `key` (the last value per name is kept in the session)."""
+    slot = st.session_state.setdefault("_memo", {})
+    hit = slot.get(name)
+    if hit is not None and hit[0] == key: return hit[1]
+    val = build()
+    slot[name] = (key, val)
+    return val
+
+@profiling.timed()
+def current_coverage(df: pd.DataFrame = None) -> CoverageStats:
+    """CoverageStats for the session rota, computed once per rota version (content + days + coverage)."""
+    ss = st.session_state
+    df = ss.result_df if df is None else df
+    days, cov = int(ss.days), dict(ss.cov)
+    return memo("coverage", (frame_key(df), days, tuple(sorted(cov.items()))), lambda: CoverageStats(df, days, cov))
+
+@profiling.timed()
+def current_fairness() -> FairnessStats:
+    """FairnessStats for the session rota, computed once per rota version and the settings it reads."""
+    ss = st.session_state
+    cfg = config_from_session(absences=False)
+    key = (frame_key(ss.result_df), cfg.year, cfg.month, cfg.days, tuple(cfg.doctors),
+           tuple(cfg.group_map.get(n) for n in cfg.doctors), frozenset(cfg.holidays), cfg.min_rest)
+    return memo("fairness", key, lambda: FairnessStats(cfg, ss.result_df))
+
+@profiling.timed()
+def current_audit() -> pd.DataFrame:
+    """audit_rota of the session rota (absences included), recomputed only when the rota or a rule changes."""
+    ss = st.session_state
+    cfg = config_from_session()
+    key = (frame_key(ss.result_df), cfg.year, cfg.month, repr(cfg.rules()), cfg.eligibility_signature())
+    return memo("audit", key, lambda: audit_rota(cfg, ss.result_df))
+
+def current_views() -> Tuple[pd.DataFrame, Dict[int, Dict[str, List[str]]], pd.DataFrame]:
+    """(day × doctor sheet, day → code → doctors map, doctor × day edit grid) of the session rota."""
+    ss = st.session_state
+    df, days, docs = ss.result_df, int(ss.days), list(ss.doctors)
+    key = (frame_key(df), days, tuple(docs))
+    rota = memo("compact", key, lambda: CompactRota.from_frame(df, days, docs))
+    return (memo("sheet", key, rota.sheet), memo("day_map", key, rota.by_shift), memo("grid", key, rota.grid))
 
 # ---------- THEME-AWARE CSS + CODE BADGE ----------
+_CSS_DONE = False
 def inject_css():
+    """Emit the stylesheet once per run; area colours become .area-* classes for the cells."""
+    global _CSS_DONE
+    if _CSS_DONE: return
+    _CSS_DONE = True
     css = """
     <style>
       :root {
@@ -561,6 +465,8 @@ def inject_css():
       .sub { font-size:11px; font-weight:500; opacity:.85; }
     </style>
     """
+    area_rules = "".join(f"      table.tbl .area-{a} {{ background:{area_color(a)}; }}\n" for a in AREAS)
+    css = css.replace("    </style>", area_rules + "    </style>")
     st.markdown(css, unsafe_allow_html=True)
 
 # ---------- Color from code ----------
@@ -573,112 +479,91 @@ def chip_color_for_code(code: str):
             return area, st.session_state.area_colors.get(area, "#9CA3AF")
     return "", "#9CA3AF"
 
-def cell_bg_style(code: str) -> str:
-    """Inline CSS background for the whole TD based on code area color."""
-    _, color = chip_color_for_code(code)
-    return f"background:{color};"
+# ---------- Cached HTML builders (keyed by rota hash; colours live in CSS only) ----------
+PAGE_DOCTORS = 60  # rosters above this are rendered one window of doctors at a time
+
+def doctor_window(doctors: List[str], key: str) -> List[str]:
+    """Slice of doctors to render; large rosters are paged so only visible rows/columns are sent."""
+    if len(doctors) <= PAGE_DOCTORS: return doctors
+    pages = math.ceil(len(doctors) / PAGE_DOCTORS)
+    page = st.number_input(f"{L('page')} (1–{pages})", 1, pages, value=1, key=key)
+    lo = (int(page)-1) * PAGE_DOCTORS
+    return doctors[lo:lo+PAGE_DOCTORS]
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def day_doctor_html(rota_key: str, _sheet: pd.DataFrame, year:int, month:int, doctors: Tuple[str,...], lang:str) -> str:
+    return render.day_doctor_html(_sheet, year, month, doctors, lang)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def doctor_day_html(rota_key: str, _sheet: pd.DataFrame, year:int, month:int, doctors: Tuple[str,...], lang:str) -> str:
+    return render.doctor_day_html(_sheet, year, month, doctors, lang)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def day_shift_html(rota_key: str, _day_map: Dict[int, Dict[str, List[str]]], year:int, month:int, lang:str) -> str:
+    return render.day_shift_html(_day_map, year, month, lang)
 
-def badge_html(code: str):
-    """Return colored badge containing the code itself."""
-    txt = html.escape((code or "").upper())
-    return f"<span class='badge-code' title='{txt}'>{txt}</span>"
+@st.cache_data(max_entries=32, show_spinner=False)
+def daily_area_html(rota_key: str, _atotals: Dict[int, Dict[str, Tuple[int,int,int]]], year:int, month:int,
+                    days:int, lang:str) -> str:
+    return render.daily_area_html(_atotals, year, month, days, lang)
 
 # ---------- Renderers (cells colored + code inside) ----------
-def render_day_doctor_cards(sheet: pd.DataFrame, year:int, month:int, doctors:List[str]):
+@profiling.timed()
+def render_day_doctor_cards(sheet: pd.DataFrame, year:int, month:int, doctors:List[str], rota_key:str):
     inject_css()
-    head = ["<th>"+html.escape(L("day"))+"</th>"] + [f"<th>{html.escape(doc)}</th>" for doc in doctors]
-    thead = "<thead><tr>" + "".join(head) + "</tr></thead>"
-    body_rows = []
-    for day in sheet.index:
-        dname = weekday_name(int(year), int(month), int(day))
-        left = f"<th class='sticky'>{int(day)} / {int(month)}<div class='sub'>{html.escape(dname)}</div></th>"
-        cells = []
-        for doc in doctors:
-            val = sheet.loc[day, doc] if doc in sheet.columns else ""
-            if pd.isna(val) or str(val).strip()=="":
-                cells.append(f"<td><div class='cell'></div></td>")
-            else:
-                code = str(val).upper().strip()
-                cells.append(f"<td style='{cell_bg_style(code)}'><div class='cell'>{badge_html(code)}</div></td>")
-        body_rows.append("<tr>"+left+"".join(cells)+"</tr>")
-    tbody = "<tbody>" + "".join(body_rows) + "</tbody>"
-    st.markdown(f"<div class='wrap'><table class='tbl'>{thead}{tbody}</table></div>", unsafe_allow_html=True)
+    doctors = doctor_window(doctors, "page_day_doctor")
+    st.markdown(day_doctor_html(rota_key, sheet, int(year), int(month), tuple(doctors), st.session_state.lang),
+                unsafe_allow_html=True)
 
-def render_doctor_day_cards(sheet: pd.DataFrame, year:int, month:int, doctors:List[str]):
+@profiling.timed()
+def render_doctor_day_cards(sheet: pd.DataFrame, year:int, month:int, doctors:List[str], rota_key:str):
     inject_css()
-    days = list(sheet.index)
-    head = ["<th>"+html.escape(L("doctor"))+"</th>"] + [
-        f"<th>{int(d)}/{int(month)}<div class='sub'>{html.escape(weekday_name(int(year),int(month),int(d)))}</div></th>"
-        for d in days
-    ]
-    thead = "<thead><tr>" + "".join(head) + "</tr></thead>"
-    body_rows = []
-    for doc in doctors:
-        left = f"<th class='sticky'>{html.escape(doc)}</th>"
-        cells = []
-        for day in days:
-            val = sheet.loc[day, doc] if doc in sheet.columns else ""
-            if pd.isna(val) or str(val).strip()=="":
-                cells.append(f"<td><div class='cell'></div></td>")
-            else:
-                code = str(val).upper().strip()
-                cells.append(f"<td style='{cell_bg_style(code)}'><div class='cell'>{badge_html(code)}</div></td>")
-        body_rows.append("<tr>"+left+"".join(cells)+"</tr>")
-    tbody = "<tbody>" + "".join(body_rows) + "</tbody>"
-    st.markdown(f"<div class='wrap'><table class='tbl'>{thead}{tbody}</table></div>", unsafe_allow_html=True)
+    doctors = doctor_window(doctors, "page_doctor_day")
+    st.markdown(doctor_day_html(rota_key, sheet, int(year), int(month), tuple(doctors), st.session_state.lang),
+                unsafe_allow_html=True)
 
-def render_day_shift_cards(day_map: Dict[int, Dict[str, List[str]]], year:int, month:int):
+@profiling.timed()
+def render_day_shift_cards(day_map: Dict[int, Dict[str, List[str]]], year:int, month:int, rota_key:str):
     inject_css()
-    head = ["<th>"+html.escape(L("day"))+"</th>"]
-    for code in SHIFT_COLS_ORDER:
-        _, col = chip_color_for_code(code)
-        head.append(f"<th style='background:{col}'>{html.escape(code)}</th>")
-    thead = "<thead><tr>" + "".join(head) + "</tr></thead>"
-    body_rows = []
-    for day in sorted(day_map.keys()):
-        dname = weekday_name(int(year), int(month), int(day))
-        left = f"<th class='sticky'>{int(day)} / {int(month)}<div class='sub'>{html.escape(dname)}</div></th>"
-        cells = []
-        for code in SHIFT_COLS_ORDER:
-            docs = day_map[day].get(code, [])
-            if not docs:
-                cells.append(f"<td><div class='cell'></div></td>")
-            else:
-                inner = " · ".join([html.escape(n) for n in docs])
-                cells.append(f"<td style='{cell_bg_style(code)}'><div class='cell' style='font-size:12px'>{inner}</div></td>")
-        body_rows.append("<tr>"+left+"".join(cells)+"</tr>")
-    tbody = "<tbody>" + "".join(body_rows) + "</tbody>"
-    st.markdown(f"<div class='wrap'><table class='tbl'>{thead}{tbody}</table></div>", unsafe_allow_html=True)
+    st.markdown(day_shift_html(rota_key, day_map, int(year), int(month), st.session_state.lang),
+                unsafe_allow_html=True)
 
-def render_daily_area_table(atotals: Dict[int, Dict[str, Tuple[int,int,int]]], year:int, month:int):
+@profiling.timed()
+def render_daily_area_table(atotals: Dict[int, Dict[str, Tuple[int,int,int]]], year:int, month:int, rota_key:str):
     inject_css()
     st.subheader(L("daily_table"))
-    head = ["<th>"+html.escape("Area" if st.session_state.lang=="en" else "القسم")+"</th>"]
-    days = list(range(1, st.session_state.days+1))
-    for d in days:
-        dname = weekday_name(int(year), int(month), int(d))
-        head.append(f"<th>{int(d)}/{int(month)}<div class='sub'>{html.escape(dname)}</div></th>")
-    thead = "<thead><tr>" + "".join(head) + "</tr></thead>"
-    body_rows = []
-    for area in ["fast","resp_triage","acute","resus"]:
-        left = f"<th class='sticky'>{html.escape(AREA_LABEL[st.session_state.lang][area])}</th>"
-        cells = []
-        for d in days:
-            a, r, short = atotals[d][area]
-            cls = "ok" if short==0 else "short"
-            cells.append(f"<td><div class='cell'><span class='badge-code {cls}'>{a}/{r}</span></div></td>")
-        body_rows.append("<tr>"+left+"".join(cells)+"</tr>")
-    tbody = "<tbody>" + "".join(body_rows) + "</tbody>"
-    st.markdown(f"<div class='wrap'><table class='tbl'>{thead}{tbody}</table></div>", unsafe_allow_html=True)
+    st.markdown(daily_area_html(rota_key, atotals, int(year), int(month), int(st.session_state.days),
+                                st.session_state.lang), unsafe_allow_html=True)
 
 # ---------- Calendar Offday Picker ----------
+# The calendar and the per-doctor editor are fragments: a click reruns only them, and
+# they write straight into the session's per-doctor maps, which the rest of the page
+# reads on its next run. Off-days are kept in step by the checkbox callbacks, the only
+# place a widget's own key may be reset.
+def _toggle_offday(doc: str, key: str, d: int):
+    ss = st.session_state
+    days = set(ss.offdays.get(doc, set()))
+    if ss[key] and d not in days:
+        if len(days) >= MAX_OFFDAYS:
+            ss[key] = False; ss["_offday_full"] = doc; return
+        days.add(d)
+    elif not ss[key]:
+        days.discard(d)
+    ss.offdays[doc] = days
+
+def _clear_offdays(doc: str, keys: List[str]):
+    ss = st.session_state
+    for k in keys:
+        if k in ss: ss[k] = False
+    ss.offdays[doc] = set()
+
+@st.fragment
+@profiling.timed()
 def render_offday_calendar(doc: str):
-    inject_css()
     st.caption(L("off_calendar"))
     y = int(st.session_state.year); m = int(st.session_state.month)
-    cal = calendar.Calendar(firstweekday=0)
-    weeks = cal.monthdayscalendar(y, m)
-    selected = set(st.session_state.offdays.get(doc, set()))
+    weeks = calendar.Calendar(firstweekday=0).monthdayscalendar(y, m)
+    selected = st.session_state.offdays.get(doc, set())
     max_days = int(st.session_state.days)
 
     head_cols = st.columns(7)
@@ -686,6 +571,7 @@ def render_offday_calendar(doc: str):
     for i, col in enumerate(head_cols):
         col.markdown(f"<div class='sub' style='text-align:center'><b>{html.escape(day_names[i])}</b></div>", unsafe_allow_html=True)
 
+    keys = []
     for w in weeks:
         cols = st.columns(7)
         for i, d in enumerate(w):
@@ -693,81 +579,68 @@ def render_offday_calendar(doc: str):
                 if d == 0 or d > max_days:
                     st.markdown("&nbsp;")
                 else:
-                    key = f"off_{doc}_{y}_{m}_{d}"
-                    default_val = d in selected
-                    val = st.checkbox(str(d), value=default_val, key=key)
-                    if val: selected.add(d)
-                    else: selected.discard(d)
-
-    if len(selected) > 3:
-        keep = set(sorted(selected)[:3])
-        for d in selected - keep:
-            k = f"off_{doc}_{y}_{m}_{d}"
-            if k in st.session_state: st.session_state[k] = False
-        selected = keep
-        st.warning("Max 3 off-days per month.")
-
-    st.session_state.offdays[doc] = selected
+                    key = doc_key(doc, "off", y, m, d)
+                    keys.append(key)
+                    st.checkbox(str(d), value=d in selected, key=key, on_change=_toggle_offday, args=(doc, key, d))
+
+    if st.session_state.pop("_offday_full", None) == doc:
+        st.warning(f"Max {MAX_OFFDAYS} off-days per month.")
     c1, c2 = st.columns(2)
     with c2:
-        if st.button(L("clear_off"), key=f"clear_off_{doc}"):
-            for w in weeks:
-                for d in w:
-                    if d and d <= max_days:
-                        k = f"off_{doc}_{y}_{m}_{d}"
-                        if k in st.session_state: st.session_state[k] = False
-            st.session_state.offdays[doc] = set()
-            st.rerun()  # استبدال experimental_rerun
+        st.button(L("clear_off"), key=doc_key(doc, "clear_off"), on_click=_clear_offdays, args=(doc, keys))
+
+@st.fragment
+@profiling.timed()
+def render_doctor_editor():
+    """Group, cap, shifts, off-days and limits of one doctor."""
+    ss = st.session_state
+    if not ss.doctors: return
+    doc = st.selectbox(L("doctor"), ss.doctors, key="edit_doc_sel")
+    grp = st.selectbox(L("group"), ["senior","g1","g2","g3","g4","g5"],
+                       index=["senior","g1","g2","g3","g4","g5"].index(ss.group_map.get(doc,"g3")),
+                       key=doc_key(doc, "group"))
+    ss.group_map[doc] = grp
+    ss.cap_map[doc] = st.number_input(L("cap"), 0, 31, value=int(ss.cap_map.get(doc, 18)), key=doc_key(doc, "cap"))
+    ch0, ch1, ch2 = st.columns(3)
+    checks = {}
+    for i, sh in enumerate(SHIFTS):
+        col = ch0 if i==0 else ch1 if i==1 else ch2
+        with col:
+            checks[sh] = st.checkbox(LBL_SHIFT(sh), value=(sh in ss.allowed_shifts.get(doc,set(SHIFTS))),
+                                     key=doc_key(doc, "allow", sh))
+    ss.allowed_shifts[doc] = {s for s,v in checks.items() if v} or set(SHIFTS)
+
+    st.markdown(f"**{L('offdays')}**")
+    render_offday_calendar(doc)
+
+    st.markdown(f"**{L('adv_rules')}**")
+    a1, a2, a3, a4 = st.columns(4)
+    with a1:
+        ss.max_night_map[doc] = st.number_input(L("max_night"), 0, 31, value=int(ss.max_night_map.get(doc,6)),
+                                                key=doc_key(doc, "max_night"))
+    with a2:
+        ss.max_week_map[doc] = st.number_input(L("max_week"), 0, 7, value=int(ss.max_week_map.get(doc,5)),
+                                               key=doc_key(doc, "max_week"))
+    with a3:
+        ss.max_hours_map[doc] = st.number_input(L("max_hours"), 0, 744, value=int(ss.max_hours_map.get(doc,0)),
+                                                key=doc_key(doc, "max_hours"), help=L("zero_off"))
+    with a4:
+        ss.avoid_holidays_map[doc] = st.checkbox(L("avoid_holidays"), value=bool(ss.avoid_holidays_map.get(doc,False)),
+                                                 key=doc_key(doc, "avoid_holidays"))
 
 # ---------- Inline editor ----------
 ALL_CODES = [""] + SHIFT_COLS_ORDER
-def parse_code(code: str) -> Tuple[str,str]:
-    code = (code or "").strip().upper()
-    if code == "" or len(code) < 2: return ("","")
-    area = LETTER_TO_AREA.get(code[0], "")
-    shift = DIGIT_TO_SHIFT.get(code[-1], "")
-    if area in AREAS and shift in SHIFTS: return area, shift
-    return ("","")
-
+@profiling.timed()
 def apply_inline_changes(grid_new: pd.DataFrame, validate: bool, force: bool):
-    df_old = st.session_state.result_df.copy()
-    assigned_map = {(r.doctor, int(r.day)):(r.area, r.shift) for r in df_old.itertuples(index=False)}
-    counts = df_old.groupby("doctor").size().to_dict()
-    invalid = []
-    for doc in st.session_state.doctors:
-        if doc not in grid_new.index: continue
-        for d_str in grid_new.columns:
-            day = int(d_str)
-            new_code = str(grid_new.at[doc, d_str]).strip().upper()
-            old_code = ""
-            if (doc, day) in assigned_map:
-                old_code = code_for(*assigned_map[(doc,day)])
-            if new_code == old_code: continue
-            if (doc, day) in assigned_map:
-                counts[doc] = max(0, counts.get(doc,0) - 1)
-                assigned_map.pop((doc, day), None)
-                df_old = df_old[~((df_old["doctor"]==doc) & (df_old["day"]==day))]
-            if new_code == "" or len(new_code)<2: continue
-            area, shift = parse_code(new_code)
-            if area=="" or shift=="":
-                invalid.append((doc, day, new_code, "bad code"))
-            else:
-                if validate and not force:
-                    ok, msg = constraints_ok(doc, day, area, shift, assigned_map, counts)
-                    if not ok:
-                        invalid.append((doc, day, new_code, msg))
-                        continue
-                assigned_map[(doc, day)] = (area, shift)
-                counts[doc] = counts.get(doc,0) + 1
-                df_old = pd.concat([df_old, pd.DataFrame([{
-                    "doctor":doc,"day":day,"area":area,"shift":shift,"code":code_for(area,shift)
-                }])], ignore_index=True)
-    st.session_state.result_df = df_old
-    recompute_tables(df_old)
+    df_new, invalid = engine.apply_grid_edits(config_from_session(), st.session_state.result_df,
+                                              grid_new, validate, force)
+    _set_result(df_new)
     return invalid
 
+if job_running(): finish_job()
+
 # ===== Sidebar =====
-with st.sidebar:
+with st.sidebar, profiling.phase("sidebar"):
     st.header(L("general"))
     lang_choice = st.radio(L("language"), [I18N["ar"]["arabic"], I18N["en"]["english"]],
                            index=0 if st.session_state.lang=="ar" else 1, horizontal=True, key="lang_radio")
@@ -786,440 +659,437 @@ with st.sidebar:
     st.number_input(L("min_off"), 0, 31, key="min_off_input", value=st.session_state.min_off)
     st.number_input(L("max_consec"), 1, 30, key="max_consec_input", value=st.session_state.max_consec)
     st.number_input(L("min_rest"), 0, 24, key="min_rest_input", value=st.session_state.min_rest)
+    st.number_input(L("max_hours_week"), 0, 168, key="max_hours_week_input", value=st.session_state.max_hours_week,
+                    help=L("zero_off"))
     st.session_state.min_off = st.session_state.min_off_input
     st.session_state.max_consec = st.session_state.max_consec_input
     st.session_state.min_rest = st.session_state.min_rest_input
+    st.session_state.max_hours_week = st.session_state.max_hours_week_input
+
+    ss = st.session_state
+    if ss.get("loaded_version"): st.caption(f"{L('loaded_version')}: {ss.loaded_version}")
+    with st.expander(L("versions")):
+        v_name = st.text_input(L("version_name"), value=f"{int(ss.year)}-{int(ss.month):02d}", key="version_name")
+        # the sidebar is drawn before the Generate tab, so an empty rota is reported rather than disabling the button
+        if st.button(L("save_version"), key="save_version_btn", use_container_width=True, disabled=not v_name.strip()):
+            if ss.result_df.empty: st.info(L("need_generate"))
+            else: save_version(v_name.strip()); st.success(L("saved_ok"))
+        store = get_store()
+        names = store.names(ss.year, ss.month) if store else []
+        if names:
+            v_sel = st.selectbox(" ", names, key="version_sel")
+            vc1, vc2 = st.columns(2)
+            vc1.button(L("load_version"), key="load_version_btn", on_click=load_version, args=(v_sel,),
+                       use_container_width=True)
+            if vc2.button(L("delete_version"), key="delete_version_btn", use_container_width=True):
+                store.delete(ss.year, ss.month, v_sel); st.rerun()
+            if "_load_ms" in ss: st.caption(f"{ss.pop('_load_ms'):.0f} ms")
+        else:
+            st.caption(L("no_versions"))
+
+    st.toggle(L("debug_profile"), key="debug_profile", help=L("debug_profile_hint"))
+
+# ===== Session state GC =====
+# per-doctor widget keys (rota.session.doc_key) outlive their doctor and, for the
+# calendar, their month; sweep them whenever the month or the roster changes.
+_gc_sig = ((int(st.session_state.year), int(st.session_state.month)), tuple(st.session_state.doctors))
+if st.session_state.get("_gc_sig") != _gc_sig:
+    with profiling.phase("session_gc"):
+        profiling.count("session_evicted", sweep(st.session_state, _gc_sig[1], _gc_sig[0]))
+    st.session_state._gc_sig = _gc_sig
 
 # ===== Tabs =====
-tab_rules, tab_docs, tab_gen, tab_export = st.tabs([L("rules"), L("doctors_tab"), L("run_tab"), L("export")])
+# Where st.tabs supports it, switching tabs reruns the app and only the open tab's block
+# runs; older Streamlit versions build every tab as before.
+LAZY_TABS = "on_change" in inspect.signature(st.tabs).parameters
+def tab_open(tab) -> bool:
+    return getattr(tab, "open", None) is not False
+
+inject_css()  # outside every fragment, so a fragment rerun never drops the stylesheet
+if job_running(): job_progress()
+_tab_labels = [L("rules"), L("doctors_tab"), L("run_tab"), L("export")]
+tab_rules, tab_docs, tab_gen, tab_export = (st.tabs(_tab_labels, key="main_tab", on_change="rerun") if LAZY_TABS
+                                            else st.tabs(_tab_labels))
 
 # ---------- Rules tab ----------
-with tab_rules:
-    st.subheader(L("coverage"))
-    cols = st.columns(4)  # كان 3، الآن 4 أعمدة لأربع مناطق
-    new_cov = st.session_state.cov.copy()
-    for i, area in enumerate(AREAS):
-        with cols[i%4]:
-            st.markdown(f"**{LBL_AREA(area)}**")
-            for sh in SHIFTS:
-                key = f"cov_{area}_{sh}"
-                new_cov[(area, sh)] = st.number_input(
-                    f"{LBL_AREA(area)} — {LBL_SHIFT(sh)}",
-                    0, 40, int(st.session_state.cov[(area,sh)]), key=key
-                )
-    st.session_state.cov = new_cov
-
-    st.subheader(L("group_caps"))
-    gc = st.columns(6)
-    for i, g in enumerate(["senior","g1","g2","g3","g4","g5"]):
-        with gc[i]:
-            _ = st.number_input(
-                f"{g}", min_value=0, max_value=31,
-                value=int(st.session_state.get(f"gcap_{g}", {"senior":16,"g1":18,"g2":18,"g3":18,"g4":18,"g5":18}[g])),
-                key=f"gcap_{g}"
-            )
-    st.caption("Per-doctor caps are set below; these are defaults for new doctors.")
-
-    st.subheader(L("adv_rules"))
-    c1, c2, c3 = st.columns(3)
-    with c1:
-        st.caption(L("max_night") + " — per doctor (edit in Doctors tab)")
-    with c2:
-        st.caption(L("max_week") + " — per doctor (edit in Doctors tab)")
-    with c3:
-        hol_txt = st.text_input(L("holidays"), ",".join(map(str, sorted(st.session_state.holidays))), key="hol_txt_rules")
-        hols = set()
-        for t in hol_txt.replace(" ", "").split(","):
-            if t.isdigit():
-                d = int(t)
-                if 1 <= d <= st.session_state.days:
-                    hols.add(d)
-        st.session_state.holidays = hols
-
-    st.subheader(L("colors"))
-    tcol1, tcol2 = st.columns([2,1])
-    def apply_template(name):
-        st.session_state.area_color_names = TEMPLATES[name].copy()
-        st.session_state.area_colors = {a: PALETTE[st.session_state.area_color_names[a]] for a in AREAS}
-    with tcol1:
-        st.caption(L("templates"))
-        tpl = st.selectbox(" ", [L("calm"), L("contrast")], index=0, key="tpl_select")
-        inv_tpl = {I18N["ar"]["calm"]:"calm", I18N["ar"]["contrast"]:"contrast",
-                   I18N["en"]["calm"]:"calm", I18N["en"]["contrast"]:"contrast"}
-        if st.button(L("apply_template"), key="btn_apply_tpl"):
-            apply_template(inv_tpl[tpl]); st.success("Template applied.")
-    with tcol2:
-        if st.button(L("reset_colors"), use_container_width=True, key="btn_reset_colors"):
-            st.session_state.area_color_names = DEFAULT_AREA_COLOR_NAMES.copy()
-            st.session_state.area_colors = {a: PALETTE[DEFAULT_AREA_COLOR_NAMES[a]] for a in AREAS}
-            st.success("Colors reset.")
-    st.caption(L("area_colors"))
-    sel_cols = st.columns(4)
-    color_labels = [L("yellow"), L("green"), L("blue"), L("red")]
-    key_from_label = {I18N["ar"]["yellow"]:"yellow", I18N["ar"]["green"]:"green", I18N["ar"]["blue"]:"blue", I18N["ar"]["red"]:"red",
-                      I18N["en"]["yellow"]:"yellow", I18N["en"]["green"]:"green", I18N["en"]["blue"]:"blue", I18N["en"]["red"]:"red"}
-    for idx, area in enumerate(AREAS):
-        with sel_cols[idx]:
-            label = LBL_AREA(area)
-            current = st.session_state.area_color_names.get(area, DEFAULT_AREA_COLOR_NAMES[area])
-            choice = st.selectbox(label, color_labels, index=["yellow","green","blue","red"].index(current), key=f"clr_{area}")
-            ckey = key_from_label[choice]
-            st.session_state.area_color_names[area] = ckey
-            st.session_state.area_colors[area] = PALETTE[ckey]
+if tab_open(tab_rules):
+    with tab_rules, profiling.phase("tab_rules"):
+        st.subheader(L("coverage"))
+        cols = st.columns(4)  # كان 3، الآن 4 أعمدة لأربع مناطق
+        new_cov = st.session_state.cov.copy()
+        for i, area in enumerate(AREAS):
+            with cols[i%4]:
+                st.markdown(f"**{LBL_AREA(area)}**")
+                for sh in SHIFTS:
+                    key = f"cov_{area}_{sh}"
+                    new_cov[(area, sh)] = st.number_input(
+                        f"{LBL_AREA(area)} — {LBL_SHIFT(sh)}",
+                        0, 40, int(st.session_state.cov[(area,sh)]), key=key
+                    )
+        st.session_state.cov = new_cov
+
+        st.subheader(L("group_caps"))
+        # the caps live in ss.group_caps: with lazy tabs this widget (and its key) is
+        # gone whenever another tab is open, while the Doctors tab still reads them
+        def _set_group_cap(g: str):
+            st.session_state.group_caps[g] = int(st.session_state[f"gcap_{g}"])
+        gc = st.columns(6)
+        for i, g in enumerate(["senior","g1","g2","g3","g4","g5"]):
+            with gc[i]:
+                st.number_input(f"{g}", min_value=0, max_value=31, value=int(st.session_state.group_caps[g]),
+                                key=f"gcap_{g}", on_change=_set_group_cap, args=(g,))
+        st.caption("Per-doctor caps are set below; these are defaults for new doctors.")
+
+        st.subheader(L("adv_rules"))
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            st.caption(L("max_night") + " — per doctor (edit in Doctors tab)")
+        with c2:
+            st.caption(L("max_week") + " — per doctor (edit in Doctors tab)")
+        with c3:
+            hol_txt = st.text_input(L("holidays"), ",".join(map(str, sorted(st.session_state.holidays))), key="hol_txt_rules")
+            hols = set()
+            for t in hol_txt.replace(" ", "").split(","):
+                if t.isdigit():
+                    d = int(t)
+                    if 1 <= d <= st.session_state.days:
+                        hols.add(d)
+            st.session_state.holidays = hols
+
+        st.subheader(L("colors"))
+        tcol1, tcol2 = st.columns([2,1])
+        def apply_template(name):
+            st.session_state.area_color_names = TEMPLATES[name].copy()
+            st.session_state.area_colors = {a: PALETTE[st.session_state.area_color_names[a]] for a in AREAS}
+        with tcol1:
+            st.caption(L("templates"))
+            tpl = st.selectbox(" ", [L("calm"), L("contrast")], index=0, key="tpl_select")
+            inv_tpl = {I18N["ar"]["calm"]:"calm", I18N["ar"]["contrast"]:"contrast",
+                       I18N["en"]["calm"]:"calm", I18N["en"]["contrast"]:"contrast"}
+            if st.button(L("apply_template"), key="btn_apply_tpl"):
+                apply_template(inv_tpl[tpl]); st.success("Template applied.")
+        with tcol2:
+            if st.button(L("reset_colors"), use_container_width=True, key="btn_reset_colors"):
+                st.session_state.area_color_names = DEFAULT_AREA_COLOR_NAMES.copy()
+                st.session_state.area_colors = {a: PALETTE[DEFAULT_AREA_COLOR_NAMES[a]] for a in AREAS}
+                st.success("Colors reset.")
+        st.caption(L("area_colors"))
+        sel_cols = st.columns(4)
+        color_labels = [L("yellow"), L("green"), L("blue"), L("red")]
+        key_from_label = {I18N["ar"]["yellow"]:"yellow", I18N["ar"]["green"]:"green", I18N["ar"]["blue"]:"blue", I18N["ar"]["red"]:"red",
+                          I18N["en"]["yellow"]:"yellow", I18N["en"]["green"]:"green", I18N["en"]["blue"]:"blue", I18N["en"]["red"]:"red"}
+        for idx, area in enumerate(AREAS):
+            with sel_cols[idx]:
+                label = LBL_AREA(area)
+                current = st.session_state.area_color_names.get(area, DEFAULT_AREA_COLOR_NAMES[area])
+                choice = st.selectbox(label, color_labels, index=["yellow","green","blue","red"].index(current), key=f"clr_{area}")
+                ckey = key_from_label[choice]
+                st.session_state.area_color_names[area] = ckey
+                st.session_state.area_colors[area] = PALETTE[ckey]
 
 # ---------- Doctors tab ----------
-with tab_docs:
-    st.subheader(L("add_list"))
-    txt = st.text_area(" ", height=120, key="add_list_box", placeholder="Dr. New A\nDr. New B")
-    if st.button(L("append"), key="btn_append"):
-        new_names = [n.strip() for n in txt.splitlines() if n.strip()]
-        added = 0
-        for n in new_names:
-            if n not in st.session_state.doctors:
-                st.session_state.doctors.append(n)
-                st.session_state.group_map[n] = "g3"
-                st.session_state.cap_map[n] = int(st.session_state.get("gcap_g3", 18))
-                st.session_state.allowed_shifts[n] = set(SHIFTS)
-                st.session_state.offdays[n] = set()
-                st.session_state.max_night_map[n] = 6
-                st.session_state.max_week_map[n] = 5
-                st.session_state.avoid_holidays_map[n] = False
-                added += 1
-        st.success(f"Added {added}")
-
-    st.divider()
-    rem_col1, rem_col2 = st.columns([2,1])
-    with rem_col2:
-        to_remove = st.selectbox(L("remove_doc"), ["—"] + st.session_state.doctors, key="rem_sel")
-        if st.button(L("remove"), key="rem_btn") and to_remove != "—":
-            st.session_state.doctors.remove(to_remove)
-            for d in ["group_map","cap_map","allowed_shifts","offdays","max_night_map","max_week_map","avoid_holidays_map"]:
-                st.session_state[d].pop(to_remove, None)
-            st.success(f"Removed {to_remove}")
-
-    st.divider()
-    st.subheader(L("edit_one"))
-    if st.session_state.doctors:
-        doc = st.selectbox(L("doctor"), st.session_state.doctors, key="edit_doc_sel")
-        grp = st.selectbox(L("group"), ["senior","g1","g2","g3","g4","g5"],
-                           index=["senior","g1","g2","g3","g4","g5"].index(st.session_state.group_map.get(doc,"g3")),
-                           key=f"group_{doc}")
-        st.session_state.group_map[doc] = grp
-        st.session_state.cap_map[doc] = st.number_input(L("cap"), 0, 31,
-                                                       value=int(st.session_state.cap_map.get(doc, 18)),
-                                                       key=f"cap_{doc}")
-        ch0, ch1, ch2 = st.columns(3)
-        checks = {}
-        for i, sh in enumerate(SHIFTS):
-            col = ch0 if i==0 else ch1 if i==1 else ch2
-            with col:
-                checks[sh] = st.checkbox(LBL_SHIFT(sh),
-                                         value=(sh in st.session_state.allowed_shifts.get(doc,set(SHIFTS))),
-                                         key=f"allow_{doc}_{sh}")
-        st.session_state.allowed_shifts[doc] = {s for s,v in checks.items() if v} or set(SHIFTS)
-
-        st.markdown(f"**{L('offdays')}**")
-        render_offday_calendar(doc)
-
-        st.markdown(f"**{L('adv_rules')}**")
-        a1, a2, a3 = st.columns(3)
-        with a1:
-            st.session_state.max_night_map[doc] = st.number_input(L("max_night"), 0, 31,
-                                                                  value=int(st.session_state.max_night_map.get(doc,6)),
-                                                                  key=f"maxN_{doc}")
-        with a2:
-            st.session_state.max_week_map[doc] = st.number_input(L("max_week"), 0, 7,
-                                                                 value=int(st.session_state.max_week_map.get(doc,5)),
-                                                                 key=f"maxW_{doc}")
-        with a3:
-            st.session_state.avoid_holidays_map[doc] = st.checkbox(L("avoid_holidays"),
-                                                                   value=bool(st.session_state.avoid_holidays_map.get(doc,False)),
-                                                                   key=f"avoidH_{doc}")
-
-# ---------- Generate tab ----------
-with tab_gen:
-    row1 = st.columns([2,1])
-    with row1[0]:
-        if st.button(L("run"), key="run_btn", type="primary", use_container_width=True):
-            random_generate()
-    with row1[1]:
-        if st.button(L("balance"), key="balance_btn", use_container_width=True):
-            balance_workload(); st.success(L("balanced_ok"))
-
-    if st.session_state.result_df.empty:
-        st.info(L("need_generate"))
-    else:
-        sheet = sheet_day_doctor(st.session_state.result_df, st.session_state.days, st.session_state.doctors)
-        dmap  = day_shift_map(st.session_state.result_df, st.session_state.days)
-        dcnts = daily_counts(st.session_state.result_df, st.session_state.days)
-        atot  = area_totals_from_daily_counts(dcnts)
-
-        vlabels = {"day_doctor": L("view_day_doctor"), "doctor_day": L("view_doctor_day"), "day_shift": L("view_day_shift")}
-        mode = st.radio(L("view_mode"),
-                        [vlabels["day_doctor"], vlabels["doctor_day"], vlabels["day_shift"]],
-                        index=["day_doctor","doctor_day","day_shift"].index(st.session_state.view_mode)
-                               if st.session_state.view_mode in ["day_doctor","doctor_day","day_shift"] else 0,
-                        key="view_select", horizontal=True)
-        inv = {v:k for k,v in vlabels.items()}
-        st.session_state.view_mode = inv.get(mode, "day_doctor")
-
-        st.subheader(L("cards_view"))
-        if st.session_state.view_mode == "day_doctor":
-            render_day_doctor_cards(sheet, int(st.session_state.year), int(st.session_state.month), st.session_state.doctors)
-        elif st.session_state.view_mode == "doctor_day":
-            render_doctor_day_cards(sheet, int(st.session_state.year), int(st.session_state.month), st.session_state.doctors)
-        else:
-            render_day_shift_cards(dmap, int(st.session_state.year), int(st.session_state.month))
+if tab_open(tab_docs):
+    with tab_docs, profiling.phase("tab_doctors"):
+        st.subheader(L("add_list"))
+        txt = st.text_area(" ", height=120, key="add_list_box", placeholder="Dr. New A\nDr. New B")
+        if st.button(L("append"), key="btn_append"):
+            new_names = [n.strip() for n in txt.splitlines() if n.strip()]
+            added = 0
+            for n in new_names:
+                if n not in st.session_state.doctors:
+                    st.session_state.doctors.append(n)
+                    st.session_state.group_map[n] = "g3"
+                    st.session_state.cap_map[n] = int(st.session_state.group_caps["g3"])
+                    st.session_state.allowed_shifts[n] = set(SHIFTS)
+                    st.session_state.offdays[n] = set()
+                    st.session_state.max_night_map[n] = 6
+                    st.session_state.max_week_map[n] = 5
+                    st.session_state.avoid_holidays_map[n] = False
+                    st.session_state.max_hours_map[n] = 0
+                    added += 1
+            st.success(f"Added {added}")
 
         st.divider()
-        render_daily_area_table(atot, int(st.session_state.year), int(st.session_state.month))
+        st.subheader(L("import_roster"))
+        st.caption(L("import_hint"))
+        up = st.file_uploader(" ", type=["csv","xlsx"] if OPENPYXL_AVAILABLE else ["csv"], key="roster_file")
+        imp1, imp2 = st.columns([2,1])
+        with imp1:
+            imp_replace = st.checkbox(L("import_replace"), value=False, key="roster_replace")
+        with imp2:
+            if st.button(L("import_btn"), key="roster_import_btn", use_container_width=True, disabled=up is None):
+                try:
+                    st.session_state.roster_report = import_roster_file(up.getvalue(), up.name, imp_replace)
+                except ValueError as e:
+                    st.error(str(e))
+        if "roster_report" in st.session_state:
+            report = st.session_state.roster_report
+            st.success(f"{L('import_done')}: +{report['added']} / ~{report['updated']} / -{report['removed']}")
+            if not report["rejected"].empty:
+                st.markdown(f"**{L('import_rejected')}**: {len(report['rejected'])}")
+                st.dataframe(report["rejected"], use_container_width=True, hide_index=True, height=200)
+        live = live_config_state()
+        st.download_button(L("download_roster"),
+                           data=lambda: roster_frame(config_from_session(absences=False, state=live)).to_csv(index=False).encode("utf-8"),
+                           file_name="ED_roster.csv", mime="text/csv", key="dl_roster")
 
         st.divider()
-        st.markdown(f"**{L('inline_edit')}**")
-        st.caption(L("inline_hint"))
-        base_grid = grid_doctor_day(st.session_state.result_df, st.session_state.days, st.session_state.doctors)
-        col_cfg = {str(d): st.column_config.SelectboxColumn(label=f"{d}/{st.session_state.month}",
-                                                            options=([""]+SHIFT_COLS_ORDER),
-                                                            required=False)
-                   for d in range(1, st.session_state.days+1)}
-        edited = st.data_editor(base_grid, column_config=col_cfg, num_rows="fixed",
-                                use_container_width=True, key="inline_grid", height=480)
-        c1, c2, c3 = st.columns([1,1,1])
-        with c1:
-            validate = st.checkbox(L("validate_constraints"), value=True, key="inline_validate")
-        with c2:
-            force = st.checkbox(L("force_override"), value=False, key="inline_force")
-        with c3:
-            if st.button(L("apply_changes"), use_container_width=True, key="inline_apply"):
-                invalid = apply_inline_changes(edited, validate=validate, force=force)
-                if invalid:
-                    st.error(L("invalid_edits"))
-                    st.dataframe(pd.DataFrame(invalid, columns=["doctor","day","code","reason"]),
-                                 use_container_width=True, height=220)
-                else:
-                    st.success(L("applied_ok"))
+        rem_col1, rem_col2 = st.columns([2,1])
+        with rem_col2:
+            to_remove = st.selectbox(L("remove_doc"), ["—"] + st.session_state.doctors, key="rem_sel")
+            if st.button(L("remove"), key="rem_btn") and to_remove != "—":
+                st.session_state.doctors.remove(to_remove)
+                for d in ["group_map","cap_map","allowed_shifts","offdays","max_night_map","max_week_map","avoid_holidays_map",
+                          "max_hours_map"]:
+                    st.session_state[d].pop(to_remove, None)
+                evict_doctor(st.session_state, to_remove)
+                st.success(f"Removed {to_remove}")
 
         st.divider()
-        c1, c2 = st.columns(2)
-        with c1:
-            st.subheader(L("gaps"))
-            st.dataframe(st.session_state.gaps, use_container_width=True, height=320)
-        with c2:
-            st.subheader(L("remain"))
-            st.dataframe(st.session_state.remain, use_container_width=True, height=320)
+        st.subheader(L("edit_one"))
+        render_doctor_editor()
 
-# ---------- Export ----------
-def export_excel(sheet: pd.DataFrame, gaps: pd.DataFrame, remain: pd.DataFrame,
-                 year:int, month:int, df_assign: pd.DataFrame) -> bytes:
-    if not XLSX_AVAILABLE: return b""
-    out = BytesIO()
-    wb = xlsxwriter.Workbook(out, {"in_memory": True})
-    hdr = wb.add_format({"bold":True,"align":"center","valign":"vcenter","bg_color":"#E8EEF9","border":1})
-    day_hdr = wb.add_format({"bold":True,"align":"center","valign":"vcenter","bg_color":"#EEF5FF","border":1})
-    cell = wb.add_format({"align":"center","valign":"vcenter","border":1})
-    left_hdr = wb.add_format({"bold":True,"align":"left","valign":"vcenter","bg_color":"#F8F9FE","border":1})
-    left_wrap = wb.add_format({"align":"left","valign":"top","border":1,"text_wrap":True})
-    blank = wb.add_format({"align":"center","valign":"vcenter","border":1})
-    ok_fmt = wb.add_format({"align":"center","valign":"vcenter","border":1,"bg_color":"#E7F7E9"})
-    short_fmt = wb.add_format({"align":"center","valign":"vcenter","border":1,"bg_color":"#FDEAEA"})
-
-    area_fmt = {
-        "fast": wb.add_format({"align":"center","valign":"vcenter","border":1,"bg_color": st.session_state.area_colors["fast"]}),
-        "resp_triage": wb.add_format({"align":"center","valign":"vcenter","border":1,"bg_color": st.session_state.area_colors["resp_triage"]}),
-        "acute": wb.add_format({"align":"center","valign":"vcenter","border":1,"bg_color": st.session_state.area_colors["acute"]}),
-        "resus": wb.add_format({"align":"center","valign":"vcenter","border":1,"bg_color": st.session_state.area_colors["resus"]}),
-    }
-
-    # Rota (Day×Doctor): colored cells with code text
-    ws = wb.add_worksheet("Rota")
-    ws.freeze_panes(1,1)
-    ws.set_column(0, 0, 14)
-    for c in range(sheet.shape[1]): ws.set_column(c+1, c+1, 18)
-    ws.write(0,0, L("day"), hdr)
-    for j, doc in enumerate(sheet.columns, start=1): ws.write(0,j, doc, hdr)
-    for i, day in enumerate(sheet.index, start=1):
-        wd = calendar.weekday(year, month, int(day))
-        wd_name = I18N[st.session_state.lang]["weekday"][wd]
-        ws.write(i,0, f"{int(day)}/{int(month)}\n{wd_name}", day_hdr)
-        ws.set_row(i, 24)
-        for j, doc in enumerate(sheet.columns, start=1):
-            v = sheet.loc[day, doc]
-            if pd.isna(v) or str(v).strip()=="":
-                ws.write(i,j,"",blank)
+# ---------- Generate tab ----------
+if tab_open(tab_gen):
+    with tab_gen, profiling.phase("tab_generate"):
+        busy = job_running()
+        if "job_msg" in st.session_state:
+            level, msg = st.session_state.pop("job_msg")
+            getattr(st, level)(msg)
+        row1 = st.columns([2,1])
+        with row1[0]:
+            if st.button(L("run"), key="run_btn", type="primary", use_container_width=True, disabled=busy):
+                random_generate()
+        with row1[1]:
+            if st.button(L("balance"), key="balance_btn", use_container_width=True, disabled=busy):
+                balance_workload()
+        row_n = st.columns([1,2])
+        with row_n[0]:
+            n_restarts = st.number_input(L("restarts"), 2, 500, value=16, key="restarts_input")
+        with row_n[1]:
+            if st.button(L("best_of_n"), key="best_of_n_btn", use_container_width=True, disabled=busy):
+                best_of_n_generate(n_restarts)
+        if "restart_scores" in st.session_state:
+            with st.expander(f"{L('restart_summary')} — {L('best_seed')}: {st.session_state.best_seed}"):
+                st.dataframe(st.session_state.restart_scores, use_container_width=True, height=220, hide_index=True)
+        row_ls = st.columns([1,2])
+        with row_ls[0]:
+            ls_budget = st.number_input(L("improve_budget"), 1, 600, value=5, key="improve_budget_input")
+        with row_ls[1]:
+            if st.button(L("improve"), key="improve_btn", use_container_width=True,
+                         disabled=busy or st.session_state.result_df.empty):
+                improve_rota(ls_budget)
+        row2 = st.columns([1,2])
+        with row2[0]:
+            solve_limit = st.number_input(L("solve_time"), 1, 600, value=30, key="solve_time_input")
+        with row2[1]:
+            if st.button(L("solve"), key="solve_btn", use_container_width=True, disabled=busy or not ORTOOLS_AVAILABLE):
+                solve_optimal(time_limit=solve_limit)
+            if not ORTOOLS_AVAILABLE: st.caption(L("ortools_na"))
+        with st.expander(L("repair")):
+            st.caption(L("repair_hint"))
+            row_r = st.columns([2,1,1,1])
+            with row_r[0]:
+                r_doc = st.selectbox(L("doctor"), st.session_state.doctors, key="repair_doc")
+            with row_r[1]:
+                r_from = st.number_input(L("repair_from"), 1, int(st.session_state.days), value=1, key="repair_from")
+            with row_r[2]:
+                r_to = st.number_input(L("repair_to"), 1, int(st.session_state.days), value=int(r_from), key="repair_to")
+            with row_r[3]:
+                if st.button(L("repair_btn"), key="repair_btn", use_container_width=True,
+                             disabled=st.session_state.result_df.empty):
+                    diff = repair_absence(r_doc, set(range(int(r_from), max(int(r_from), int(r_to))+1)))
+                    st.success(f"{L('repair_done')}: {len(diff)}")
+            if "last_repair" in st.session_state and not st.session_state.last_repair.empty:
+                st.dataframe(st.session_state.last_repair, use_container_width=True, hide_index=True)
+        with st.expander(L("horizon")):
+            st.caption(L("horizon_hint"))
+            row_h = st.columns([1,1,2])
+            with row_h[0]:
+                h_months = st.number_input(L("horizon_months"), 2, 24, value=3, key="horizon_months_input")
+            with row_h[1]:
+                h_improve = st.number_input(L("horizon_improve"), 0, 120, value=0, key="horizon_improve_input")
+            with row_h[2]:
+                if st.button(L("horizon_btn"), key="horizon_btn", use_container_width=True):
+                    plan_horizon(h_months, h_improve)
+            if "horizon" in st.session_state:
+                hz = st.session_state.horizon
+                st.dataframe(hz.summary(), use_container_width=True, hide_index=True)
+                st.download_button(L("download_csv"), data=lambda: hz.to_frame().to_csv(index=False).encode("utf-8"),
+                                   file_name="ED_rota_horizon.csv", mime="text/csv", key="dl_horizon")
+                if XLSX_AVAILABLE:
+                    h_lang, h_colors = st.session_state.lang, dict(st.session_state.area_colors)
+                    st.download_button(L("download_xlsx"), data=lambda: horizon_excel(hz.configs, hz.frames, h_lang, h_colors),
+                                       file_name="ED_rota_horizon.xlsx",
+                                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                       key="dl_horizon_xlsx")
+
+        if st.session_state.result_df.empty:
+            st.info(L("need_generate"))
+        else:
+            rota_key = frame_key(st.session_state.result_df)
+            # the HTML builders cache on this key, so anything else that shapes a table goes in too
+            view_key = f"{rota_key}:{st.session_state.days}:{hash(tuple(sorted(st.session_state.cov.items())))}"
+            sheet, dmap, base_grid = current_views()
+            atot  = current_coverage().area_totals()
+
+            vlabels = {"day_doctor": L("view_day_doctor"), "doctor_day": L("view_doctor_day"), "day_shift": L("view_day_shift")}
+            mode = st.radio(L("view_mode"),
+                            [vlabels["day_doctor"], vlabels["doctor_day"], vlabels["day_shift"]],
+                            index=["day_doctor","doctor_day","day_shift"].index(st.session_state.view_mode)
+                                   if st.session_state.view_mode in ["day_doctor","doctor_day","day_shift"] else 0,
+                            key="view_select", horizontal=True)
+            inv = {v:k for k,v in vlabels.items()}
+            st.session_state.view_mode = inv.get(mode, "day_doctor")
+
+            st.subheader(L("cards_view"))
+            if st.session_state.view_mode == "day_doctor":
+                render_day_doctor_cards(sheet, int(st.session_state.year), int(st.session_state.month), st.session_state.doctors, view_key)
+            elif st.session_state.view_mode == "doctor_day":
+                render_doctor_day_cards(sheet, int(st.session_state.year), int(st.session_state.month), st.session_state.doctors, view_key)
             else:
-                code = str(v).upper().strip()
-                area = LETTER_TO_AREA.get(code[0], None)
-                fmt = area_fmt.get(area, cell)
-                ws.write(i,j, code, fmt)
-
-    # Doctor×Day
-    wsD = wb.add_worksheet("Doctor×Day")
-    wsD.freeze_panes(1,1)
-    wsD.set_column(0, 0, 24)
-    for c in range(len(sheet.index)): wsD.set_column(c+1, c+1, 12)
-    wsD.write(0,0, L("doctor"), hdr)
-    for j, day in enumerate(sheet.index, start=1):
-        wd = calendar.weekday(year, month, int(day))
-        wd_name = I18N[st.session_state.lang]["weekday"][wd]
-        wsD.write(0,j, f"{int(day)}/{int(month)}\n{wd_name}", hdr)
-    for i, doc in enumerate(sheet.columns, start=1):
-        wsD.write(i,0, doc, left_hdr)
-        wsD.set_row(i, 20)
-        for j, day in enumerate(sheet.index, start=1):
-            v = sheet.loc[day, doc]
-            if pd.isna(v) or str(v).strip()=="":
-                wsD.write(i,j,"", blank)
+                render_day_shift_cards(dmap, int(st.session_state.year), int(st.session_state.month), view_key)
+
+            st.divider()
+            render_daily_area_table(atot, int(st.session_state.year), int(st.session_state.month), view_key)
+
+            st.divider()
+            st.markdown(f"**{L('inline_edit')}**")
+            st.caption(L("inline_hint"))
+            col_cfg = {str(d): st.column_config.SelectboxColumn(label=f"{d}/{st.session_state.month}",
+                                                                options=([""]+SHIFT_COLS_ORDER),
+                                                                required=False)
+                       for d in range(1, st.session_state.days+1)}
+            with profiling.phase("data_editor"):
+                edited = st.data_editor(base_grid, column_config=col_cfg, num_rows="fixed",
+                                        use_container_width=True, key="inline_grid", height=480)
+            c1, c2, c3 = st.columns([1,1,1])
+            with c1:
+                validate = st.checkbox(L("validate_constraints"), value=True, key="inline_validate")
+            with c2:
+                force = st.checkbox(L("force_override"), value=False, key="inline_force")
+            with c3:
+                if st.button(L("apply_changes"), use_container_width=True, key="inline_apply"):
+                    invalid = apply_inline_changes(edited, validate=validate, force=force)
+                    if invalid:
+                        st.error(L("invalid_edits"))
+                        st.dataframe(pd.DataFrame(invalid, columns=["doctor","day","code","reason"]),
+                                     use_container_width=True, height=220)
+                    else:
+                        st.success(L("applied_ok"))
+                    if force:
+                        found = current_audit()
+                        if not found.empty:
+                            st.warning(f"{L('audit')}: {len(found)}")
+                            st.dataframe(audit_summary(found), use_container_width=True, hide_index=True)
+
+            st.divider()
+            c1, c2 = st.columns(2)
+            with c1:
+                st.subheader(L("gaps"))
+                st.dataframe(st.session_state.gaps, use_container_width=True, height=320)
+            with c2:
+                st.subheader(L("remain"))
+                st.dataframe(st.session_state.remain, use_container_width=True, height=320)
+
+            st.divider()
+            st.subheader(L("fairness"))
+            fair = current_fairness()
+            head = fair.headline()
+            m1, m2, m3, m4, m5 = st.columns(5)
+            m1.metric(L("gini_shifts"), head["gini_shifts"])
+            m2.metric(L("gini_nights"), head["gini_nights"])
+            m3.metric(L("gini_weekends"), head["gini_weekends"])
+            m4.metric(L("rest_violations"), head["rest_violations"])
+            m5.metric(L("longest_streak"), head["longest_streak"])
+            st.caption(L("fairness_hint"))
+            f1, f2, f3 = st.tabs([L("fair_summary"), L("fair_groups"), L("fair_doctors")])
+            with f1: st.dataframe(fair.summary(), use_container_width=True, hide_index=True)
+            with f2: st.dataframe(fair.groups(), use_container_width=True, hide_index=True)
+            with f3: st.dataframe(fair.doctors, use_container_width=True, height=320, hide_index=True)
+
+            st.divider()
+            st.subheader(L("audit"))
+            found = current_audit()
+            st.caption(L("audit_hint"))
+            if found.empty:
+                st.success(L("audit_ok"))
             else:
-                code = str(v).upper().strip()
-                area = LETTER_TO_AREA.get(code[0], None)
-                fmt = area_fmt.get(area, cell)
-                wsD.write(i,j, code, fmt)
-
-    # Coverage gaps
-    ws2 = wb.add_worksheet("Coverage gaps")
-    cols = ["day","shift","area","abbr","required","assigned","short_by"]
-    for j,cname in enumerate(cols): ws2.write(0,j,cname,hdr)
-    for i,row in enumerate(gaps.itertuples(index=False), start=1):
-        for j,cname in enumerate(cols):
-            ws2.write(i,j, getattr(row,cname) if hasattr(row,cname) else row[j], cell)
-
-    # Remaining capacity
-    ws3 = wb.add_worksheet("Remaining capacity")
-    cols2 = ["doctor","assigned","cap","remaining"]
-    for j,cname in enumerate(cols2): ws3.write(0,j,cname,hdr)
-    for i,row in enumerate(st.session_state.remain.itertuples(index=False), start=1):
-        for j,cname in enumerate(cols2):
-            ws3.write(i,j, getattr(row,cname) if hasattr(row,cname) else row[j], cell)
-
-    # ByShift (names)
-    ws4 = wb.add_worksheet("ByShift")
-    ws4.freeze_panes(1,1)
-    ws4.set_column(0, 0, 14)
-    for c in range(len(SHIFT_COLS_ORDER)): ws4.set_column(c+1, c+1, 24)
-    ws4.write(0,0, L("day"), hdr)
-    for j, code in enumerate(SHIFT_COLS_ORDER, start=1): ws4.write(0,j, f"{code}", hdr)
-    def day_shift_map_export(df: pd.DataFrame, days:int):
-        m = {d:{c:[] for c in SHIFT_COLS_ORDER} for d in range(1, days+1)}
-        if df.empty: return m
-        for r in df.itertuples(index=False):
-            d = int(r.day); code = str(r.code)
-            if code in m[d]: m[d][code].append(r.doctor)
-        for d in m:
-            for c in m[d]: m[d][c] = sorted(m[d][c])
-        return m
-    dmap = day_shift_map_export(df_assign, st.session_state.days)
-    for i, day in enumerate(sorted(dmap.keys()), start=1):
-        wd = calendar.weekday(year, month, int(day))
-        wd_name = I18N[st.session_state.lang]["weekday"][wd]
-        ws4.write(i,0, f"{int(day)}/{int(month)}\n{wd_name}", hdr)
-        ws4.set_row(i, 30)
-        for j, code in enumerate(SHIFT_COLS_ORDER, start=1):
-            names = dmap[day].get(code, [])
-            area = LETTER_TO_AREA.get(code[0], None)
-            fmt = area_fmt.get(area, left_wrap)
-            ws4.write(i,j, "\n".join(names), fmt)
-
-    # Daily Dashboard
-    ws5 = wb.add_worksheet("Daily Dashboard")
-    ws5.freeze_panes(1,1)
-    ws5.set_column(0, 0, 16)
-    for c in range(len(SHIFT_COLS_ORDER)): ws5.set_column(c+1, c+1, 12)
-    ws5.write(0,0, L("day"), hdr)
-    for j, code in enumerate(SHIFT_COLS_ORDER, start=1): ws5.write(0,j, code, hdr)
-    dcnts = daily_counts(df_assign, st.session_state.days)
-    for i, day in enumerate(range(1, st.session_state.days+1), start=1):
-        wd = calendar.weekday(year, month, int(day))
-        wd_name = I18N[st.session_state.lang]["weekday"][wd]
-        ws5.write(i,0, f"{int(day)}/{int(month)}\n{wd_name}", hdr)
-        ws5.set_row(i, 20)
-        for j, code in enumerate(SHIFT_COLS_ORDER, start=1):
-            a, r, short = dcnts[day][code]
-            fmt = ok_fmt if short==0 else short_fmt
-            ws5.write(i,j, f"{a}/{r}", fmt)
-
-    # Area Totals
-    ws6 = wb.add_worksheet("Area Totals")
-    ws6.freeze_panes(1,1)
-    ws6.set_column(0, 0, 22)
-    for c in range(st.session_state.days): ws6.set_column(c+1, c+1, 12)
-    ws6.write(0,0, "Area" if st.session_state.lang=="en" else "القسم", hdr)
-    for j, d in enumerate(range(1, st.session_state.days+1), start=1):
-        wd = calendar.weekday(year, month, int(d))
-        wd_name = I18N[st.session_state.lang]["weekday"][wd]
-        ws6.write(0,j, f"{int(d)}/{int(month)}\n{wd_name}", hdr)
-    dcnts = daily_counts(df_assign, st.session_state.days)
-    atot = area_totals_from_daily_counts(dcnts)
-    for i, area in enumerate(["fast","resp_triage","acute","resus"], start=1):
-        ws6.write(i,0, AREA_LABEL[st.session_state.lang][area], left_hdr)
-        ws6.set_row(i, 20)
-        for j, d in enumerate(range(1, st.session_state.days+1), start=1):
-            a, r, short = atot[d][area]
-            fmt = ok_fmt if short==0 else short_fmt
-            ws6.write(i,j, f"{a}/{r}", fmt)
-
-    wb.close()
-    return out.getvalue()
-
-def export_pdf(sheet: pd.DataFrame, year:int, month:int) -> bytes:
-    if not REPORTLAB_AVAILABLE:
-        return b""
-    buf = BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=landscape(A4), leftMargin=20, rightMargin=20, topMargin=20, bottomMargin=20)
-    styles = getSampleStyleSheet()
-    story = []
-    title = f"ED Rota — {month}/{year}"
-    story.append(Paragraph(title, styles["Title"]))
-    story.append(Spacer(1, 6))
-
-    header = ["Day"] + list(sheet.columns)
-    data = [header]
-    for day in sheet.index:
-        wd = I18N[st.session_state.lang]["weekday"][calendar.weekday(year, month, int(day))]
-        row = [f"{int(day)}/{int(month)}\n{wd}"]
-        for docname in sheet.columns:
-            v = sheet.loc[day, docname]
-            row.append("" if (pd.isna(v) or str(v).strip()=="") else str(v).upper().strip())
-        data.append(row)
-
-    tbl = Table(data, repeatRows=1)
-    base = [
-        ('FONT', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#EEF5FF")),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('GRID', (0,0), (-1,-1), 0.3, colors.HexColor("#CCCCCC")),
-    ]
-    for i, day in enumerate(sheet.index, start=1):
-        for j, docname in enumerate(sheet.columns, start=1):
-            v = sheet.loc[day, docname]
-            if pd.isna(v) or str(v).strip()=="": continue
-            code = str(v).upper().strip()
-            area = LETTER_TO_AREA.get(code[0], None)
-            bg = st.session_state.area_colors.get(area, "#FFFFFF")
-            base.append(('BACKGROUND', (j,i), (j,i), colors.HexColor(bg)))
-    tbl.setStyle(TableStyle(base))
-    story.append(tbl)
-    doc.build(story)
-    return buf.getvalue()
+                a1, a2 = st.tabs([L("audit_rules"), L("audit_list")])
+                with a1: st.dataframe(audit_summary(found), use_container_width=True, hide_index=True)
+                with a2: st.dataframe(found, use_container_width=True, height=320, hide_index=True)
+
+# ---------- Export ----------
+# ---------- Export cache ----------
+@profiling.timed()
+def export_inputs() -> dict:
+    """Plain snapshot of everything the exporters read, safe to hand to the download thread."""
+    ss = st.session_state
+    return {"df": ss.result_df, "gaps": ss.gaps, "remain": ss.remain, "doctors": list(ss.doctors),
+            "days": int(ss.days), "year": int(ss.year), "month": int(ss.month), "lang": ss.lang,
+            "area_colors": dict(ss.area_colors), "cov": dict(ss.cov), "stats": current_coverage(),
+            "fairness": current_fairness(), "violations": current_audit()}
+
+def export_key(inp: dict) -> str:
+    """Content hash of the rota plus every setting that changes the exported bytes."""
+    h = hashlib.sha1()
+    for frame in (inp["df"], inp["remain"], inp["fairness"].doctors, inp["violations"]):
+        h.update(frame_key(frame).encode())
+    h.update(repr((inp["doctors"], inp["days"], inp["year"], inp["month"], inp["lang"],
+                   sorted(inp["area_colors"].items()), sorted(inp["cov"].items()))).encode())
+    return h.hexdigest()
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def cached_excel(key: str, _inp: dict) -> bytes:
+    sheet = sheet_day_doctor(_inp["df"], _inp["days"], _inp["doctors"])
+    return export_excel(sheet, _inp["gaps"], _inp["remain"], _inp["year"], _inp["month"], _inp["df"],
+                        _inp["days"], _inp["lang"], _inp["area_colors"], _inp["cov"], _inp["stats"],
+                        fairness=_inp["fairness"], violations=_inp["violations"])
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def cached_pdf(key: str, _inp: dict) -> bytes:
+    sheet = sheet_day_doctor(_inp["df"], _inp["days"], _inp["doctors"])
+    return export_pdf(sheet, _inp["year"], _inp["month"], _inp["lang"], _inp["area_colors"])
 
 # ---------- Export tab ----------
-with tab_export:
-    if st.session_state.result_df.empty:
-        st.info(L("need_generate"))
-    else:
-        sheet = sheet_day_doctor(st.session_state.result_df, st.session_state.days, st.session_state.doctors)
-        if XLSX_AVAILABLE:
-            data_x = export_excel(sheet, st.session_state.gaps, st.session_state.remain,
-                                  int(st.session_state.year), int(st.session_state.month), st.session_state.result_df)
-            st.download_button(L("download_xlsx"), data=data_x,
-                               file_name="ED_rota.xlsx",
-                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                               key="dl_xlsx", use_container_width=True)
-        pdf_bytes = export_pdf(sheet, int(st.session_state.year), int(st.session_state.month))
-        if REPORTLAB_AVAILABLE and pdf_bytes:
-            st.download_button(L("download_pdf"), data=pdf_bytes,
-                               file_name="ED_rota.pdf",
-                               mime="application/pdf",
-                               key="dl_pdf", use_container_width=True)
+if tab_open(tab_export):
+    with tab_export, profiling.phase("tab_export"):
+        if st.session_state.result_df.empty:
+            st.info(L("need_generate"))
         else:
-            st.info(L("pdf_na"))
+            # bytes are built only when a download is clicked, then memoised by content hash
+            exp_inp = export_inputs()
+            exp_key = export_key(exp_inp)
+            if XLSX_AVAILABLE:
+                st.download_button(L("download_xlsx"), data=lambda: cached_excel(exp_key, exp_inp),
+                                   file_name="ED_rota.xlsx",
+                                   mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                   key="dl_xlsx", use_container_width=True)
+            if REPORTLAB_AVAILABLE:
+                st.download_button(L("download_pdf"), data=lambda: cached_pdf(exp_key, exp_inp),
+                                   file_name="ED_rota.pdf",
+                                   mime="application/pdf",
+                                   key="dl_pdf", use_container_width=True)
+            else:
+                st.info(L("pdf_na"))
+
+# ===== Profiling report =====
+profiling.count("session_keys", len(st.session_state.keys()))
+_rec = profiling.end()
+if _rec is not None:
+    hist = report_profile(_rec)
+    if st.session_state.get("debug_profile"):
+        with st.sidebar.expander(L("profile_last"), expanded=True):
+            st.code(_rec.log_line(), language=None)
+            st.dataframe(_rec.table(), use_container_width=True, hide_index=True)
+            if _rec.counts: st.json(_rec.counts)
+            st.download_button(L("profile_json"), data="\n".join(json.dumps(h, ensure_ascii=False) for h in hist),
+                               file_name="rota_profile.jsonl", mime="application/json", key="dl_profile")
+            prof = _rec.cprofile_text()
+            if prof:
+                st.caption(L("profile_cprofile"))
+                st.code(prof, language=None)
+        with st.sidebar.expander(L("session_memory")):
+            fp = footprint(st.session_state)
+            st.caption(L("session_memory_total").format(keys=int(fp["keys"].sum()), kb=fp["bytes"].sum()/1024))
+            st.dataframe(fp, use_container_width=True, hide_index=True, height=240)
@@ -0,0 +1,14 @@
+"""Headless ED rota engine: config, constraint checks, generators and exporters.
+
+The Streamlit app (app.py) is one front end; ``python -m rota`` is another."""
+
+from .engine import (RotaConfig, RotaState, EditBuffer, CoverageStats, constraints_ok, rules_ok,
+                     eligibility_matrix, greedy_pass, best_of_n, balance, solve_optimal, local_search,
+                     rota_score, rota_tables, remaining_table, apply_grid_edits, ORTOOLS_AVAILABLE)
+from .facility import Area, ShiftDef, Facility, DEFAULT_FACILITY
+from .compact import CompactRota
+from .metrics import FairnessStats, gini
+from .audit import audit_rota, audit_summary
+from .jobs import Job
+from .export import (export_excel, export_pdf, rota_excel, rota_pdf, write_excel, write_rota_excel, write_horizon_excel,
+                     horizon_excel, XLSX_AVAILABLE, REPORTLAB_AVAILABLE)
@@ -0,0 +1,4 @@
+from .cli import main
+
+if __name__ == "__main__":  # best_of_n's spawned workers import this module as __mp_main__
+    raise SystemExit(main())
@@ -0,0 +1,111 @@
+# rota/audit.py — every rule broken by a finished rota, in one pass
+# -----------------------------------------
+# constraints_ok answers "may this doctor take this slot now?"; audit_rota answers
+# "which cells of this rota break a rule?" for all of them at once. Each rule is a
+# boolean doctor × day mask built from the shift/area index matrices (cumulative sums
+# for the counting limits, shifted slices for rest and streaks), so a full re-check
+# after an edit costs a few array operations. Rule names match constraints_ok's reasons.
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .engine import RotaConfig, iso_week
+from .compact import CompactRota
+
+AUDIT_COLUMNS = ["doctor","day","rule","detail"]
+
+def _per_doc(cfg: RotaConfig, m: Dict[str,int], default: int) -> np.ndarray:
+    return np.array([int(m.get(n, default)) for n in cfg.doctors], dtype=np.int64).reshape(-1, 1)
+
+def audit_rota(cfg: RotaConfig, df: pd.DataFrame) -> pd.DataFrame:
+    """All rule violations in `df` as (doctor, day, rule, detail), by day then doctor.
+
+    Counting limits (cap, min_off, nights, ISO week, hours) flag the assignments past
+    the limit in day order, so the listed cells are the ones to remove. Streaks flag
+    every day beyond max_consec, rest the second day of the pair, and the rolling
+    hours limit the last day of each window over it. Days are this month's only."""
+    fac = cfg.facility; days = int(cfg.days); docs = list(cfg.doctors)
+    found: List[Tuple[np.ndarray, str, object, str]] = []  # (mask, rule, detail: str or doctor×day array, format)
+    def flag(mask, rule, detail="", fmt="{}"):
+        if mask.any(): found.append((mask, rule, detail, fmt))
+
+    rota = CompactRota.from_frame(df, days, docs, fac)
+    S = rota.shift_matrix(); A = rota.area_matrix()
+    worked = S >= 0
+    si = np.where(worked, S, 0); ai = np.where(worked, A, 0)
+    day_no = np.arange(1, days+1)
+
+    # static rules: off-days, holiday preference, group → area, allowed shifts
+    off = np.zeros((len(docs), days), dtype=bool)
+    for i, n in enumerate(docs):
+        ds = [d-1 for d in cfg.offdays.get(n, ()) if 1 <= d <= days]
+        if ds: off[i, ds] = True
+    flag(worked & off, "off-day")
+    avoid = np.array([bool(cfg.avoid_holidays_map.get(n, False)) for n in docs], dtype=bool).reshape(-1, 1)
+    flag(worked & avoid & np.isin(day_no, list(cfg.holidays))[None, :], "holiday preference")
+    gpos = {g:i for i,g in enumerate(fac.groups)}
+    area_ok = np.zeros((len(docs), len(fac.areas)), dtype=bool)
+    shift_ok = np.zeros((len(docs), len(fac.shifts)), dtype=bool)
+    for i, n in enumerate(docs):
+        if cfg.group_map.get(n) in gpos: area_ok[i] = fac.group_mask[gpos[cfg.group_map[n]]]
+        for sh in cfg.allowed_shifts.get(n, fac.shifts): shift_ok[i, fac.shift_idx[sh]] = True
+    rows = np.arange(len(docs))[:, None]
+    flag(worked & ~area_ok[rows, ai], "area not allowed")
+    flag(worked & ~shift_ok[rows, si], "shift not allowed")
+
+    # counting limits: the assignments past the limit, in day order
+    count = np.cumsum(worked, axis=1)
+    cap = _per_doc(cfg, cfg.cap_map, 0)
+    flag(worked & (count > cap), "cap reached", np.broadcast_to(cap, worked.shape), "cap {}")
+    flag(worked & (count > days - int(cfg.min_off)), "min off-days", f"max {days - int(cfg.min_off)} shifts")
+    night = worked & np.isin(S, [fac.shift_idx[s] for s in fac.night])
+    max_night = _per_doc(cfg, cfg.max_night_map, 999)
+    flag(night & (np.cumsum(night, axis=1) > max_night), "max night reached",
+         np.broadcast_to(max_night, worked.shape), "max {}")
+    week = np.array([iso_week(cfg.year, cfg.month, d) for d in day_no])
+    max_week = _per_doc(cfg, cfg.max_week_map, 999)
+    in_week = np.zeros_like(count)
+    for wk in np.unique(week):
+        cols = week == wk
+        in_week[:, cols] = np.cumsum(worked[:, cols], axis=1)
+    flag(worked & (in_week > max_week), "weekly limit", np.broadcast_to(max_week, worked.shape), "max {}")
+    hours = np.where(worked, fac.hours[si], 0)
+    max_hours = _per_doc(cfg, cfg.max_hours_map, 0)
+    flag(worked & (max_hours > 0) & (np.cumsum(hours, axis=1) > max_hours), "hour cap reached",
+         np.broadcast_to(max_hours, worked.shape), "cap {} h")
+    if int(cfg.max_hours_week) > 0:
+        csum = np.concatenate([np.zeros((len(docs), 1), dtype=np.int64), np.cumsum(hours, axis=1)], axis=1)
+        window = csum[:, 1:] - csum[:, np.maximum(0, day_no - 7)]  # hours on days e-6..e
+        flag(worked & (window > int(cfg.max_hours_week)), "7-day hours limit", window, "{} h in 7 days")
+
+    # sequence rules: rest between consecutive days, streak length
+    if int(cfg.min_rest) > 0 and days > 1:
+        gap = fac.rest[si[:, :-1], si[:, 1:]]
+        bad = np.zeros_like(worked)
+        bad[:, 1:] = worked[:, :-1] & worked[:, 1:] & (gap < int(cfg.min_rest))
+        gap_full = np.zeros(worked.shape, dtype=np.int64); gap_full[:, 1:] = gap
+        flag(bad, "rest (prev→today)", gap_full, "{} h rest")
+    streak = np.zeros(worked.shape, dtype=np.int64); run = np.zeros(len(docs), dtype=np.int64)
+    for t in range(days):
+        run = (run + 1) * worked[:, t]; streak[:, t] = run
+    flag(streak > int(cfg.max_consec), "max consecutive days", streak, "day {} in a row")
+
+    out = []
+    for mask, rule, detail, fmt in found:
+        i, t = np.nonzero(mask)
+        vals = detail[i, t].tolist() if isinstance(detail, np.ndarray) else [detail]*len(i)
+        out += [(docs[a], int(b)+1, rule, fmt.format(v)) for a, b, v in zip(i.tolist(), t.tolist(), vals)]
+    if not df.empty:
+        dup = df[df.duplicated(["doctor","day"], keep="first")]
+        out += [(n, int(d), "already assigned", "") for n, d in zip(dup["doctor"], dup["day"])]
+    res = pd.DataFrame(out, columns=AUDIT_COLUMNS)
+    return res.sort_values(["day","doctor","rule"], kind="stable").reset_index(drop=True)
+
+def audit_summary(violations: pd.DataFrame) -> pd.DataFrame:
+    """Violation counts per rule, most frequent first."""
+    if violations.empty: return pd.DataFrame(columns=["rule","count","doctors"])
+    g = violations.groupby("rule")
+    out = pd.DataFrame({"count": g.size(), "doctors": g["doctor"].nunique()}).reset_index()
+    return out.sort_values(["count","rule"], ascending=[False, True]).reset_index(drop=True)
@@ -0,0 +1,208 @@
+# rota/bench.py — reproducible performance benchmark
+# -----------------------------------------
+# python -m rota.bench --out bench.json            full grid (50/200/1000 doctors × 28–31 days × densities)
+# python -m rota.bench --quick                      50 doctors, one month, one density
+# python -m rota.bench --compare old.json new.json  per-case wall-time / memory / short_by ratios
+#
+# Rosters are synthetic but seeded, so the same arguments give the same inputs on every
+# commit. Wall time comes from an untraced run; peak memory from a second run under
+# tracemalloc (Python allocations, including NumPy/pandas buffers).
+
+import argparse, json, platform, random, subprocess, sys, time, tracemalloc
+from typing import Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import engine, render
+from .engine import (SHIFTS, GROUP_CAP, DEFAULT_COV, DEFAULT_GROUP_MAP, SHIFT_COLS_ORDER,
+                     RotaConfig, RotaState, CoverageStats)
+from .compact import CompactRota
+from .metrics import FairnessStats
+from .audit import audit_rota
+from .export import export_excel, export_pdf, DEFAULT_AREA_COLORS, XLSX_AVAILABLE, REPORTLAB_AVAILABLE
+
+SIZES = [50, 200, 1000]
+DAYS = [28, 29, 30, 31]
+DENSITIES = [0.6, 0.8, 0.95]
+MONTH_FOR_DAYS = {28: (2025, 2), 29: (2024, 2), 30: (2025, 9), 31: (2025, 10)}
+
+def synthetic_config(n_doctors: int, days: int, density: float, seed: int = 0) -> RotaConfig:
+    """Seeded roster of n doctors in the default roster's group mix.
+
+    Coverage is scaled so the month's required slots are `density` × the roster's
+    usable capacity (min(cap, days - min_off) summed over doctors), split across the
+    twelve slots in the proportions of the default coverage table."""
+    rng = random.Random(seed)
+    year, month = MONTH_FOR_DAYS[days]
+    mix = [DEFAULT_GROUP_MAP[n] for n in DEFAULT_GROUP_MAP]
+    cfg = RotaConfig(year=year, month=month, days=days)
+    for i in range(n_doctors):
+        group = mix[i % len(mix)]
+        allowed = [rng.choice(SHIFTS)] if rng.random() < 0.12 else None
+        off = rng.sample(range(1, days+1), rng.randint(0, 3))
+        cfg.add_doctor(f"Dr. S{i:04d}", group, GROUP_CAP[group], allowed, off, avoid_holidays=rng.random() < 0.1)
+    cfg.holidays = set(rng.sample(range(1, days+1), 2))
+    capacity = sum(min(cfg.cap_map[n], days - cfg.min_off) for n in cfg.doctors) / days
+    weight = sum(DEFAULT_COV.values())
+    cfg.cov = {k: max(0, round(density * capacity * v / weight)) for k, v in DEFAULT_COV.items()}
+    return cfg
+
+def measure(fn: Callable, memory: bool = True) -> Tuple[object, float, float]:
+    """(result, wall seconds, peak MiB or None) — timing and tracing are separate runs."""
+    t0 = time.perf_counter(); out = fn(); wall = time.perf_counter() - t0
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn(); peak = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return out, wall, peak
+
+def _short(cfg: RotaConfig, df: pd.DataFrame) -> int:
+    return CoverageStats(df, cfg.days, cfg.cov).total_short
+
+def _edit_grid(cfg: RotaConfig, df: pd.DataFrame, seed: int) -> pd.DataFrame:
+    """The doctor × day grid with ~1% of cells changed, like a round of inline edits."""
+    rng = random.Random(seed)
+    grid = engine.grid_doctor_day(df, cfg.days, cfg.doctors)
+    vals = grid.to_numpy(dtype=object, copy=True)
+    for _ in range(max(1, vals.size // 100)):
+        i, j = rng.randrange(vals.shape[0]), rng.randrange(vals.shape[1])
+        vals[i, j] = rng.choice([""] + SHIFT_COLS_ORDER)
+    return pd.DataFrame(vals, index=grid.index, columns=grid.columns)
+
+def bench_case(cfg: RotaConfig, seed: int = 0, memory: bool = True, restarts: int = 4, improve_s: float = 2.0,
+               solve_s: float = 0.0, pdf_max_doctors: int = 200) -> List[dict]:
+    """Time every engine and downstream step on one config; one record per step."""
+    rows = []
+    def rec(case, fn, quality=None):
+        out, wall, peak = measure(fn, memory)
+        row = {"case": case, "wall_s": round(wall, 4), "peak_mib": None if peak is None else round(peak, 2)}
+        if quality is not None: row["short_by"] = int(quality(out))
+        rows.append(row)
+        return out
+
+    elig = rec("eligibility", lambda: engine.eligibility_matrix(cfg))
+    df = rec("greedy", lambda: engine.greedy_pass(cfg, elig, seed).to_frame(), lambda d: _short(cfg, d))
+    # in-process so peak memory and wall time describe the same work
+    rec("best_of_n", lambda: engine.best_of_n(cfg, elig, restarts, seed, workers=1)[1], lambda d: _short(cfg, d))
+    gaps, _remain = engine.rota_tables(cfg, df)
+    rec("balance", lambda: engine.balance(cfg, df, gaps, elig), lambda d: _short(cfg, d))
+    if improve_s > 0:
+        rec("local_search", lambda: engine.local_search(RotaState.from_frame(df, cfg), elig, improve_s,
+                                                        seed=seed)[0].to_frame(), lambda d: _short(cfg, d))
+    if solve_s > 0 and engine.ORTOOLS_AVAILABLE:
+        rec("solve_optimal", lambda: engine.solve_optimal(cfg, elig, df, solve_s)[1],
+            lambda d: _short(cfg, d) if d is not None else -1)
+
+    rec("recompute_tables", lambda: engine.rota_tables(cfg, df))
+    grid = _edit_grid(cfg, df, seed)
+    rec("apply_inline_changes", lambda: engine.apply_grid_edits(cfg, df, grid, True, False)[0],
+        lambda d: _short(cfg, d))
+    sheet = rec("view_day_doctor", lambda: engine.sheet_day_doctor(df, cfg.days, cfg.doctors))
+    rec("view_doctor_day", lambda: engine.grid_doctor_day(df, cfg.days, cfg.doctors))
+    dmap = rec("view_day_shift", lambda: engine.day_shift_map(df, cfg.days))
+    rota = rec("compact", lambda: CompactRota.from_frame(df, cfg.days, cfg.doctors, cfg.facility))
+    rec("compact_views", lambda: (rota.sheet(), rota.grid(), rota.by_shift()))
+    stats = CoverageStats(df, cfg.days, cfg.cov)
+    docs = tuple(cfg.doctors)
+    rec("render_day_doctor", lambda: render.day_doctor_html(sheet, cfg.year, cfg.month, docs, "en"))
+    rec("render_doctor_day", lambda: render.doctor_day_html(sheet, cfg.year, cfg.month, docs, "en"))
+    rec("render_day_shift", lambda: render.day_shift_html(dmap, cfg.year, cfg.month, "en"))
+    rec("render_daily_area", lambda: render.daily_area_html(stats.area_totals(), cfg.year, cfg.month, cfg.days, "en"))
+    rec("fairness", lambda: FairnessStats(cfg, df).summary())
+    rec("audit", lambda: audit_rota(cfg, df))
+    gaps, remain = engine.rota_tables(cfg, df, stats)
+    if XLSX_AVAILABLE:
+        rec("export_excel", lambda: export_excel(sheet, gaps, remain, cfg.year, cfg.month, df, cfg.days, "en",
+                                                 DEFAULT_AREA_COLORS, cfg.cov, stats))
+    # one PDF column per doctor: past a few hundred the page layout itself is the bottleneck
+    if REPORTLAB_AVAILABLE and len(cfg.doctors) <= pdf_max_doctors:
+        rec("export_pdf", lambda: export_pdf(sheet, cfg.year, cfg.month, "en", DEFAULT_AREA_COLORS))
+    return rows
+
+def _meta(argv: List[str]) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "pandas": pd.__version__, "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "argv": argv}
+
+def run(sizes=SIZES, days=DAYS, densities=DENSITIES, seed: int = 0, log=None, **kw) -> dict:
+    results = []
+    for n in sizes:
+        for d in days:
+            for dens in densities:
+                cfg = synthetic_config(n, d, dens, seed)
+                required = d * sum(cfg.cov.values())
+                for row in bench_case(cfg, seed, **kw):
+                    row = {"doctors": n, "days": d, "density": dens, "required": required, **row}
+                    results.append(row)
+                    if log: log(row)
+    return {"meta": {}, "results": results}
+
+def _key(r: dict) -> tuple:
+    return (r["doctors"], r["days"], r["density"], r["case"])
+
+def compare(old: dict, new: dict) -> pd.DataFrame:
+    """Join two result files on (doctors, days, density, case); ratios > 1 mean the new run is worse."""
+    o = {_key(r): r for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        b = o.get(_key(r))
+        if b is None: continue
+        row = dict(zip(["doctors","days","density","case"], _key(r)))
+        row["wall_old"], row["wall_new"] = b["wall_s"], r["wall_s"]
+        row["wall_ratio"] = round(r["wall_s"] / b["wall_s"], 2) if b["wall_s"] else None
+        if b.get("peak_mib") and r.get("peak_mib"):
+            row["mem_ratio"] = round(r["peak_mib"] / b["peak_mib"], 2)
+        if "short_by" in r and "short_by" in b:
+            row["short_old"], row["short_new"] = b["short_by"], r["short_by"]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    p = argparse.ArgumentParser(prog="python -m rota.bench", description="Benchmark the rota engine at scale.")
+    p.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    p.add_argument("--days", type=int, nargs="+", default=DAYS, choices=DAYS)
+    p.add_argument("--densities", type=float, nargs="+", default=DENSITIES)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--restarts", type=int, default=4)
+    p.add_argument("--improve", type=float, default=2.0, metavar="SECONDS", help="local-search budget (0 skips)")
+    p.add_argument("--solve", type=float, default=0.0, metavar="SECONDS", help="CP-SAT budget (0 skips)")
+    p.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass (halves run time)")
+    p.add_argument("--quick", action="store_true", help="50 doctors, 30 days, density 0.8")
+    p.add_argument("--out", help="write JSON results here (default: stdout)")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = p.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f0, open(args.compare[1]) as f1:
+            table = compare(json.load(f0), json.load(f1))
+        print(table.to_string(index=False) if not table.empty else "no common cases")
+        return 0
+
+    if args.quick: args.sizes, args.days, args.densities = [50], [30], [0.8]
+    def log(r):
+        mem = "" if r["peak_mib"] is None else f" {r['peak_mib']:8.1f} MiB"
+        short = f" short={r['short_by']}" if "short_by" in r else ""
+        print(f"{r['doctors']:5d} doc {r['days']}d {r['density']:.2f} {r['case']:<22}{r['wall_s']:9.3f}s{mem}{short}",
+              file=sys.stderr)
+    out = run(args.sizes, args.days, args.densities, args.seed, log=log, memory=not args.no_memory,
+              restarts=args.restarts, improve_s=args.improve, solve_s=args.solve)
+    out["meta"] = _meta(argv)
+    text = json.dumps(out, indent=1)
+    if args.out:
+        with open(args.out, "w") as fh: fh.write(text)
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
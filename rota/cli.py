@@ -0,0 +1,134 @@
+# rota/cli.py — batch front end: python -m rota config.json --xlsx out.xlsx
+import argparse, json, os, sys, time
+
+from .engine import (RotaConfig, RotaState, RollingHorizon, eligibility_matrix, greedy_pass, best_of_n, balance,
+                     solve_optimal, local_search, rota_tables, ORTOOLS_AVAILABLE, KEPT_CURRENT)
+from .store import RotaStore
+from .roster import import_roster
+from .audit import audit_rota, audit_summary
+from . import profiling
+from .export import write_rota_excel, rota_pdf, XLSX_AVAILABLE, REPORTLAB_AVAILABLE
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m rota", description="Generate an ED rota without the web UI.")
+    p.add_argument("config", nargs="?", help="JSON config (see --dump-config); built-in roster if omitted")
+    p.add_argument("--roster", help="CSV/xlsx roster replacing the config's doctors (see rota.roster)")
+    p.add_argument("--engine", choices=["greedy","best","solve"], default="greedy")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--restarts", type=int, default=8, help="greedy restarts for --engine best")
+    p.add_argument("--time-limit", type=float, default=30.0, help="CP-SAT seconds for --engine solve")
+    p.add_argument("--improve", type=float, default=0.0, metavar="SECONDS", help="local-search budget after generation")
+    p.add_argument("--balance", action="store_true", help="fill remaining gaps with the balancer")
+    p.add_argument("--audit", action="store_true", help="list every rule the final rota breaks (to stderr)")
+    p.add_argument("--months", type=int, default=1,
+                   help="rolling horizon: schedule this many consecutive months, carrying streaks/rest/weeks over")
+    p.add_argument("--xlsx", help="write the Excel workbook here")
+    p.add_argument("--pdf", help="write the PDF rota here")
+    p.add_argument("--csv", help="write the long-format assignments here")
+    p.add_argument("--lang", choices=["en","ar"], default="en")
+    p.add_argument("--db", default=os.environ.get("ROTA_DB", "rota_store.sqlite"), help="SQLite store for --save")
+    p.add_argument("--save", metavar="NAME", help="save each generated month as version NAME in --db")
+    p.add_argument("--dump-config", action="store_true", help="print the config as JSON and exit")
+    p.add_argument("--profile", nargs="?", const="", metavar="JSON",
+                   help="print per-phase timings and rule-check counts to stderr (and write them as JSON here)")
+    p.add_argument("--cprofile", action="store_true", help="with --profile: also print a cProfile report")
+    return p
+
+def load_config(path: str = None) -> RotaConfig:
+    if not path: return RotaConfig.default()
+    with open(path, encoding="utf-8") as fh:
+        return RotaConfig.from_dict(json.load(fh))
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        cfg = load_config(args.config)
+        if args.roster:
+            with open(args.roster, "rb") as fh:
+                report = import_roster(cfg, fh, args.roster, replace=True)
+            for r in report["rejected"].itertuples(index=False):
+                print(f"{args.roster}:{r.line}: {r.name or '?'}: {r.reason}", file=sys.stderr)
+            print(f"roster: {report['added']} added, {report['updated']} updated, {report['removed']} removed, "
+                  f"{len(report['rejected'])} rejected", file=sys.stderr)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"error: {e}", file=sys.stderr); return 2
+    if args.dump_config:
+        json.dump(cfg.to_dict(), sys.stdout, ensure_ascii=False, indent=2); print(); return 0
+
+    if args.engine == "solve" and not ORTOOLS_AVAILABLE:
+        print("error: OR-Tools is not installed", file=sys.stderr); return 2
+    if args.profile is None:
+        return run_horizon(cfg, args) if args.months > 1 else run_month(cfg, args)
+    with profiling.recording("cli", cprofile=args.cprofile) as rec:
+        code = run_horizon(cfg, args) if args.months > 1 else run_month(cfg, args)
+    print(rec.log_line(), file=sys.stderr)
+    if args.cprofile: print(rec.cprofile_text(), file=sys.stderr)
+    if args.profile:
+        with open(args.profile, "w", encoding="utf-8") as fh: fh.write(rec.to_json() + "\n")
+    return code
+
+def run_month(cfg: RotaConfig, args) -> int:
+    t0 = time.perf_counter()
+    elig = eligibility_matrix(cfg)
+    if args.engine == "solve":
+        status, df = solve_optimal(cfg, elig, greedy_pass(cfg, elig, args.seed).to_frame(), args.time_limit)
+        if df is None:
+            print(f"error: solver returned {status}", file=sys.stderr); return 1
+        if status == KEPT_CURRENT:
+            print("solver: no better than the greedy warm start, keeping it", file=sys.stderr)
+    elif args.engine == "best":
+        seed, df, _ = best_of_n(cfg, elig, args.restarts, args.seed)
+        print(f"best seed: {seed}")
+    else:
+        df = greedy_pass(cfg, elig, args.seed).to_frame()
+    if args.improve > 0:
+        state, _stats = local_search(RotaState.from_frame(df, cfg), elig, args.improve, seed=args.seed)
+        df = state.to_frame()
+    if args.balance:
+        df = balance(cfg, df, rota_tables(cfg, df)[0], elig)
+    gaps, _remain = rota_tables(cfg, df)
+    short = int(gaps["short_by"].sum()) if not gaps.empty else 0
+    print(f"{len(df)} assignments, {short} short, {time.perf_counter()-t0:.2f}s")
+    if args.audit:
+        found = audit_rota(cfg, df)
+        for r in found.itertuples(index=False):
+            print(f"day {r.day}: {r.doctor}: {r.rule} {r.detail}".rstrip(), file=sys.stderr)
+        print("violations: " + (", ".join(f"{r.rule} {r.count}" for r in audit_summary(found).itertuples(index=False))
+                                or "none"))
+
+    if args.csv:
+        df.sort_values(["day","doctor"]).to_csv(args.csv, index=False)
+    write_files(cfg, df, args.xlsx, args.pdf, args.lang)
+    if args.save:
+        RotaStore(args.db).save(args.save, cfg, df)
+    return 0
+
+def write_files(cfg: RotaConfig, df, xlsx: str = None, pdf: str = None, lang: str = "en"):
+    if xlsx:
+        if not XLSX_AVAILABLE: print("warning: xlsxwriter not installed, skipping --xlsx", file=sys.stderr)
+        else:
+            write_rota_excel(xlsx, cfg, df, lang)
+    if pdf:
+        if not REPORTLAB_AVAILABLE: print("warning: reportlab not installed, skipping --pdf", file=sys.stderr)
+        else:
+            with open(pdf, "wb") as fh: fh.write(rota_pdf(cfg, df, lang))
+
+def _month_path(path: str, cfg: RotaConfig):
+    if not path: return None
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_{cfg.year}-{cfg.month:02d}{ext}"
+
+def run_horizon(cfg: RotaConfig, args) -> int:
+    """--months N: one rota per month, each seeded with the previous month's tail; files get a _YYYY-MM suffix."""
+    t0 = time.perf_counter()
+    hz = RollingHorizon(cfg).run(args.months, method=args.engine, seed=args.seed, restarts=args.restarts,
+                                 improve_s=args.improve, time_limit=args.time_limit)
+    print(hz.summary().to_string(index=False))
+    print(f"{args.months} months, {time.perf_counter()-t0:.2f}s")
+    if args.csv:
+        hz.to_frame().to_csv(args.csv, index=False)
+    store = RotaStore(args.db) if args.save else None
+    for mcfg, df in zip(hz.configs, hz.frames):
+        write_files(mcfg, df, _month_path(args.xlsx, mcfg), _month_path(args.pdf, mcfg), args.lang)
+        if store: store.save(args.save, mcfg, df)
+    return 0
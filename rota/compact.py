@@ -0,0 +1,106 @@
+# rota/compact.py — one month's rota as a doctor × day matrix of code indices
+# -----------------------------------------
+# The long frame (doctor, day, area, shift, code) is what the engine produces and the
+# store persists, but every view wants a doctor × day layout. CompactRota builds that
+# once: a small-int matrix of indices into fac.codes (-1 = off; int8 for up to 128
+# codes, int16 past that) plus an interned doctor Index for the rows. The day × doctor
+# sheet, the edit grid, the by-shift map and the shift/area index matrices are all
+# cheap derivations of it (lookup-table takes and transposed views, no pivot or
+# per-row writes).
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .facility import Facility, DEFAULT_FACILITY
+
+OFF = -1
+
+def index_dtype(n: int) -> type:
+    """Narrowest signed int dtype holding indices 0..n-1 and OFF."""
+    for dt in (np.int8, np.int16, np.int32):
+        if n <= np.iinfo(dt).max + 1: return dt
+    raise ValueError(f"{n} codes do not fit an int32 index")
+
+class CompactRota:
+    """Doctor × day code-index matrix `codes` with `doctors` as its row Index.
+
+    The dtype is index_dtype(len(fac.codes)): int8 for up to 128 codes, int16 past that.
+
+    Rows are the roster passed to from_frame (the first `roster` rows, in that order)
+    followed by any other doctor found in the frame; columns are days 1..days. Rows
+    for days past `days` and codes outside the facility are dropped; of two rows for
+    the same (doctor, day) the later one wins."""
+    def __init__(self, codes: np.ndarray, doctors: pd.Index, roster: int, fac: Facility = DEFAULT_FACILITY):
+        self.codes = codes
+        self.doctors = doctors
+        self.roster = int(roster)
+        self.fac = fac
+        self.days = int(codes.shape[1])
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, days: int, doctors: Sequence[str] = (),
+                   fac: Facility = DEFAULT_FACILITY) -> "CompactRota":
+        names = pd.Index(list(dict.fromkeys(doctors)), dtype=object)
+        roster = len(names)
+        if df.empty:
+            return cls(np.full((roster, int(days)), OFF, dtype=index_dtype(len(fac.codes))), names, roster, fac)
+        col = df["doctor"].to_numpy(dtype=object)
+        row = names.get_indexer(col)
+        if (row < 0).any():
+            names = names.append(pd.Index(pd.unique(col[row < 0]), dtype=object))
+            row = names.get_indexer(col)
+        code = pd.Index(fac.codes, dtype=object).get_indexer(df["code"].astype(str).to_numpy(dtype=object))
+        day = df["day"].to_numpy(dtype=np.int64) - 1
+        keep = (code >= 0) & (day >= 0) & (day < int(days))
+        M = np.full((len(names), int(days)), OFF, dtype=index_dtype(len(fac.codes)))
+        M[row[keep], day[keep]] = code[keep]
+        return cls(M, names, roster, fac)
+
+    # ---- matrices ----
+    @property
+    def matrix(self) -> np.ndarray:
+        """The roster rows (a view: extra doctors from the frame are left out)."""
+        return self.codes[:self.roster]
+
+    def _via(self, table: Sequence) -> np.ndarray:
+        lut = np.array(list(table) + [OFF], dtype=index_dtype(max(table, default=0) + 1))  # index -1 picks the trailing OFF
+        return lut[self.matrix]
+
+    def shift_matrix(self) -> np.ndarray:
+        """Roster × days shift indices (int8 up to 128 shifts), -1 = off."""
+        return self._via([self.fac.shift_idx[self.fac.slot_of[c][1]] for c in self.fac.codes])
+
+    def area_matrix(self) -> np.ndarray:
+        """Roster × days area indices (int8 up to 128 areas), -1 = off."""
+        return self._via([self.fac.area_idx[self.fac.slot_of[c][0]] for c in self.fac.codes])
+
+    # ---- views ----
+    def sheet(self) -> pd.DataFrame:
+        """Day × doctor codes, NaN where off (the layout of the on-screen sheet and the exports)."""
+        lut = np.array(list(self.fac.codes) + [np.nan], dtype=object)
+        return pd.DataFrame(lut[self.matrix.T], index=pd.RangeIndex(1, self.days+1, name="day"),
+                            columns=self.doctors[:self.roster].rename("doctor"), dtype=object)
+
+    def grid(self) -> pd.DataFrame:
+        """Doctor × day codes with "" where off, day columns as strings (the inline editor's grid)."""
+        lut = np.array(list(self.fac.codes) + [""], dtype=object)
+        return pd.DataFrame(lut[self.matrix], index=list(self.doctors[:self.roster]),
+                            columns=[str(d) for d in range(1, self.days+1)], dtype=object)
+
+    def by_shift(self) -> Dict[int, Dict[str, List[str]]]:
+        """{day: {code: sorted doctors}} over every row, extra doctors included."""
+        codes = self.fac.codes
+        out = {d: {c: [] for c in codes} for d in range(1, self.days+1)}
+        order = np.argsort(self.doctors.to_numpy(dtype=str), kind="stable")
+        names = self.doctors.to_numpy(dtype=object)[order]
+        M = self.codes[order]
+        day, row = np.nonzero(M.T >= 0)  # day-major, names sorted within each day
+        for d, r, c in zip(day.tolist(), row.tolist(), M[row, day].tolist()):
+            out[d+1][codes[c]].append(names[r])
+        return out
+
+    def nbytes(self) -> int:
+        """Bytes held by the matrix and the doctor index."""
+        return int(self.codes.nbytes + self.doctors.memory_usage(deep=True))
@@ -0,0 +1,1156 @@
+# rota/engine.py — headless scheduling engine
+# -----------------------------------------
+# كل منطق الجدولة بدون Streamlit: القيود، التوليد، الموازنة، الحل الأمثل، البحث المحلي، الإحصاءات.
+# Every function takes an explicit RotaConfig, so the same code runs in the app,
+# the CLI (python -m rota) and batch jobs. Importing it pulls in pandas/numpy only;
+# OR-Tools is imported lazily by solve_optimal.
+
+import random, calendar, hashlib, math, multiprocessing, os, threading, time, importlib.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from datetime import date, timedelta
+from typing import Dict, List, Tuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from .facility import Facility, DEFAULT_FACILITY
+from .compact import CompactRota
+from . import profiling
+
+ORTOOLS_AVAILABLE = importlib.util.find_spec("ortools") is not None
+
+# ===== Static model =====
+# The built-in department (rota/facility.py); a RotaConfig may carry another Facility.
+# These module-level names describe DEFAULT_FACILITY only and stay for the app and old callers.
+AREAS = DEFAULT_FACILITY.areas
+SHIFTS = DEFAULT_FACILITY.shifts
+AREA_CODE = DEFAULT_FACILITY.area_code
+SHIFT_CODE = DEFAULT_FACILITY.shift_code
+DIGIT_TO_SHIFT = {c:s for s,c in SHIFT_CODE.items()}
+LETTER_TO_AREA = {c:a for a,c in AREA_CODE.items()}
+SHIFT_COLS_ORDER = DEFAULT_FACILITY.codes
+def code_for(area,shift): return DEFAULT_FACILITY.code_of[(area, shift)]
+GROUP_AREAS = DEFAULT_FACILITY.group_areas
+GROUPS = DEFAULT_FACILITY.groups
+AREA_IDX = DEFAULT_FACILITY.area_idx
+SHIFT_IDX = DEFAULT_FACILITY.shift_idx
+COLUMNS = ["doctor","day","area","shift","code"]
+
+def parse_code(code: str, fac: Facility = DEFAULT_FACILITY) -> Tuple[str,str]:
+    return fac.parse_code(code)
+
+# ===== Defaults (the department roster the app starts with) =====
+DEFAULT_COV = {
+    ("fast","morning"):2, ("fast","evening"):2, ("fast","night"):2,
+    ("resp_triage","morning"):1, ("resp_triage","evening"):1, ("resp_triage","night"):1,
+    ("acute","morning"):3, ("acute","evening"):4, ("acute","night"):3,
+    ("resus","morning"):3, ("resus","evening"):3, ("resus","night"):3,
+}
+DEFAULT_GROUP_MAP = {
+    # seniors
+    "Dr. Abdullah Alnughamishi":"senior","Dr. Samar Alruwaysan":"senior","Dr. Ali Alismail":"senior",
+    "Dr. Hussain Alturifi":"senior","Dr. Abdullah Alkhalifah":"senior","Dr. Rayan Alaboodi":"senior",
+    "Dr. Jamal Almarshadi":"senior","Dr. Emad Abdulkarim":"senior","Dr. Marwan Alrayhan":"senior",
+    "Dr. Ahmed Almohimeed":"senior","Dr. Abdullah Alsindi":"senior","Dr. Yousef Alharbi":"senior",
+    # g1
+    "Dr.Sharif":"g1","Dr.Rashif":"g1","Dr.Jobi":"g1","Dr.Lucky":"g1",
+    # g2
+    "Dr.Bashir":"g2","Dr. AHMED MAMDOH":"g2","Dr. HAZEM ATTYAH":"g2","Dr. OMAR ALSHAMEKH":"g2","Dr. AYMEN MKHTAR":"g2",
+    # g3
+    "Dr.nashwa":"g3","Dr. Abdulaziz bin marahad":"g3","Dr. Mohmmed almutiri":"g3","Dr. Lulwah":"g3","Dr.Ibrahim":"g3",
+    "Dr. Kaldon":"g3","Dr. Osama":"g3","Dr. Salman":"g3","Dr. Hajer":"g3","Dr. Randa":"g3","Dr. Esa":"g3","Dr. Fahad":"g3",
+    "Dr. Abdulrahman1":"g3","Dr. Abdulrahman2":"g3","Dr. Mohammed alrashid":"g3",
+    # g4
+    "Dr.Lena":"g4","Dr.Essra":"g4","Dr.fahimah":"g4","Dr.mohammed bajaber":"g4","Dr.Sulaiman Abker":"g4",
+    # g5
+    "Dr.Shouq":"g5","Dr.Rayan":"g5","Dr abdullah aljalajl":"g5","Dr. AMIN MOUSA":"g5","Dr. AHMED ALFADLY":"g5",
+}
+GROUP_CAP = {"senior":16,"g1":18,"g2":18,"g3":18,"g4":18,"g5":18}
+FIXED_SHIFT = {"Dr.Sharif":{"night"}, "Dr.Rashif":{"morning"}, "Dr.Jobi":{"evening"},
+               "Dr.Bashir":{"morning"}, "Dr.nashwa":{"morning"}, "Dr.Lena":{"morning"}}
+DEFAULT_MAX_NIGHT = 6
+DEFAULT_MAX_WEEK = 5
+
+# ===== Utilities =====
+def frame_hash(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame; the cache key for anything derived from the rota."""
+    if df.empty: return "empty"
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+def is_weekend(y:int, m:int, d:int) -> bool:
+    wd = calendar.weekday(y, m, d)  # Mon=0
+    return wd in (4,5)  # Fri, Sat
+
+def iso_week(y:int, m:int, d:int) -> int:
+    return date(y,m,d).isocalendar()[1]
+
+def rest_ok(prev_shift: str, cur_shift: str, min_rest: int, fac: Facility = DEFAULT_FACILITY) -> bool:
+    return int(fac.rest[fac.shift_idx[prev_shift], fac.shift_idx[cur_shift]]) >= int(min_rest)
+
+# ===== Config =====
+@dataclass
+class RotaConfig:
+    """Everything the engine needs to build one month's rota.
+
+    Mirrors the app's session state (same field names), so the UI snapshots it with
+    config_from_session() and the CLI loads it from JSON with from_dict()."""
+    year: int = 2025
+    month: int = 9
+    days: int = 30
+    cov: Dict[Tuple[str,str],int] = field(default_factory=lambda: dict(DEFAULT_COV))
+    doctors: List[str] = field(default_factory=list)
+    group_map: Dict[str,str] = field(default_factory=dict)
+    cap_map: Dict[str,int] = field(default_factory=dict)
+    allowed_shifts: Dict[str,set] = field(default_factory=dict)
+    offdays: Dict[str,set] = field(default_factory=dict)
+    max_night_map: Dict[str,int] = field(default_factory=dict)
+    max_week_map: Dict[str,int] = field(default_factory=dict)
+    avoid_holidays_map: Dict[str,bool] = field(default_factory=dict)
+    max_hours_map: Dict[str,int] = field(default_factory=dict)  # monthly hours per doctor, 0 = no cap
+    holidays: set = field(default_factory=set)
+    min_off: int = 12
+    max_consec: int = 6
+    min_rest: int = 16
+    max_hours_week: int = 0  # hours in any rolling 7 days, 0 = no cap
+    facility: Facility = DEFAULT_FACILITY
+
+    @classmethod
+    def default(cls) -> "RotaConfig":
+        cfg = cls(doctors=list(DEFAULT_GROUP_MAP), group_map=dict(DEFAULT_GROUP_MAP))
+        for n in cfg.doctors:
+            cfg.add_doctor(n, DEFAULT_GROUP_MAP[n], GROUP_CAP[DEFAULT_GROUP_MAP[n]],
+                           allowed=FIXED_SHIFT.get(n))
+        return cfg
+
+    def add_doctor(self, name: str, group: str = "g3", cap: int = 18, allowed=None, offdays=None,
+                   max_night: int = DEFAULT_MAX_NIGHT, max_week: int = DEFAULT_MAX_WEEK, avoid_holidays: bool = False,
+                   max_hours: int = 0):
+        if name not in self.group_map: self.doctors.append(name)
+        self.group_map[name] = group
+        self.cap_map[name] = int(cap)
+        self.allowed_shifts[name] = set(allowed) if allowed else set(self.facility.shifts)
+        self.offdays[name] = set(offdays or ())
+        self.max_night_map[name] = int(max_night)
+        self.max_week_map[name] = int(max_week)
+        self.avoid_holidays_map[name] = bool(avoid_holidays)
+        self.max_hours_map[name] = int(max_hours)
+
+    def rules(self) -> dict:
+        """Plain snapshot of the per-doctor limits and global rules that rules_ok enforces."""
+        docs = self.doctors
+        return {"days": int(self.days), "min_off": int(self.min_off), "max_consec": int(self.max_consec),
+                "min_rest": int(self.min_rest), "max_hours_week": int(self.max_hours_week),
+                "cap": {n: int(self.cap_map[n]) for n in docs},
+                "max_night": {n: int(self.max_night_map.get(n, 999)) for n in docs},
+                "max_week": {n: int(self.max_week_map.get(n, 999)) for n in docs},
+                "max_hours": {n: int(self.max_hours_map.get(n, 0)) for n in docs}}
+
+    def eligibility_signature(self) -> tuple:
+        docs = tuple(self.doctors)
+        return (docs, int(self.days), frozenset(self.holidays),
+                tuple(self.group_map.get(n) for n in docs),
+                tuple(frozenset(self.offdays.get(n, set())) for n in docs),
+                tuple(bool(self.avoid_holidays_map.get(n, False)) for n in docs),
+                tuple(frozenset(self.allowed_shifts.get(n, set(self.facility.shifts))) for n in docs),
+                self.facility.signature())
+
+    def to_dict(self) -> dict:
+        """JSON-friendly form (coverage nested by area then shift, sets as sorted lists);
+        a "facility" section is written only for a non-default facility."""
+        fac = self.facility
+        out = {
+            "year": int(self.year), "month": int(self.month), "days": int(self.days),
+            "rules": {"min_off": int(self.min_off), "max_consec": int(self.max_consec), "min_rest": int(self.min_rest),
+                      "max_hours_week": int(self.max_hours_week)},
+            "coverage": {a: {s: int(self.cov.get((a,s), 0)) for s in fac.shifts} for a in fac.areas},
+            "holidays": sorted(int(d) for d in self.holidays),
+            "doctors": [{"name": n, "group": self.group_map.get(n, "g3"), "cap": int(self.cap_map.get(n, 18)),
+                         "allowed_shifts": [s for s in fac.shifts if s in self.allowed_shifts.get(n, set(fac.shifts))],
+                         "offdays": sorted(int(d) for d in self.offdays.get(n, set())),
+                         "max_night": int(self.max_night_map.get(n, DEFAULT_MAX_NIGHT)),
+                         "max_week": int(self.max_week_map.get(n, DEFAULT_MAX_WEEK)),
+                         "avoid_holidays": bool(self.avoid_holidays_map.get(n, False)),
+                         "max_hours": int(self.max_hours_map.get(n, 0))}
+                        for n in self.doctors],
+        }
+        if fac != DEFAULT_FACILITY: out["facility"] = fac.to_dict()
+        return out
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RotaConfig":
+        """Inverse of to_dict; missing sections fall back to the built-in defaults.
+
+        With a "facility" section, coverage slots not listed under "coverage" are 0."""
+        fac = Facility.from_dict(data["facility"]) if "facility" in data else DEFAULT_FACILITY
+        if "doctors" not in data:
+            if fac != DEFAULT_FACILITY: raise ValueError("a custom facility needs its own doctors list")
+            cfg = cls.default()
+        else:
+            cfg = cls(facility=fac)
+            if fac != DEFAULT_FACILITY: cfg.cov = {(a,s): 0 for a in fac.areas for s in fac.shifts}
+            for d in data["doctors"]:
+                group = d.get("group", "g3")
+                if group not in fac.group_areas: raise ValueError(f"{d.get('name')}: unknown group {group!r}")
+                allowed = d.get("allowed_shifts") or fac.shifts
+                bad = set(allowed) - set(fac.shifts)
+                if bad: raise ValueError(f"{d.get('name')}: unknown shifts {sorted(bad)}")
+                cfg.add_doctor(d["name"], group, d.get("cap", GROUP_CAP.get(group, 18)), allowed, d.get("offdays"),
+                               d.get("max_night", DEFAULT_MAX_NIGHT), d.get("max_week", DEFAULT_MAX_WEEK),
+                               d.get("avoid_holidays", False), d.get("max_hours", 0))
+        cfg.year = int(data.get("year", cfg.year)); cfg.month = int(data.get("month", cfg.month))
+        cfg.days = int(data.get("days", calendar.monthrange(cfg.year, cfg.month)[1]))
+        rules = data.get("rules", {})
+        cfg.min_off = int(rules.get("min_off", cfg.min_off))
+        cfg.max_consec = int(rules.get("max_consec", cfg.max_consec))
+        cfg.min_rest = int(rules.get("min_rest", cfg.min_rest))
+        cfg.max_hours_week = int(rules.get("max_hours_week", cfg.max_hours_week))
+        for a, per_shift in data.get("coverage", {}).items():
+            for s, v in per_shift.items():
+                if (a, s) not in cfg.cov: raise ValueError(f"unknown coverage slot {a}/{s}")
+                cfg.cov[(a, s)] = int(v)
+        cfg.holidays = {int(d) for d in data.get("holidays", []) if 1 <= int(d) <= cfg.days}
+        return cfg
+
+# ===== Rota state =====
+CARRY_DAYS = 7  # previous-month tail kept per doctor: covers the ISO week and typical max_consec
+
+class RotaState:
+    """Incremental per-doctor index over one month's assignments.
+
+    Holds the (doctor, day) -> (area, shift) map together with the counters
+    the constraint checker needs (total, nights, weekends, per ISO week, hours,
+    a day -> shift array and hours7[e] = hours worked on days e-6..e), so
+    assign/unassign and every lookup are O(1) (the 7-day window update is 7 adds).
+
+    `carry` is the previous month's tail ({doctor: [shift or None, ...]}, oldest
+    first, last entry = the day before day 1): shift_on() answers for days <= 0
+    from it and the first ISO week starts with the carried days already counted,
+    so rest, streak and weekly limits hold across the month boundary."""
+    def __init__(self, cfg: RotaConfig, days: int = None, carry: Dict[str,List[Optional[str]]] = None):
+        self.cfg = cfg
+        self.days = int(days if days is not None else cfg.days); self.year = int(cfg.year); self.month = int(cfg.month)
+        self.rules = cfg.rules()
+        self.fac = cfg.facility
+        self.night = self.fac.night
+        self.rest_allowed = self.fac.rest_table(cfg.min_rest)
+        self.shift_hours = {sh: int(h) for sh, h in zip(self.fac.shifts, self.fac.hours)}
+        self.assigned: Dict[Tuple[str,int],Tuple[str,str]] = {}
+        self.counts: Dict[str,int] = {}
+        self.nights: Dict[str,int] = {}
+        self.weekends: Dict[str,int] = {}
+        self.week_counts: Dict[str,Dict[int,int]] = {}
+        self.day_shift: Dict[str,List[str]] = {}
+        self.hours: Dict[str,int] = {}
+        self.hours7: Dict[str,List[int]] = {}
+        self.checks = 0  # rules_ok evaluations against this state (reported to rota.profiling)
+        # day-indexed lookups, padded so day-1 / day+1 never fall off the ends
+        self.week_of = [0] + [iso_week(self.year, self.month, d) for d in range(1, self.days+1)] + [0]
+        self.weekend_day = [False] + [is_weekend(self.year, self.month, d) for d in range(1, self.days+1)] + [False]
+        for n in cfg.doctors: self._ensure(n)
+        self.carry = {n: list(t) for n, t in (carry or {}).items() if any(t)}
+        first = date(self.year, self.month, 1)
+        for n, tail in self.carry.items():
+            self._ensure(n)
+            for back, sh in enumerate(reversed(tail), start=1):
+                if not sh: continue
+                if (first - timedelta(days=back)).isocalendar()[1] == self.week_of[1]:
+                    self.week_counts[n][self.week_of[1]] = self.week_counts[n].get(self.week_of[1], 0) + 1
+                w = self.hours7[n]  # carried day 1-back falls in the windows ending on days 1..7-back
+                for e in range(1, 8-back): w[e] += self.shift_hours.get(sh, 0)
+
+    def _ensure(self, name: str):
+        if name not in self.counts:
+            self.counts[name] = 0; self.nights[name] = 0; self.weekends[name] = 0
+            self.week_counts[name] = {}
+            self.day_shift[name] = [None]*(self.days+2)
+            self.hours[name] = 0; self.hours7[name] = [0]*(self.days+8)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, cfg: RotaConfig, carry: Dict[str,List[Optional[str]]] = None) -> "RotaState":
+        span = max([int(cfg.days)] + ([int(df["day"].max())] if not df.empty else []))
+        state = cls(cfg, span, carry)
+        for r in df.itertuples(index=False):
+            state.assign(r.doctor, int(r.day), r.area, r.shift)
+        return state
+
+    def assign(self, name: str, day: int, area: str, shift: str):
+        self._ensure(name)
+        self.assigned[(name, day)] = (area, shift)
+        self.counts[name] += 1
+        if shift in self.night: self.nights[name] += 1
+        if self.weekend_day[day]: self.weekends[name] += 1
+        wk = self.week_of[day]
+        self.week_counts[name][wk] = self.week_counts[name].get(wk, 0) + 1
+        self.day_shift[name][day] = shift
+        h = self.shift_hours[shift]; self.hours[name] += h
+        w = self.hours7[name]
+        for e in range(day, day+7): w[e] += h
+
+    def unassign(self, name: str, day: int) -> Tuple[str,str]:
+        area, shift = self.assigned.pop((name, day))
+        self.counts[name] -= 1
+        if shift in self.night: self.nights[name] -= 1
+        if self.weekend_day[day]: self.weekends[name] -= 1
+        self.week_counts[name][self.week_of[day]] -= 1
+        self.day_shift[name][day] = None
+        h = self.shift_hours[shift]; self.hours[name] -= h
+        w = self.hours7[name]
+        for e in range(day, day+7): w[e] -= h
+        return area, shift
+
+    def shift_on(self, name: str, day: int):
+        if 1 <= day <= self.days:
+            ds = self.day_shift.get(name)
+            return ds[day] if ds else None
+        if day < 1 and self.carry:
+            tail = self.carry.get(name)
+            if tail and -day < len(tail): return tail[day-1]
+        return None
+
+    def tail(self, span: int = CARRY_DAYS) -> Dict[str,List[Optional[str]]]:
+        """The last `span` days of this month per doctor — the carry for the month after."""
+        lo = self.cfg.days - span + 1
+        return {n: [self.shift_on(n, d) for d in range(lo, self.cfg.days+1)] for n in self.day_shift}
+
+    def week_count(self, name: str, day: int) -> int:
+        return self.week_counts.get(name, {}).get(self.week_of[day], 0)
+
+    def peak_hours7(self, name: str, day: int) -> int:
+        """Most hours in any rolling 7-day window that contains `day`."""
+        w = self.hours7.get(name)
+        return max(w[day:day+7]) if w else 0
+
+    def to_frame(self) -> pd.DataFrame:
+        code = self.fac.code_of
+        return pd.DataFrame([{"doctor":n,"day":d,"area":a,"shift":s,"code":code[(a,s)]}
+                             for (n,d),(a,s) in self.assigned.items()], columns=COLUMNS)
+
+class EditBuffer:
+    """Assignment log of adds/removes against a base result_df.
+
+    Edits are collected in dicts and the new long-format frame is materialised once
+    by materialise(): removed rows are dropped with a single keyed mask and the adds
+    are appended in one concat, preserving the row order per-row concat produced."""
+    def __init__(self, base: pd.DataFrame, fac: Facility = DEFAULT_FACILITY):
+        self.base = base; self.fac = fac
+        self.removed: set = set()
+        self.added: Dict[Tuple[str,int],Tuple[str,str]] = {}
+
+    def add(self, doctor: str, day: int, area: str, shift: str):
+        self.added.pop((doctor, day), None)
+        self.added[(doctor, day)] = (area, shift)
+
+    def remove(self, doctor: str, day: int):
+        if self.added.pop((doctor, day), None) is None:
+            self.removed.add((doctor, day))
+
+    def materialise(self) -> pd.DataFrame:
+        df = self.base
+        if self.removed and not df.empty:
+            keys = pd.MultiIndex.from_arrays([df["doctor"], df["day"].astype(int)])
+            df = df[~keys.isin(list(self.removed))]
+        if self.added:
+            df = pd.concat([df, pd.DataFrame([{"doctor":n,"day":d,"area":a,"shift":s,"code":self.fac.code_of[(a,s)]}
+                                              for (n,d),(a,s) in self.added.items()])], ignore_index=True)
+        return df
+
+# ===== Constraints =====
+def constraints_ok(name:str, day:int, area:str, shift:str, state: RotaState) -> Tuple[bool,str]:
+    cfg = state.cfg
+    if day in cfg.offdays.get(name,set()): return False, "off-day"
+    if cfg.avoid_holidays_map.get(name, False) and (day in cfg.holidays): return False, "holiday preference"
+
+    grp = cfg.group_map[name]
+    if area not in cfg.facility.group_areas.get(grp, ()): return False, "area not allowed"
+    if shift not in cfg.allowed_shifts.get(name, cfg.facility.shifts): return False, "shift not allowed"
+    return rules_ok(name, day, shift, state)
+
+def rules_ok(name:str, day:int, shift:str, state: RotaState) -> Tuple[bool,str]:
+    """Assignment-dependent half of constraints_ok; the static half lives in eligibility_matrix."""
+    R = state.rules; state.checks += 1
+    if (name, day) in state.assigned: return False, "already assigned"
+
+    cap = R["cap"].get(name, 0); taken = state.counts.get(name,0)
+    if taken >= cap: return False, "cap reached"
+    if taken >= (R["days"] - R["min_off"]): return False, "min off-days"
+
+    if shift in state.night:
+        if state.nights.get(name,0) >= R["max_night"].get(name, 999):
+            return False, "max night reached"
+
+    if state.week_count(name, day) >= R["max_week"].get(name, 999): return False, "weekly limit"
+
+    h = state.shift_hours[shift]
+    cap_h = R["max_hours"].get(name, 0)
+    if cap_h and state.hours.get(name,0) + h > cap_h: return False, "hour cap reached"
+    if R["max_hours_week"] and state.peak_hours7(name, day) + h > R["max_hours_week"]:
+        return False, "7-day hours limit"
+
+    if R["min_rest"] > 0:
+        p_shift = state.shift_on(name, day-1)
+        if p_shift and not state.rest_allowed[p_shift][shift]: return False, "rest (prev→today)"
+        n_shift = state.shift_on(name, day+1)
+        if n_shift and not state.rest_allowed[shift][n_shift]: return False, "rest (today→next)"
+
+    # the run this day would join: worked days before it plus worked days after it
+    K = R["max_consec"]; back = 0; t = day-1
+    while back < K and state.shift_on(name, t):
+        back += 1; t -= 1
+    ahead = 0; t = day+1
+    while back + ahead < K and state.shift_on(name, t):
+        ahead += 1; t += 1
+    if back + 1 + ahead > K: return False, "max consecutive days"
+    return True, "ok"
+
+@profiling.timed()
+def eligibility_matrix(cfg: RotaConfig) -> np.ndarray:
+    """Boolean doctor × day × area × shift tensor of the static constraints_ok rules.
+
+    Axis 0 follows cfg.doctors and axis 1 is indexed by the day number itself
+    (index 0 unused). Callers cache it under cfg.eligibility_signature()."""
+    sig = cfg.eligibility_signature()
+    docs, days = sig[0], sig[1]
+    fac = cfg.facility
+    gpos = {g:i for i,g in enumerate(fac.groups)}
+    area_ok = np.zeros((len(docs), len(fac.areas)), dtype=bool)
+    shift_ok = np.zeros((len(docs), len(fac.shifts)), dtype=bool)
+    day_ok = np.ones((len(docs), days+1), dtype=bool); day_ok[:, 0] = False
+    hols = [d for d in sig[2] if 1 <= d <= days]
+    for i, n in enumerate(docs):
+        if sig[3][i] in gpos: area_ok[i] = fac.group_mask[gpos[sig[3][i]]]
+        for sh in sig[6][i]: shift_ok[i, fac.shift_idx[sh]] = True
+        day_ok[i, [d for d in sig[4][i] if 1 <= d <= days]] = False
+        if sig[5][i]: day_ok[i, hols] = False
+    return day_ok[:, :, None, None] & area_ok[:, None, :, None] & shift_ok[:, None, None, :]
+
+def slot_candidates(elig: np.ndarray, docs: List[str], day:int, area:str, shift:str,
+                    fac: Facility = DEFAULT_FACILITY) -> List[str]:
+    """Doctors statically eligible for one slot, via a vectorised lookup into the tensor."""
+    return [docs[i] for i in np.flatnonzero(elig[:, day, fac.area_idx[area], fac.shift_idx[shift]])]
+
+# ===== Coverage statistics =====
+class CoverageStats:
+    """Coverage statistics for one rota version.
+
+    A single days × areas × shifts count array (built with np.add.at) plus the
+    areas × shifts requirement matrix; gaps, per-code daily counts and area totals
+    are all slices of it."""
+    def __init__(self, df: pd.DataFrame, days:int, cov: Dict[Tuple[str,str],int], fac: Facility = DEFAULT_FACILITY):
+        self.days = int(days); self.fac = fac
+        self.counts = np.zeros((self.days, len(fac.areas), len(fac.shifts)), dtype=np.int32)
+        if not df.empty:
+            d = df["day"].to_numpy(dtype=np.int64) - 1
+            a = df["area"].map(fac.area_idx).to_numpy()
+            s = df["shift"].map(fac.shift_idx).to_numpy()
+            keep = (d >= 0) & (d < self.days)
+            np.add.at(self.counts, (d[keep], a[keep].astype(np.int64), s[keep].astype(np.int64)), 1)
+        self.req = np.array([[int(cov.get((a,s), 0)) for s in fac.shifts] for a in fac.areas], dtype=np.int32)
+        self.short = np.maximum(0, self.req[None, :, :] - self.counts)
+
+    @property
+    def total_short(self) -> int:
+        return int(self.short.sum())
+
+    def gaps(self) -> pd.DataFrame:
+        # day-major, then shift, then area — the order the gaps table has always used
+        t, si, ai = np.nonzero(self.short.transpose(0, 2, 1))
+        fac = self.fac
+        return pd.DataFrame({
+            "day": t + 1,
+            "shift": [fac.shifts[i] for i in si],
+            "area": [fac.areas[i] for i in ai],
+            "abbr": [fac.code_of[(fac.areas[a], fac.shifts[s])] for a, s in zip(ai, si)],
+            "required": self.req[ai, si],
+            "assigned": self.counts[t, ai, si],
+            "short_by": self.short[t, ai, si],
+        }, columns=["day","shift","area","abbr","required","assigned","short_by"])
+
+    def daily_counts(self) -> Dict[int, Dict[str, Tuple[int,int,int]]]:
+        """{day: {code: (assigned, required, short)}} in the facility's code order."""
+        fac = self.fac
+        cols = [(c, fac.area_idx[a], fac.shift_idx[s]) for (a, s), c in fac.code_of.items()]
+        cnt = self.counts.tolist(); req = self.req.tolist(); sh = self.short.tolist()
+        return {t+1: {c: (cnt[t][a][s], req[a][s], sh[t][a][s]) for c, a, s in cols} for t in range(self.days)}
+
+    def area_totals(self) -> Dict[int, Dict[str, Tuple[int,int,int]]]:
+        """{day: {area: (assigned, required, short)}} summed over the area's shifts."""
+        A = self.counts.sum(axis=2).tolist(); R = self.req.sum(axis=1).tolist()
+        return {t+1: {ar: (A[t][i], R[i], max(0, R[i] - A[t][i])) for i, ar in enumerate(self.fac.areas)}
+                for t in range(self.days)}
+
+def remaining_table(cfg: RotaConfig, df: pd.DataFrame) -> pd.DataFrame:
+    """Per-doctor assigned / hours / cap / remaining, most remaining first."""
+    fac = cfg.facility
+    tot = df["doctor"].value_counts().to_dict() if not df.empty else {}
+    hrs = {}
+    if not df.empty:
+        h = fac.hours[df["shift"].map(fac.shift_idx).to_numpy(dtype=np.int64)]
+        hrs = pd.Series(h, index=df["doctor"].to_numpy()).groupby(level=0).sum().to_dict()
+    caps = np.array([int(cfg.cap_map[n]) for n in cfg.doctors], dtype=int)
+    taken = np.array([tot.get(n,0) for n in cfg.doctors], dtype=int)
+    remain = pd.DataFrame({"doctor": list(cfg.doctors), "assigned": taken,
+                           "hours": np.array([hrs.get(n,0) for n in cfg.doctors], dtype=int), "cap": caps,
+                           "remaining": np.maximum(0, caps - taken)})
+    return remain.sort_values(["remaining","doctor"], ascending=[False,True])
+
+def rota_tables(cfg: RotaConfig, df: pd.DataFrame, stats: CoverageStats = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """(gaps, remain) for a rota — the two tables the app shows and the exports carry."""
+    stats = stats if stats is not None else CoverageStats(df, cfg.days, cfg.cov, cfg.facility)
+    return stats.gaps(), remaining_table(cfg, df)
+
+# ===== Greedy generation =====
+# The generators take two optional hooks for callers running them in the background:
+# progress(fraction, filled, short) — assignments in the rota and slots still short —
+# and cancel, anything with is_set() (a threading.Event). A cancelled run stops at the
+# next check and returns what it has: the partial rota, or the best one found so far.
+PROGRESS_EVERY = 64  # slots (or gaps) between progress calls
+
+def _cancelled(cancel) -> bool:
+    return cancel is not None and cancel.is_set()
+
+@profiling.timed()
+def greedy_pass(cfg: RotaConfig, elig: np.ndarray, seed=None, carry: Dict[str,List[Optional[str]]] = None,
+                progress=None, cancel=None) -> RotaState:
+    """One shuffled greedy fill of every coverage slot; deterministic for a given seed."""
+    rng = random.Random(seed)
+    docs = cfg.doctors; fac = cfg.facility
+    slots = []
+    for day in range(1, cfg.days+1):
+        for area in fac.areas:
+            for shift in fac.shifts:
+                req = int(cfg.cov.get((area, shift), 0))
+                slots += [(day, area, shift)]*req
+    rng.shuffle(slots)
+
+    state = RotaState(cfg, carry=carry)
+    caps = state.rules["cap"]
+
+    for k, (day, area, shift) in enumerate(slots):
+        if k % PROGRESS_EVERY == 0:
+            if _cancelled(cancel): break
+            if progress: progress(k/len(slots), len(state.assigned), len(slots) - len(state.assigned))
+        candidates = [nm for nm in slot_candidates(elig, docs, day, area, shift, fac)
+                      if rules_ok(nm, day, shift, state)[0]]
+        if candidates:
+            def score(nm):
+                assigned = state.counts.get(nm,0)
+                remaining = caps[nm] - assigned
+                return (assigned, state.weekends.get(nm,0), -remaining)
+            candidates.sort(key=score)
+            pick = candidates[0]
+            state.assign(pick, day, area, shift)
+    profiling.count("rules_ok", state.checks)
+    if progress: progress(1.0, len(state.assigned), len(slots) - len(state.assigned))
+    return state
+
+def rota_score(state: RotaState) -> Tuple[int,float,float]:
+    """(total short_by, load variance, weekend+night spread) — lower is better on every axis."""
+    cfg = state.cfg; docs = cfg.doctors
+    required = cfg.days * sum(int(v) for v in cfg.cov.values())
+    short = required - len(state.assigned)
+    loads = np.array([state.counts.get(n,0) for n in docs], dtype=float)
+    wkend = np.array([state.weekends.get(n,0) for n in docs], dtype=float)
+    night = np.array([state.nights.get(n,0) for n in docs], dtype=float)
+    if not docs: return short, 0.0, 0.0
+    return short, round(float(loads.var()), 3), round(float(wkend.std() + night.std()), 3)
+
+POOL_MIN_S = 2.0  # estimated serial seconds below which restarts stay in-process (a worker takes ~1 s to spawn)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+def _restart_pool(workers: int) -> ProcessPoolExecutor:
+    """The module's process pool, shared by every best_of_n call and only restarted to grow.
+
+    spawn, not fork: the app calls best_of_n from a job thread of a threaded server, and
+    a forked child can inherit a lock some other thread held at fork time."""
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size < workers:
+            if _pool is not None: _pool.shutdown(wait=False)  # restarts already queued still finish
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_size = workers
+        return _pool
+
+def _restart_job(args) -> Tuple[int, Tuple[int,float,float], List[Tuple[str,int,str,str]], int]:
+    cfg, elig, seed, carry = args
+    state = greedy_pass(cfg, elig, seed, carry)
+    return seed, rota_score(state), [(n,d,a,s) for (n,d),(a,s) in state.assigned.items()], state.checks
+
+@profiling.timed()
+def best_of_n(cfg: RotaConfig, elig: np.ndarray, n_restarts: int, base_seed: int = None,
+              workers: int = 0, carry: Dict[str,List[Optional[str]]] = None,
+              progress=None, cancel=None) -> Tuple[int, pd.DataFrame, pd.DataFrame]:
+    """Run n seeded greedy passes, in-process or across a process pool, and keep the best-scoring rota.
+
+    Seeds count up from base_seed (random if None), so the winner is reproduced by
+    greedy_pass(cfg, elig, seed). workers=0 times the first restart here and sizes
+    the shared pool from it (one worker per POOL_MIN_S of serial work left, at most
+    one per CPU), so small or fast batches stay in-process; workers=1 always does.
+    Returns (winning seed, rota, per-restart score table best first). Cancelling
+    keeps the restarts already finished (at least one)."""
+    if base_seed is None: base_seed = random.randrange(1_000_000_000)
+    jobs = [(cfg, elig, base_seed + i, carry) for i in range(int(n_restarts))]
+    required = cfg.days * sum(int(v) for v in cfg.cov.values())
+    results = []
+    def done(r) -> bool:
+        results.append(r)
+        if progress:
+            short = min(x[1][0] for x in results)
+            progress(len(results)/len(jobs), required - short, short)
+        return _cancelled(cancel)
+    rest = jobs; workers = int(workers)
+    if not workers and jobs:
+        # time one restart here; each pool worker must have POOL_MIN_S of the rest to earn its start-up
+        t0 = time.perf_counter()
+        rest = [] if done(_restart_job(jobs[0])) else jobs[1:]
+        workers = max(1, min(os.cpu_count() or 1, int((time.perf_counter() - t0) * len(rest) // POOL_MIN_S)))
+    workers = min(len(rest), workers)
+    if workers > 1:
+        ex = _restart_pool(workers)
+        futs = [ex.submit(_restart_job, j) for j in rest]
+        for f in as_completed(futs):
+            if done(f.result()):
+                for g in futs: g.cancel()
+                break
+        profiling.count("rules_ok", sum(r[3] for r in results[len(jobs)-len(rest):]))  # workers' counts are not seen here
+    else:
+        for j in rest:
+            if done(_restart_job(j)): break
+
+    results.sort(key=lambda r: (r[1], r[0]))
+    seed, _score, best, _checks = results[0]
+    code = cfg.facility.code_of
+    df = pd.DataFrame([{"doctor":n,"day":d,"area":a,"shift":s,"code":code[(a,s)]} for n,d,a,s in best],
+                      columns=COLUMNS)
+    summary = pd.DataFrame([{"rank":i+1, "seed":sd, "short_by":sc[0], "load_var":sc[1], "fairness":sc[2]}
+                            for i, (sd, sc, _, _c) in enumerate(results)])
+    return seed, df, summary
+
+@profiling.timed()
+def balance(cfg: RotaConfig, df: pd.DataFrame, gaps: pd.DataFrame, elig: np.ndarray,
+            carry: Dict[str,List[Optional[str]]] = None, progress=None, cancel=None) -> pd.DataFrame:
+    """Fill gaps, largest first, with the eligible doctors who have the most room left."""
+    if df.empty or gaps.empty: return df
+    edits = EditBuffer(df, cfg.facility)
+    state = RotaState.from_frame(df, cfg, carry)
+    docs = cfg.doctors
+    gaps_sorted = gaps.sort_values(["short_by","day"], ascending=[False, True])
+    required = cfg.days * sum(int(v) for v in cfg.cov.values())
+    for k, row in enumerate(gaps_sorted.itertuples(index=False)):
+        if k % PROGRESS_EVERY == 0:
+            if _cancelled(cancel): break
+            if progress: progress(k/len(gaps_sorted), len(state.assigned), required - len(state.assigned))
+        need = int(row.short_by); day = int(row.day); area = row.area; shift = row.shift
+        if day > cfg.days: continue
+        for _ in range(need):
+            cands = []
+            for nm in slot_candidates(elig, docs, day, area, shift, cfg.facility):
+                ok, _msg = rules_ok(nm, day, shift, state)
+                if ok:
+                    rem = int(cfg.cap_map[nm]) - state.counts.get(nm,0)
+                    cands.append((nm, rem, state.weekends.get(nm,0), state.nights.get(nm,0)))
+            if not cands: break
+            cands.sort(key=lambda x: (-x[1], x[2], x[3], x[0]))
+            pick = cands[0][0]
+            state.assign(pick, day, area, shift)
+            edits.add(pick, day, area, shift)
+    profiling.count("rules_ok", state.checks)
+    return edits.materialise()
+
+# ===== Exact solver =====
+KEPT_CURRENT = "KEPT_CURRENT"  # solve_optimal status: the solver's rota was worse than the (rule-abiding) warm start
+@profiling.timed()
+def solve_optimal(cfg: RotaConfig, elig: np.ndarray, current: pd.DataFrame = None,
+                  time_limit: float = 30.0, workers: int = 0,
+                  carry: Dict[str,List[Optional[str]]] = None,
+                  progress=None, cancel=None) -> Tuple[str, Optional[pd.DataFrame]]:
+    """Encode the constraints_ok rules as a CP-SAT model and solve the whole month.
+
+    Minimises total shortfall first and the spread of per-doctor workload second,
+    warm-starting from `current` when given; `carry` is the previous month's tail as
+    in RotaState. Returns (status name, rota in the long format greedy_pass produces
+    or None); status is "" if OR-Tools is unavailable. progress is called on every
+    improving solution; cancel stops the search with the best solution so far.
+
+    The hint is only a hint: CP-SAT drops it if `current` breaks a rule the model
+    enforces, and can then stop at a rota short of more slots. If `current` passes
+    audit_rota and the solver's rota has more shortfall, `current` is returned with
+    status KEPT_CURRENT instead; a `current` that breaks a rule is never returned."""
+    if not ORTOOLS_AVAILABLE: return "", None
+    from ortools.sat.python import cp_model
+    days = int(cfg.days); docs = list(cfg.doctors); fac = cfg.facility
+    year, month = int(cfg.year), int(cfg.month)
+    model = cp_model.CpModel()
+
+    # one boolean per eligible (doctor, day, area, shift); static rules prune the rest
+    x: Dict[Tuple[str,int,str,str], "cp_model.IntVar"] = {}
+    for i, d, a, s in np.argwhere(elig):
+        x[(docs[i], int(d), fac.areas[a], fac.shifts[s])] = model.NewBoolVar(f"x_{len(x)}")
+
+    by_doc_day: Dict[Tuple[str,int], list] = {}
+    by_doc_day_shift: Dict[Tuple[str,int,str], list] = {}
+    by_slot: Dict[Tuple[int,str,str], list] = {}
+    for (n,d,a,s), v in x.items():
+        by_doc_day.setdefault((n,d), []).append(v)
+        by_doc_day_shift.setdefault((n,d,s), []).append(v)
+        by_slot.setdefault((d,a,s), []).append(v)
+
+    # coverage: assigned + short == required, never over-staff a slot
+    shorts = []
+    for d in range(1, days+1):
+        for a in fac.areas:
+            for s in fac.shifts:
+                req = int(cfg.cov.get((a,s), 0))
+                if req <= 0: continue
+                short = model.NewIntVar(0, req, f"short_{d}_{a}_{s}")
+                model.Add(sum(by_slot.get((d,a,s), [])) + short == req)
+                shorts.append(short)
+
+    weeks: Dict[int, List[int]] = {}
+    for d in range(1, days+1):
+        weeks.setdefault(iso_week(year, month, d), []).append(d)
+    rest_bad = [(p, c) for p in fac.shifts for c in fac.shifts
+                if int(cfg.min_rest) > 0 and not rest_ok(p, c, cfg.min_rest, fac)]
+    K = int(cfg.max_consec)
+    # carried days as seen from this month: the streak ending on day 0, the days already in week 1
+    prev = RotaState(cfg, carry=carry)
+    first_week = weeks[iso_week(year, month, 1)]
+    hours = prev.shift_hours
+
+    loads = []
+    for n in docs:
+        work = {d: sum(by_doc_day.get((n,d), [])) for d in range(1, days+1)}
+        for d in range(1, days+1):
+            if by_doc_day.get((n,d)): model.Add(work[d] <= 1)
+        total = sum(work.values())
+        model.Add(total <= min(int(cfg.cap_map[n]), days - int(cfg.min_off)))
+        nights = [v for (nn,d,s), vs in by_doc_day_shift.items() if nn==n and s in fac.night for v in vs]
+        if nights: model.Add(sum(nights) <= int(cfg.max_night_map.get(n, 999)))
+        for wdays in weeks.values():
+            done = prev.week_count(n, 1) if wdays is first_week else 0
+            model.Add(sum(work[d] for d in wdays) <= max(0, int(cfg.max_week_map.get(n, 999)) - done))
+        for d in range(1, days):
+            for p, c in rest_bad:
+                a_ = by_doc_day_shift.get((n,d,p)); b_ = by_doc_day_shift.get((n,d+1,c))
+                if a_ and b_: model.Add(sum(a_) + sum(b_) <= 1)
+        p0 = prev.shift_on(n, 0)
+        for p, c in rest_bad:
+            if p == p0 and by_doc_day_shift.get((n,1,c)): model.Add(sum(by_doc_day_shift[(n,1,c)]) == 0)
+        for d in range(1, days-K+1):
+            model.Add(sum(work[t] for t in range(d, d+K+1)) <= K)
+        # windows that start in the carried tail: K+1 days holding `worked` carried ones
+        worked = 0
+        for j in range(1, K+1):
+            worked += 1 if prev.shift_on(n, 1-j) else 0
+            if worked and K+1-j >= 1:
+                model.Add(sum(work[t] for t in range(1, min(days, K+1-j)+1)) <= K - worked)
+        cap_h, week_h = int(cfg.max_hours_map.get(n, 0)), int(cfg.max_hours_week)
+        if cap_h or week_h:
+            hrs = {d: [(hours[s], v) for s in fac.shifts for v in by_doc_day_shift.get((n,d,s), [])]
+                   for d in range(1, days+1)}
+            if cap_h and any(hrs.values()):
+                model.Add(sum(h*v for d in hrs for h, v in hrs[d]) <= cap_h)
+            for e in range(1, days+1) if week_h else []:
+                # the rolling window ending on day e, with the carried tail's hours already in it
+                terms = [(h, v) for t in range(max(1, e-6), e+1) for h, v in hrs[t]]
+                if terms: model.Add(sum(h*v for h, v in terms) <= max(0, week_h - prev.hours7[n][e]))
+        if any(by_doc_day.get((n,d)) for d in range(1, days+1)):
+            load = model.NewIntVar(0, days, f"load_{len(loads)}")
+            model.Add(load == total)
+            loads.append(load)
+
+    # lexicographic objective: any unit of shortfall outweighs the whole load spread
+    spread = model.NewIntVar(0, days, "spread")
+    if loads:
+        hi = model.NewIntVar(0, days, "hi"); lo = model.NewIntVar(0, days, "lo")
+        model.AddMaxEquality(hi, loads); model.AddMinEquality(lo, loads)
+        model.Add(spread == hi - lo)
+    else:
+        model.Add(spread == 0)
+    model.Minimize(sum(shorts) * (days+1) + spread)
+
+    # warm start from the current rota (ignored by CP-SAT if it breaks any constraint)
+    if current is not None and not current.empty:
+        cur = {(r.doctor, int(r.day), r.area, r.shift) for r in current.itertuples(index=False)}
+        for key, v in x.items(): model.AddHint(v, key in cur)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = float(time_limit)
+    # CP-SAT's portfolio (LNS, feasibility jump, ...) needs several workers even on small hosts
+    solver.parameters.num_search_workers = int(workers) or max(8, os.cpu_count() or 1)
+    required = sum(int(cfg.cov.get((a,s), 0)) for a in fac.areas for s in fac.shifts) * days
+
+    class Watch(cp_model.CpSolverSolutionCallback):
+        def on_solution_callback(self):
+            short = int(self.ObjectiveValue()) // (days+1)
+            progress(min(1.0, self.WallTime()/float(time_limit)), required - short, short)
+
+    stop = threading.Event()
+    def watch_cancel():
+        while not stop.wait(0.2):
+            if _cancelled(cancel): solver.StopSearch(); return
+    if cancel is not None: threading.Thread(target=watch_cancel, daemon=True).start()
+    try:
+        status = solver.Solve(model, Watch()) if progress else solver.Solve(model)
+    finally:
+        stop.set()
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return solver.StatusName(status), None
+
+    rows = [{"doctor":n,"day":d,"area":a,"shift":s,"code":fac.code_of[(a,s)]}
+            for (n,d,a,s), v in x.items() if solver.Value(v)]
+    out = pd.DataFrame(rows, columns=COLUMNS)
+    if current is not None and not current.empty and (CoverageStats(out, days, cfg.cov, fac).total_short
+                                                      > CoverageStats(current, days, cfg.cov, fac).total_short):
+        from .audit import audit_rota  # audit imports this module
+        if audit_rota(cfg, current).empty: return KEPT_CURRENT, current
+    return solver.StatusName(status), out
+
+# ----- Local search -----
+GAP_WEIGHT = 1000  # one unfilled slot outweighs any fairness gain
+
+def _fairness(state: RotaState, name: str) -> int:
+    return state.counts.get(name,0)**2 + state.weekends.get(name,0)**2 + state.nights.get(name,0)**2
+
+@profiling.timed()
+def local_search(state: RotaState, elig: np.ndarray, budget_s: float = 5.0, max_iters: int = 200_000, seed=None, progress=None,
+                 cancel=None) -> Tuple[RotaState, dict]:
+    """Simulated-annealing improvement of an existing rota.
+
+    Neighbourhood: fill a gap, move a shift to another doctor, swap two doctors'
+    shifts, and a chain swap that hands one of a blocked doctor's shifts to someone
+    else so the blocked doctor can take a short slot. Every placement is checked with
+    the eligibility tensor plus rules_ok (which re-checks the whole run and the rest
+    gaps on both sides of the day), so no move adds a rule violation. Each move is
+    scored by its delta on GAP_WEIGHT·short + Σ(load² + weekends² + nights²) over the
+    touched doctors only.
+    progress(fraction, short, cost) is called a few times per second if given; a set
+    `cancel` ends the search early, keeping the best rota seen."""
+    rng = random.Random(seed); checks0 = state.checks
+    docs, cov, fac = state.cfg.doctors, state.cfg.cov, state.fac
+    AREAS, SHIFTS, AREA_IDX, SHIFT_IDX = fac.areas, fac.shifts, fac.area_idx, fac.shift_idx
+    days = min(state.rules["days"], elig.shape[1]-1)
+    req = {(AREA_IDX[a], SHIFT_IDX[s]): int(v) for (a,s), v in cov.items()}
+    cnt: Dict[Tuple[int,int,int],int] = {}
+    for (n,d),(a,s) in state.assigned.items():
+        k = (d, AREA_IDX[a], SHIFT_IDX[s]); cnt[k] = cnt.get(k,0) + 1
+    gaps = {(d,ai,si) for d in range(1, days+1) for (ai,si), r in req.items() if cnt.get((d,ai,si),0) < r}
+    short = sum(max(0, r - cnt.get((d,ai,si),0)) for d in range(1, days+1) for (ai,si), r in req.items())
+    fair = sum(_fairness(state, n) for n in set(docs) | set(state.counts))
+    cost = GAP_WEIGHT*short + fair
+    start_cost, start_short = cost, short
+    best_cost, best = cost, dict(state.assigned)
+
+    doc_pos = {n:i for i,n in enumerate(docs)}
+
+    def cands(d, ai, si):
+        out = [docs[i] for i in np.flatnonzero(elig[:, d, ai, si])]
+        rng.shuffle(out)
+        return out
+
+    def placed(d, ai, si):
+        cnt[(d,ai,si)] = cnt.get((d,ai,si),0) + 1
+        if cnt[(d,ai,si)] >= req[(ai,si)]: gaps.discard((d,ai,si))
+
+    def fill(gap) -> int:
+        """Give a short slot to a free eligible doctor; returns the cost delta (0 if none)."""
+        d, ai, si = gap; a, s = AREAS[ai], SHIFTS[si]
+        for y in cands(d, ai, si):
+            if rules_ok(y, d, s, state)[0]:
+                before = _fairness(state, y)
+                state.assign(y, d, a, s); placed(d, ai, si)
+                return _fairness(state, y) - before - GAP_WEIGHT
+        return 0
+
+    def chain(gap) -> int:
+        """Free a blocked eligible doctor by handing one of their shifts to someone else."""
+        d, ai, si = gap; a, s = AREAS[ai], SHIFTS[si]
+        for x in cands(d, ai, si)[:8]:
+            own = [d] if state.shift_on(x, d) else [t for t in range(1, days+1) if state.shift_on(x, t)]
+            rng.shuffle(own)
+            x_before = _fairness(state, x)
+            for d2 in own[:6]:
+                a2, s2 = state.unassign(x, d2)
+                if rules_ok(x, d, s, state)[0]:
+                    state.assign(x, d, a, s)
+                    for y in cands(d2, AREA_IDX[a2], SHIFT_IDX[s2]):
+                        if y != x and rules_ok(y, d2, s2, state)[0]:
+                            y_before = _fairness(state, y)
+                            state.assign(y, d2, a2, s2); placed(d, ai, si)
+                            return (_fairness(state, x) - x_before) + (_fairness(state, y) - y_before) - GAP_WEIGHT
+                    state.unassign(x, d)
+                state.assign(x, d2, a2, s2)
+        return 0
+
+    t0 = time.perf_counter(); last = t0; it = 0
+    keys: List[Tuple[str,int]] = []
+    while it < max_iters:
+        it += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed >= budget_s or (it % 256 == 0 and _cancelled(cancel)): break
+        if progress and elapsed - (last - t0) >= 0.2:
+            last = time.perf_counter(); progress(elapsed/budget_s, short, cost)
+        temp = max(0.05, 2.0 * (1 - elapsed/budget_s))
+        if it % 256 == 1: keys = [k for k in state.assigned if k[1] <= days]
+
+        if gaps and rng.random() < 0.5:
+            gap = rng.choice(tuple(gaps))
+            delta = fill(gap) or chain(gap)
+            if delta:
+                short -= 1; cost += delta
+        elif keys:
+            x, d = rng.choice(keys)
+            if (x, d) not in state.assigned: continue
+            if rng.random() < 0.5:
+                # move: hand x's shift on day d to another eligible doctor
+                a, s = state.assigned[(x, d)]; ai, si = AREA_IDX[a], SHIFT_IDX[s]
+                pool = np.flatnonzero(elig[:, d, ai, si])
+                if len(pool) < 2: continue
+                y = docs[int(rng.choice(pool))]
+                if y == x: continue
+                before = _fairness(state, x) + _fairness(state, y)
+                state.unassign(x, d)
+                if not rules_ok(y, d, s, state)[0]:
+                    state.assign(x, d, a, s); continue
+                state.assign(y, d, a, s)
+                delta = _fairness(state, x) + _fairness(state, y) - before
+                if delta <= 0 or rng.random() < math.exp(-delta/temp):
+                    cost += delta
+                else:
+                    state.unassign(y, d); state.assign(x, d, a, s)
+            else:
+                # swap: x and y exchange their shifts
+                y, d2 = rng.choice(keys)
+                if y == x or (y, d2) not in state.assigned: continue
+                a1, s1 = state.assigned[(x, d)]; a2, s2 = state.assigned[(y, d2)]
+                if (a1, s1, d) == (a2, s2, d2): continue
+                ix, iy = doc_pos.get(x, -1), doc_pos.get(y, -1)
+                if ix < 0 or iy < 0: continue
+                if not (elig[iy, d, AREA_IDX[a1], SHIFT_IDX[s1]] and elig[ix, d2, AREA_IDX[a2], SHIFT_IDX[s2]]): continue
+                before = _fairness(state, x) + _fairness(state, y)
+                state.unassign(x, d); state.unassign(y, d2)
+                if rules_ok(x, d2, s2, state)[0]:
+                    state.assign(x, d2, a2, s2)
+                    if rules_ok(y, d, s1, state)[0]:
+                        state.assign(y, d, a1, s1)
+                        delta = _fairness(state, x) + _fairness(state, y) - before
+                        if delta <= 0 or rng.random() < math.exp(-delta/temp):
+                            cost += delta
+                            if cost < best_cost: best_cost, best = cost, dict(state.assigned)
+                            continue
+                        state.unassign(y, d)
+                    state.unassign(x, d2)
+                state.assign(x, d, a1, s1); state.assign(y, d2, a2, s2)
+                continue
+        if cost < best_cost: best_cost, best = cost, dict(state.assigned)
+
+    profiling.count("rules_ok", state.checks - checks0)
+    profiling.count("local_search_iters", it)
+    if cost > best_cost:
+        # annealing drifted uphill at the end; fall back to the best rota seen
+        fresh = RotaState(state.cfg, state.days, state.carry)
+        for (n,d),(a,s) in best.items(): fresh.assign(n, d, a, s)
+        state, cost = fresh, best_cost
+        short = (cost - sum(_fairness(state, n) for n in set(docs) | set(state.counts))) // GAP_WEIGHT
+    if progress: progress(1.0, short, cost)
+    return state, {"iterations": it, "short_before": start_short, "short_after": int(short),
+                   "cost_before": start_cost, "cost_after": int(cost)}
+
+# ===== Repair =====
+def with_absences(cfg: RotaConfig, absences: Dict[str,set]) -> RotaConfig:
+    """Copy of cfg with extra unavailable days merged into each doctor's off-days."""
+    off = {n: set(v) for n, v in cfg.offdays.items()}
+    for n, days in absences.items(): off.setdefault(n, set()).update(int(d) for d in days)
+    return replace(cfg, offdays=off)
+
+def rota_diff(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Changed (doctor, day) cells between two rotas as doctor, day, before, after codes ("" = off)."""
+    def cells(df):
+        return {} if df.empty else dict(zip(zip(df["doctor"], df["day"].astype(int)), df["code"]))
+    a, b = cells(before), cells(after)
+    rows = [{"doctor": n, "day": d, "before": a.get((n,d), ""), "after": b.get((n,d), "")}
+            for (n,d) in sorted(set(a) | set(b), key=lambda k: (k[1], k[0])) if a.get((n,d)) != b.get((n,d))]
+    return pd.DataFrame(rows, columns=["doctor","day","before","after"])
+
+@profiling.timed()
+def repair(cfg: RotaConfig, df: pd.DataFrame, absences: Dict[str,set], elig: np.ndarray = None,
+           radius: int = 2, carry: Dict[str,List[Optional[str]]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Patch a rota after doctors become unavailable, touching as few cells as possible.
+
+    Every assignment of an absent doctor on an absent day is dropped and its slot
+    refilled: first by a free eligible doctor, otherwise by a one-step chain that moves
+    an eligible but blocked doctor off one of their shifts within `radius` days and
+    hands that shift to someone free. Assignments outside the touched days are pinned.
+    `elig` may be the tensor for cfg before the absences; it is copied, not rebuilt.
+    Returns (new rota, rota_diff of changed cells)."""
+    docs = cfg.doctors
+    pos = {n:i for i,n in enumerate(docs)}
+    cfg2 = with_absences(cfg, absences)
+    elig = (elig if elig is not None else eligibility_matrix(cfg)).copy()
+    for n, days in absences.items():
+        if n in pos: elig[pos[n], [d for d in days if 1 <= d <= cfg.days]] = False
+
+    edits = EditBuffer(df, cfg.facility)
+    state = RotaState.from_frame(df, cfg2, carry)
+    freed = []
+    for n, days in absences.items():
+        for d in sorted(days):
+            if (n, d) in state.assigned:
+                a, s = state.unassign(n, d); edits.remove(n, d); freed.append((d, a, s))
+
+    def pick(d, a, s, exclude=()):
+        best = None
+        for y in slot_candidates(elig, docs, d, a, s, cfg.facility):
+            if y in exclude or not rules_ok(y, d, s, state)[0]: continue
+            key = (-(state.rules["cap"][y] - state.counts.get(y,0)), state.weekends.get(y,0), state.nights.get(y,0), y)
+            if best is None or key < best[0]: best = (key, y)
+        return best[1] if best else None
+
+    for d, a, s in sorted(freed):
+        y = pick(d, a, s)
+        if y is not None:
+            state.assign(y, d, a, s); edits.add(y, d, a, s); continue
+        # chain: x is eligible for (d, a, s) but blocked by one of their own shifts nearby
+        for x in slot_candidates(elig, docs, d, a, s, cfg.facility):
+            done = False
+            for d2 in range(max(1, d-radius), min(cfg.days, d+radius)+1):
+                if (x, d2) not in state.assigned: continue
+                a2, s2 = state.unassign(x, d2)
+                if rules_ok(x, d, s, state)[0]:
+                    state.assign(x, d, a, s)
+                    y = pick(d2, a2, s2, exclude=(x,))
+                    if y is not None:
+                        state.assign(y, d2, a2, s2)
+                        edits.remove(x, d2); edits.add(x, d, a, s); edits.add(y, d2, a2, s2)
+                        done = True; break
+                    state.unassign(x, d)
+                state.assign(x, d2, a2, s2)
+            if done: break
+    profiling.count("rules_ok", state.checks)
+    new = edits.materialise()
+    return new, rota_diff(df, new)
+
+# ===== Rolling horizon =====
+def next_month_config(cfg: RotaConfig) -> RotaConfig:
+    """Same roster and rules for the following calendar month; off-days and holidays are per month and start empty."""
+    y, m = (cfg.year + 1, 1) if cfg.month == 12 else (cfg.year, cfg.month + 1)
+    return replace(cfg, year=y, month=m, days=calendar.monthrange(y, m)[1], cov=dict(cfg.cov),
+                   doctors=list(cfg.doctors), group_map=dict(cfg.group_map), cap_map=dict(cfg.cap_map),
+                   allowed_shifts={n: set(v) for n, v in cfg.allowed_shifts.items()},
+                   offdays={n: set() for n in cfg.doctors}, max_night_map=dict(cfg.max_night_map),
+                   max_week_map=dict(cfg.max_week_map), avoid_holidays_map=dict(cfg.avoid_holidays_map),
+                   max_hours_map=dict(cfg.max_hours_map), holidays=set())
+
+class RollingHorizon:
+    """Consecutive months scheduled one at a time.
+
+    Each new month is generated against the tail of the month before it (see
+    RotaState.carry), so max_consec, min_rest and the ISO-week limit hold across
+    boundaries. Earlier months are never re-solved: adding a month only touches the
+    new one, and the carry comes from the last month's RotaState kept in memory."""
+    def __init__(self, first: RotaConfig):
+        self.first = first
+        self.configs: List[RotaConfig] = []
+        self.frames: List[pd.DataFrame] = []
+        self._last: Optional[RotaState] = None
+
+    def next_config(self) -> RotaConfig:
+        return self.first if not self.configs else next_month_config(self.configs[-1])
+
+    def carry(self) -> Dict[str,List[Optional[str]]]:
+        return self._last.tail() if self._last is not None else {}
+
+    def add_month(self, cfg: RotaConfig = None, method: str = "greedy", seed=None, restarts: int = 8,
+                  improve_s: float = 0.0, time_limit: float = 30.0, df: pd.DataFrame = None) -> pd.DataFrame:
+        """Schedule the next month ("greedy", "best" or "solve", optionally followed by
+        improve_s of local search) or adopt `df` as that month's rota; returns it."""
+        cfg = cfg or self.next_config()
+        carry = self.carry()
+        elig = eligibility_matrix(cfg)
+        if df is None:
+            if method == "solve":
+                _status, df = solve_optimal(cfg, elig, greedy_pass(cfg, elig, seed, carry).to_frame(),
+                                            time_limit, carry=carry)
+            if method == "best":
+                df = best_of_n(cfg, elig, restarts, seed, carry=carry)[1]
+            if df is None:
+                df = greedy_pass(cfg, elig, seed, carry).to_frame()
+        state = RotaState.from_frame(df, cfg, carry)
+        if improve_s > 0:
+            state, _stats = local_search(state, elig, improve_s, seed=seed)
+            df = state.to_frame()
+        self.configs.append(cfg); self.frames.append(df); self._last = state
+        return df
+
+    def run(self, months: int, **kw) -> "RollingHorizon":
+        for _ in range(int(months) - len(self.configs)): self.add_month(**kw)
+        return self
+
+    def summary(self) -> pd.DataFrame:
+        rows = []
+        for cfg, df in zip(self.configs, self.frames):
+            rows.append({"year": cfg.year, "month": cfg.month, "days": cfg.days, "assignments": len(df),
+                         "short_by": CoverageStats(df, cfg.days, cfg.cov, cfg.facility).total_short})
+        return pd.DataFrame(rows, columns=["year","month","days","assignments","short_by"])
+
+    def to_frame(self) -> pd.DataFrame:
+        """All months in long format with year/month columns in front."""
+        parts = [df.assign(year=cfg.year, month=cfg.month) for cfg, df in zip(self.configs, self.frames)]
+        if not parts: return pd.DataFrame(columns=["year","month"] + COLUMNS)
+        return pd.concat(parts, ignore_index=True)[["year","month"] + COLUMNS]
+
+    def compact(self) -> List[CompactRota]:
+        """Each month as a CompactRota over its own roster (a few KB per month instead of a long frame)."""
+        return [CompactRota.from_frame(df, cfg.days, cfg.doctors, cfg.facility) for cfg, df in zip(self.configs, self.frames)]
+
+# ===== Views helpers =====
+# thin wrappers over CompactRota (rota/compact.py); callers that want several views of
+# one rota build the CompactRota once and take them from it.
+def sheet_day_doctor(df: pd.DataFrame, days:int, doctors:List[str], fac: Facility = DEFAULT_FACILITY) -> pd.DataFrame:
+    return CompactRota.from_frame(df, days, doctors, fac).sheet()
+
+def grid_doctor_day(df: pd.DataFrame, days:int, doctors:List[str], fac: Facility = DEFAULT_FACILITY) -> pd.DataFrame:
+    return CompactRota.from_frame(df, days, doctors, fac).grid()
+
+def day_shift_map(df: pd.DataFrame, days:int, fac: Facility = DEFAULT_FACILITY) -> Dict[int, Dict[str, List[str]]]:
+    return CompactRota.from_frame(df, days, (), fac).by_shift()
+
+# ===== Inline edits =====
+@profiling.timed()
+def apply_grid_edits(cfg: RotaConfig, df_old: pd.DataFrame, grid_new: pd.DataFrame, validate: bool = True,
+                     force: bool = False) -> Tuple[pd.DataFrame, List[Tuple[str,int,str,str]]]:
+    """Apply a doctor × day code grid to a rota; returns (new rota, rejected (doctor, day, code, reason))."""
+    edits = EditBuffer(df_old, cfg.facility)
+    state = RotaState.from_frame(df_old, cfg)
+    invalid = []
+    row_of = {doc: i for i, doc in enumerate(grid_new.index)}
+    day_cols = [(j, int(d_str)) for j, d_str in enumerate(grid_new.columns)]
+    values = grid_new.to_numpy(dtype=object)
+    for doc in cfg.doctors:
+        if doc not in row_of: continue
+        row = values[row_of[doc]]
+        for j, day in day_cols:
+            new_code = str(row[j]).strip().upper()
+            old_code = ""
+            if (doc, day) in state.assigned:
+                old_code = cfg.facility.code_of[state.assigned[(doc,day)]]
+            if new_code == old_code: continue
+            if (doc, day) in state.assigned:
+                state.unassign(doc, day)
+                edits.remove(doc, day)
+            if new_code == "" or len(new_code)<2: continue
+            area, shift = cfg.facility.parse_code(new_code)
+            if area=="" or shift=="":
+                invalid.append((doc, day, new_code, "bad code"))
+            else:
+                if validate and not force:
+                    ok, msg = constraints_ok(doc, day, area, shift, state)
+                    if not ok:
+                        invalid.append((doc, day, new_code, msg))
+                        continue
+                state.assign(doc, day, area, shift)
+                edits.add(doc, day, area, shift)
+    profiling.count("rules_ok", state.checks)
+    return edits.materialise(), invalid
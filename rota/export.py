@@ -0,0 +1,294 @@
+# rota/export.py — Excel / PDF writers
+# -----------------------------------------
+# xlsxwriter and reportlab stay optional: they are probed here and imported only
+# inside the writer that needs them, so importing the engine never loads them.
+
+import calendar, importlib.util, tempfile
+from io import BytesIO
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from .engine import CoverageStats
+from .compact import CompactRota
+from .facility import Facility, DEFAULT_FACILITY
+from .metrics import FairnessStats
+from .audit import audit_rota, audit_summary
+from .i18n import I18N, AREA_LABEL
+
+XLSX_AVAILABLE = importlib.util.find_spec("xlsxwriter") is not None
+REPORTLAB_AVAILABLE = importlib.util.find_spec("reportlab") is not None
+
+SPOOL_MAX = 16 * 2**20  # export_excel keeps the finished workbook in memory up to this size, then on disk
+
+class ExcelFormats:
+    """Every cell format of a rota workbook, created once per Workbook and shared by all its sheets."""
+    def __init__(self, wb, fac: Facility, area_colors: Dict[str,str]):
+        base = {"align":"center","valign":"vcenter","border":1}
+        self.hdr = wb.add_format({**base, "bold":True, "bg_color":"#E8EEF9"})
+        self.day_hdr = wb.add_format({**base, "bold":True, "bg_color":"#EEF5FF"})
+        self.cell = wb.add_format(base)
+        self.left_hdr = wb.add_format({**base, "bold":True, "align":"left", "bg_color":"#F8F9FE"})
+        self.left_wrap = wb.add_format({"align":"left","valign":"top","border":1,"text_wrap":True})
+        self.blank = wb.add_format(base)
+        self.ok = wb.add_format({**base, "bg_color":"#E7F7E9"})
+        self.short = wb.add_format({**base, "bg_color":"#FDEAEA"})
+        self.area = {a: wb.add_format({**base, "bg_color": area_colors[a]}) for a in fac.areas if a in area_colors}
+        self.code = {c: self.area.get(fac.area_of_code[c], self.cell) for c in fac.codes}  # coloured code cell
+        self.by_shift = {c: self.area.get(fac.area_of_code[c], self.left_wrap) for c in fac.codes}
+
+def export_excel(sheet: pd.DataFrame, gaps: pd.DataFrame, remain: pd.DataFrame,
+                 year:int, month:int, df_assign: pd.DataFrame,
+                 days:int, lang:str, area_colors: Dict[str,str], cov: Dict[Tuple[str,str],int],
+                 stats: CoverageStats = None, fac: Facility = None, fairness: FairnessStats = None,
+                 violations: pd.DataFrame = None) -> bytes:
+    """Styled workbook; reads nothing from session state so it can run off the script thread.
+
+    Areas and code columns follow `fac` (default: the one `stats` was built with);
+    "Fairness" and "Violations" sheets are added when `fairness` / `violations` (audit_rota) are given.
+    Streamed through write_excel into a spooled buffer; only the finished file is held as bytes."""
+    if not XLSX_AVAILABLE: return b""
+    return _spooled(write_excel, sheet, gaps, remain, year, month, df_assign, days, lang, area_colors, cov,
+                    stats, fac, fairness, violations)
+
+def _spooled(write, *args) -> bytes:
+    """Bytes of write(target, *args), written through a buffer that spills to disk past SPOOL_MAX."""
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX) as out:
+        write(out, *args)
+        out.seek(0)
+        return out.read()
+
+def write_excel(target, sheet: pd.DataFrame, gaps: pd.DataFrame, remain: pd.DataFrame,
+                year:int, month:int, df_assign: pd.DataFrame,
+                days:int, lang:str, area_colors: Dict[str,str], cov: Dict[Tuple[str,str],int],
+                stats: CoverageStats = None, fac: Facility = None, fairness: FairnessStats = None,
+                violations: pd.DataFrame = None):
+    """export_excel's workbook written to `target` (a path or a seekable binary file).
+
+    xlsxwriter runs in constant_memory mode: each row goes to a temp file as soon as
+    the next one starts, so memory stays flat however many doctors or days there are."""
+    import xlsxwriter
+    fac = fac or (stats.fac if stats is not None else DEFAULT_FACILITY)
+    wb = xlsxwriter.Workbook(target, {"constant_memory": True})
+    try:
+        _write_month(wb, ExcelFormats(wb, fac, area_colors), "", sheet, gaps, remain, year, month, df_assign,
+                     days, lang, cov, stats, fac, fairness, violations)
+    finally:
+        wb.close()
+
+def _day_labels(year: int, month: int, days, lang: str) -> Dict[int,str]:
+    weekdays = I18N[lang]["weekday"]
+    return {int(d): f"{int(d)}/{int(month)}\n{weekdays[calendar.weekday(year, month, int(d))]}" for d in days}
+
+def _write_frame(ws, r0: int, frame: pd.DataFrame, hdr, fmt) -> int:
+    """Header + rows of `frame` from row r0; returns the first row after it."""
+    ws.write_row(r0, 0, list(frame.columns), hdr)
+    for i, row in enumerate(frame.itertuples(index=False), start=r0+1):
+        ws.write_row(i, 0, [v.item() if hasattr(v, "item") else v for v in row], fmt)
+    return r0 + len(frame) + 1
+
+def _write_month(wb, F: ExcelFormats, prefix: str, sheet: pd.DataFrame, gaps: pd.DataFrame, remain: pd.DataFrame,
+                 year: int, month: int, df_assign: pd.DataFrame, days: int, lang: str, cov: Dict[Tuple[str,str],int],
+                 stats: CoverageStats, fac: Facility, fairness: FairnessStats, violations: pd.DataFrame):
+    """One month's sheets, each written strictly row by row (what constant_memory requires)."""
+    stats = stats if stats is not None else CoverageStats(df_assign, days, cov, fac)
+    codes = fac.codes
+    labels = _day_labels(year, month, list(sheet.index) + list(range(1, days+1)), lang)
+    # the day × doctor codes once, as a normalised object array ("" = off)
+    vals = sheet.to_numpy(dtype=object)
+    cells = [["" if pd.isna(v) else str(v).upper().strip() for v in row] for row in vals]
+    doctors = list(sheet.columns); sheet_days = [int(d) for d in sheet.index]
+    def code_cell(ws, i, j, code):
+        ws.write(i, j, code, F.code.get(code, F.cell) if code else F.blank)
+
+    # Rota (Day×Doctor): colored cells with code text
+    ws = wb.add_worksheet(prefix + "Rota")
+    ws.freeze_panes(1,1)
+    ws.set_column(0, 0, 14)
+    if doctors: ws.set_column(1, len(doctors), 18)
+    ws.write(0,0, I18N[lang]["day"], F.hdr)
+    ws.write_row(0, 1, doctors, F.hdr)
+    for i, day in enumerate(sheet_days, start=1):
+        ws.set_row(i, 24)
+        ws.write(i,0, labels[day], F.day_hdr)
+        for j, code in enumerate(cells[i-1], start=1): code_cell(ws, i, j, code)
+
+    # Doctor×Day
+    wsD = wb.add_worksheet(prefix + "Doctor×Day")
+    wsD.freeze_panes(1,1)
+    wsD.set_column(0, 0, 24)
+    if sheet_days: wsD.set_column(1, len(sheet_days), 12)
+    wsD.write(0,0, I18N[lang]["doctor"], F.hdr)
+    wsD.write_row(0, 1, [labels[d] for d in sheet_days], F.hdr)
+    for i, doc in enumerate(doctors, start=1):
+        wsD.set_row(i, 20)
+        wsD.write(i,0, doc, F.left_hdr)
+        for j in range(len(sheet_days)): code_cell(wsD, i, j+1, cells[j][i-1])
+
+    # Coverage gaps
+    ws2 = wb.add_worksheet(prefix + "Coverage gaps")
+    cols = ["day","shift","area","abbr","required","assigned","short_by"]
+    ws2.write_row(0, 0, cols, F.hdr)
+    for i,row in enumerate(gaps.itertuples(index=False), start=1):
+        ws2.write_row(i, 0, [getattr(row,cname) if hasattr(row,cname) else row[j] for j, cname in enumerate(cols)], F.cell)
+
+    # Remaining capacity
+    ws3 = wb.add_worksheet(prefix + "Remaining capacity")
+    cols2 = [c for c in ["doctor","assigned","hours","cap","remaining"] if c in remain.columns]
+    ws3.write_row(0, 0, cols2, F.hdr)
+    for i,row in enumerate(remain.itertuples(index=False), start=1):
+        ws3.write_row(i, 0, [getattr(row,cname) if hasattr(row,cname) else row[j] for j, cname in enumerate(cols2)], F.cell)
+
+    # ByShift (names)
+    ws4 = wb.add_worksheet(prefix + "ByShift")
+    ws4.freeze_panes(1,1)
+    ws4.set_column(0, 0, 14)
+    ws4.set_column(1, len(codes), 24)
+    ws4.write(0,0, I18N[lang]["day"], F.hdr)
+    ws4.write_row(0, 1, codes, F.hdr)
+    dmap = CompactRota.from_frame(df_assign, days, (), fac).by_shift()
+    for i, day in enumerate(sorted(dmap.keys()), start=1):
+        ws4.set_row(i, 30)
+        ws4.write(i,0, labels[day], F.hdr)
+        for j, code in enumerate(codes, start=1):
+            ws4.write(i,j, "\n".join(dmap[day].get(code, [])), F.by_shift[code])
+
+    # Daily Dashboard: assigned/required per code, straight from the coverage count arrays
+    ws5 = wb.add_worksheet(prefix + "Daily Dashboard")
+    ws5.freeze_panes(1,1)
+    ws5.set_column(0, 0, 16)
+    ws5.set_column(1, len(codes), 12)
+    ws5.write(0,0, I18N[lang]["day"], F.hdr)
+    ws5.write_row(0, 1, codes, F.hdr)
+    ai = [fac.area_idx[fac.slot_of[c][0]] for c in codes]; si = [fac.shift_idx[fac.slot_of[c][1]] for c in codes]
+    got = stats.counts[:, ai, si].tolist(); need = stats.req[ai, si].tolist(); short = stats.short[:, ai, si].tolist()
+    for t in range(stats.days):
+        ws5.set_row(t+1, 20)
+        ws5.write(t+1,0, labels[t+1], F.hdr)
+        for j in range(len(codes)):
+            ws5.write(t+1, j+1, f"{got[t][j]}/{need[j]}", F.ok if short[t][j]==0 else F.short)
+
+    # Area Totals
+    ws6 = wb.add_worksheet(prefix + "Area Totals")
+    ws6.freeze_panes(1,1)
+    ws6.set_column(0, 0, 22)
+    ws6.set_column(1, days, 12)
+    ws6.write(0,0, "Area" if lang=="en" else "القسم", F.hdr)
+    ws6.write_row(0, 1, [labels[d] for d in range(1, days+1)], F.hdr)
+    area_got = stats.counts.sum(axis=2).T.tolist(); area_need = stats.req.sum(axis=1).tolist()
+    for i, area in enumerate(fac.areas):
+        ws6.set_row(i+1, 20)
+        ws6.write(i+1,0, AREA_LABEL[lang].get(area, area), F.left_hdr)
+        for t in range(days):
+            ws6.write(i+1, t+1, f"{area_got[i][t]}/{area_need[i]}", F.ok if area_got[i][t] >= area_need[i] else F.short)
+
+    # Fairness: summary, per group, per doctor — stacked with a blank row between
+    if fairness is not None:
+        ws7 = wb.add_worksheet(prefix + "Fairness")
+        ws7.set_column(0, 0, 24); ws7.set_column(1, 16, 12)
+        r0 = 0
+        for frame in (fairness.summary(), fairness.groups(), fairness.doctors):
+            r0 = _write_frame(ws7, r0, frame, F.hdr, F.cell) + 1
+
+    # Violations: per-rule counts, then every flagged cell
+    if violations is not None:
+        ws8 = wb.add_worksheet(prefix + "Violations")
+        ws8.set_column(0, 0, 24); ws8.set_column(1, 3, 18)
+        r0 = 0
+        for frame in (audit_summary(violations), violations):
+            r0 = _write_frame(ws8, r0, frame, F.hdr, F.short) + 1
+
+def export_pdf(sheet: pd.DataFrame, year:int, month:int, lang:str, area_colors: Dict[str,str],
+               fac: Facility = DEFAULT_FACILITY) -> bytes:
+    if not REPORTLAB_AVAILABLE:
+        return b""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    buf = BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=landscape(A4), leftMargin=20, rightMargin=20, topMargin=20, bottomMargin=20)
+    styles = getSampleStyleSheet()
+    story = []
+    title = f"ED Rota — {month}/{year}"
+    story.append(Paragraph(title, styles["Title"]))
+    story.append(Spacer(1, 6))
+
+    header = ["Day"] + list(sheet.columns)
+    data = [header]
+    for day in sheet.index:
+        wd = I18N[lang]["weekday"][calendar.weekday(year, month, int(day))]
+        row = [f"{int(day)}/{int(month)}\n{wd}"]
+        for docname in sheet.columns:
+            v = sheet.loc[day, docname]
+            row.append("" if (pd.isna(v) or str(v).strip()=="") else str(v).upper().strip())
+        data.append(row)
+
+    tbl = Table(data, repeatRows=1)
+    base = [
+        ('FONT', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#EEF5FF")),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('GRID', (0,0), (-1,-1), 0.3, colors.HexColor("#CCCCCC")),
+    ]
+    for i, day in enumerate(sheet.index, start=1):
+        for j, docname in enumerate(sheet.columns, start=1):
+            v = sheet.loc[day, docname]
+            if pd.isna(v) or str(v).strip()=="": continue
+            code = str(v).upper().strip()
+            bg = area_colors.get(fac.area_of_code.get(code), "#FFFFFF")
+            base.append(('BACKGROUND', (j,i), (j,i), colors.HexColor(bg)))
+    tbl.setStyle(TableStyle(base))
+    story.append(tbl)
+    doc.build(story)
+    return buf.getvalue()
+
+DEFAULT_AREA_COLORS = {"fast":"#FFF7C2","resp_triage":"#E7F7E9","acute":"#E6F3FF","resus":"#FDEAEA"}
+
+def _rota_parts(cfg, df: pd.DataFrame) -> tuple:
+    """export_excel's arguments after (sheet ... days) for a RotaConfig + rota, minus lang/colours."""
+    from .engine import sheet_day_doctor, rota_tables
+    stats = CoverageStats(df, cfg.days, cfg.cov, cfg.facility)
+    gaps, remain = rota_tables(cfg, df, stats)
+    return sheet_day_doctor(df, cfg.days, cfg.doctors, cfg.facility), gaps, remain, cfg.year, cfg.month, df, cfg.days, stats
+
+def rota_excel(cfg, df: pd.DataFrame, lang: str = "en", area_colors: Dict[str,str] = None) -> bytes:
+    """export_excel for a RotaConfig + rota, deriving the sheet and tables itself."""
+    *head, stats = _rota_parts(cfg, df)
+    return export_excel(*head, lang, area_colors or DEFAULT_AREA_COLORS, cfg.cov, stats, cfg.facility,
+                        FairnessStats(cfg, df), audit_rota(cfg, df))
+
+def write_rota_excel(target, cfg, df: pd.DataFrame, lang: str = "en", area_colors: Dict[str,str] = None):
+    """rota_excel streamed straight to `target` (path or binary file), never holding the workbook in memory."""
+    *head, stats = _rota_parts(cfg, df)
+    write_excel(target, *head, lang, area_colors or DEFAULT_AREA_COLORS, cfg.cov, stats, cfg.facility,
+                FairnessStats(cfg, df), audit_rota(cfg, df))
+
+def write_horizon_excel(target, configs: List, frames: List[pd.DataFrame], lang: str = "en",
+                        area_colors: Dict[str,str] = None):
+    """Several months (RollingHorizon.configs / .frames) in one streamed workbook, sheets prefixed "YYYY-MM ".
+
+    One ExcelFormats serves every month, so the style table does not grow with the horizon."""
+    import xlsxwriter
+    if not configs: raise ValueError("no months to export")
+    colors = area_colors or DEFAULT_AREA_COLORS
+    wb = xlsxwriter.Workbook(target, {"constant_memory": True})
+    try:
+        F = ExcelFormats(wb, configs[0].facility, colors)
+        for cfg, df in zip(configs, frames):
+            *head, stats = _rota_parts(cfg, df)
+            _write_month(wb, F, f"{int(cfg.year)}-{int(cfg.month):02d} ", *head, lang, cfg.cov, stats, cfg.facility,
+                         FairnessStats(cfg, df), audit_rota(cfg, df))
+    finally:
+        wb.close()
+
+def horizon_excel(configs: List, frames: List[pd.DataFrame], lang: str = "en", area_colors: Dict[str,str] = None) -> bytes:
+    """write_horizon_excel as bytes (for a download button)."""
+    if not XLSX_AVAILABLE: return b""
+    return _spooled(write_horizon_excel, configs, frames, lang, area_colors)
+
+def rota_pdf(cfg, df: pd.DataFrame, lang: str = "en", area_colors: Dict[str,str] = None) -> bytes:
+    from .engine import sheet_day_doctor
+    return export_pdf(sheet_day_doctor(df, cfg.days, cfg.doctors, cfg.facility), cfg.year, cfg.month, lang,
+                      area_colors or DEFAULT_AREA_COLORS, cfg.facility)
@@ -0,0 +1,127 @@
+# rota/facility.py — the department model: areas, shift definitions, group → area rules
+# -----------------------------------------
+# A Facility is plain data (to_dict/from_dict round-trips through JSON) that is
+# compiled once, on construction, into integer-indexed lookup tables: code ↔ (area,
+# shift), the group × area mask, per-shift hours and the shift × shift rest matrix.
+# The constraint checker, coverage counters, exporters and renderers all read those
+# tables, so a bigger ED with more zones or a 12-hour pattern is a config change.
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+@dataclass(frozen=True)
+class Area:
+    key: str
+    code: str  # rota-code prefix, e.g. "F" → F1/F2/F3
+
+@dataclass(frozen=True)
+class ShiftDef:
+    key: str
+    code: str  # rota-code suffix, e.g. "1"
+    start: int  # hour of day the shift starts (0–23)
+    end: int    # hour it ends; end <= start means it runs past midnight
+
+    @property
+    def hours(self) -> int:
+        return (self.end - self.start) % 24 or 24
+
+    @property
+    def overnight(self) -> bool:
+        return self.end <= self.start
+
+@dataclass
+class Facility:
+    """Areas, shifts and which groups may staff which areas.
+
+    `night_shifts` are the shifts max_night counts (default: the overnight ones).
+    Compiled tables (read-only after construction):
+      areas / shifts / groups   key lists; list position is the integer index
+      area_idx / shift_idx      key → index
+      codes                     every rota code, area-major (the by-shift column order)
+      code_of                   (area, shift) → code;  slot_of: code → (area, shift)
+      group_areas / group_mask  group → set of areas;  groups × areas bool array
+      hours                     per-shift duration (int array, shift order)
+      rest                      shifts × shifts int array: hours off between prev and the next day's shift
+      night                     set of shift keys max_night applies to"""
+    area_defs: List[Area]
+    shift_defs: List[ShiftDef]
+    group_area_map: Dict[str, List[str]]
+    night_shifts: Optional[List[str]] = None
+    _sig: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.areas = [a.key for a in self.area_defs]
+        self.shifts = [s.key for s in self.shift_defs]
+        self.groups = list(self.group_area_map)
+        for what, keys in (("area", self.areas), ("shift", self.shifts)):
+            if not keys: raise ValueError(f"a facility needs at least one {what}")
+            if len(set(keys)) != len(keys): raise ValueError(f"duplicate {what} keys")
+        for s in self.shift_defs:
+            if not (0 <= s.start <= 23 and 0 <= s.end <= 23): raise ValueError(f"{s.key}: hours must be 0–23")
+        self.area_idx = {a:i for i,a in enumerate(self.areas)}
+        self.shift_idx = {s:i for i,s in enumerate(self.shifts)}
+        self.area_code = {a.key: a.code for a in self.area_defs}
+        self.shift_code = {s.key: s.code for s in self.shift_defs}
+        self.code_of = {(a.key, s.key): f"{a.code}{s.code}" for a in self.area_defs for s in self.shift_defs}
+        self.codes = list(self.code_of.values())
+        if len(set(self.codes)) != len(self.codes): raise ValueError("area/shift codes are ambiguous")
+        self.slot_of = {c: k for k, c in self.code_of.items()}
+        self.area_of_code = {c: k[0] for k, c in self.code_of.items()}
+        self.group_areas = {g: set(v) for g, v in self.group_area_map.items()}
+        bad = {a for v in self.group_areas.values() for a in v} - set(self.areas)
+        if bad: raise ValueError(f"unknown areas in groups: {sorted(bad)}")
+        self.group_mask = np.array([[a in self.group_areas[g] for a in self.areas] for g in self.groups],
+                                   dtype=bool).reshape(len(self.groups), len(self.areas))
+        self.hours = np.array([s.hours for s in self.shift_defs], dtype=np.int32)
+        # rest[p, c]: hours between the end of p and the start of c on the following day
+        # (an overnight p ends on that following day already)
+        self.rest = np.array([[24 + c.start - (p.end + 24*p.overnight) for c in self.shift_defs]
+                              for p in self.shift_defs], dtype=np.int32)
+        night = self.night_shifts if self.night_shifts is not None else [s.key for s in self.shift_defs if s.overnight]
+        if set(night) - set(self.shifts): raise ValueError(f"unknown night shifts: {sorted(set(night) - set(self.shifts))}")
+        self.night = frozenset(night)
+        self._sig = (tuple(self.area_defs), tuple(self.shift_defs),
+                     tuple((g, tuple(sorted(v))) for g, v in self.group_areas.items()), tuple(sorted(self.night)))
+
+    def signature(self) -> tuple:
+        """Hashable identity of the model (part of every cache key that depends on it)."""
+        return self._sig
+
+    def __hash__(self):
+        return hash(self._sig)
+
+    def __eq__(self, other):
+        return isinstance(other, Facility) and self._sig == other._sig
+
+    def code(self, area: str, shift: str) -> str:
+        return self.code_of[(area, shift)]
+
+    def parse_code(self, code: str) -> Tuple[str,str]:
+        """(area, shift) of a rota code, ("", "") if it is not one of this facility's codes."""
+        return self.slot_of.get((code or "").strip().upper(), ("", ""))
+
+    def rest_table(self, min_rest: int) -> Dict[str, Dict[str,bool]]:
+        """{prev: {cur: enough rest}} for one min_rest — what the hot loop looks up per check."""
+        ok = self.rest >= int(min_rest)
+        return {p: {c: bool(ok[i, j]) for j, c in enumerate(self.shifts)} for i, p in enumerate(self.shifts)}
+
+    def to_dict(self) -> dict:
+        return {"areas": [{"key": a.key, "code": a.code} for a in self.area_defs],
+                "shifts": [{"key": s.key, "code": s.code, "start": s.start, "end": s.end} for s in self.shift_defs],
+                "groups": {g: [a for a in self.areas if a in v] for g, v in self.group_areas.items()},
+                "night_shifts": sorted(self.night)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Facility":
+        return cls([Area(str(a["key"]), str(a["code"]).upper()) for a in data["areas"]],
+                   [ShiftDef(str(s["key"]), str(s["code"]).upper(), int(s["start"]), int(s["end"])) for s in data["shifts"]],
+                   {str(g): list(v) for g, v in data["groups"].items()}, data.get("night_shifts"))
+
+DEFAULT_FACILITY = Facility(
+    [Area("fast","F"), Area("resp_triage","R"), Area("acute","A"), Area("resus","C")],
+    [ShiftDef("morning","1",7,15), ShiftDef("evening","2",15,23), ShiftDef("night","3",23,7)],
+    {"senior":["resus"], "g1":["resp_triage"], "g2":["acute"], "g3":["fast","acute"],
+     "g4":["resp_triage","fast","acute"], "g5":["acute","resus"]},
+)
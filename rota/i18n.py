@@ -0,0 +1,320 @@
+# rota/i18n.py — UI strings and area/shift labels shared by the app and the exporters
+
+# ================= i18n =================
+I18N = {
+    "ar": {
+        "general": "عام",
+        "language": "اللغة",
+        "arabic": "العربية",
+        "english": "English",
+        "year": "السنة",
+        "month": "الشهر",
+        "days": "عدد الأيام",
+        "rules": "القواعد",
+        "coverage": "التغطية لكل منطقة/وردية",
+        "group_caps": "سقوف المجموعات الشهرية (افتراضي للمضافين الجدد)",
+        "colors": "الألوان",
+        "area_colors": "ألوان المناطق",
+        "templates": "قالب ألوان",
+        "calm": "هادئة",
+        "contrast": "عالية التباين",
+        "apply_template": "تطبيق القالب",
+        "yellow": "أصفر",
+        "green": "أخضر",
+        "blue": "أزرق",
+        "red": "أحمر",
+        "reset_colors": "استعادة الألوان الافتراضية",
+        "run_tab": "توليد",
+        "run": "توليد عشوائي وفق القيود",
+        "balance": "موازنة العبء وملء النواقص",
+        "balanced_ok": "تمت موازنة النواقص قدر الإمكان.",
+        "solve": "حل أمثل (OR-Tools)",
+        "restarts": "عدد المحاولات (N)",
+        "improve": "تحسين بالبحث المحلي (نقل/تبديل)",
+        "improve_budget": "مدة التحسين (ثوانٍ)",
+        "improve_done": "اكتمل التحسين",
+        "best_of_n": "أفضل نتيجة من N محاولة",
+        "best_seed": "البذرة الفائزة (أدخلها في خانة البذرة لإعادة النتيجة)",
+        "restart_summary": "ملخص المحاولات",
+        "solve_time": "المهلة الزمنية للحل (ثوانٍ)",
+        "solve_ok": "تم الحل",
+        "solve_fail": "لم يجد المحلّل حلاً ضمن المهلة.",
+        "solve_kept": "لم يجد المحلّل جدولاً أفضل من الحالي ضمن المهلة؛ أُبقي الجدول الحالي.",
+        "ortools_na": "مكتبة OR-Tools غير متوفرة على الخادم؛ الحل الأمثل معطّل.",
+        "view_mode": "طريقة العرض",
+        "view_day_doctor": "يوم × طبيب",
+        "view_doctor_day": "طبيب × يوم",
+        "view_day_shift": "يوم × شفت",
+        "cards_view": "عرض الشبكة (بطاقات)",
+        "page": "الصفحة",
+        "horizon": "جدولة متعددة الأشهر",
+        "horizon_months": "عدد الأشهر",
+        "horizon_improve": "ثواني التحسين لكل شهر",
+        "horizon_btn": "جدولة الأشهر",
+        "horizon_hint": "يبدأ من الشهر الحالي (والجدول المعروض إن وجد)؛ كل شهر تالٍ يبدأ بآخر أيام الشهر السابق حتى تبقى قيود الأيام المتتالية والراحة والحد الأسبوعي صحيحة عبر الحدود.",
+        "download_csv": "تنزيل CSV",
+        "repair": "غياب طارئ / إصلاح الجدول",
+        "repair_hint": "يُزال الطبيب من الأيام المحددة وتُملأ مناوباته بأقل عدد من التغييرات؛ باقي الجدول يبقى كما هو.",
+        "repair_from": "من يوم",
+        "repair_to": "إلى يوم",
+        "repair_btn": "إصلاح",
+        "repair_done": "تم الإصلاح: خلايا متغيرة",
+        "versions": "النسخ المحفوظة",
+        "version_name": "اسم النسخة",
+        "save_version": "حفظ",
+        "load_version": "تحميل",
+        "delete_version": "حذف",
+        "saved_ok": "تم الحفظ",
+        "no_versions": "لا توجد نسخ محفوظة لهذا الشهر.",
+        "loaded_version": "النسخة المحمّلة",
+        "import_roster": "استيراد قائمة الأطباء (CSV / Excel)",
+        "import_hint": "الأعمدة: name, group, cap, allowed_shifts, offdays, max_night, max_week, avoid_holidays, max_hours — القيم المتعددة تُفصل بـ ; ",
+        "import_replace": "استبدال القائمة الحالية بالكامل",
+        "import_btn": "استيراد",
+        "import_done": "تم الاستيراد",
+        "import_rejected": "صفوف مرفوضة",
+        "download_roster": "تنزيل القائمة الحالية (CSV)",
+        "gaps": "النواقص",
+        "remain": "السعة المتبقية",
+        "export": "تصدير",
+        "download_xlsx": "تنزيل Excel (منسّق)",
+        "download_pdf": "تنزيل PDF (مطبوع)",
+        "pdf_na": "تعذّر إنشاء PDF لعدم توفر مكتبة ReportLab على الخادم.",
+        "doctors_tab": "الأطباء وتفضيلاتهم",
+        "add_list": "إضافة أطباء (سطر لكل اسم)",
+        "append": "إضافة",
+        "remove_doc": "حذف طبيب",
+        "remove": "حذف",
+        "edit_one": "تعديل طبيب",
+        "doctor": "الطبيب",
+        "group": "المجموعة",
+        "cap": "السقف الشهري (عدد الشفتات)",
+        "allowed_shifts": "الفترات المسموح بها",
+        "offdays": "أيام الإجازة (حتى 3 أيام)",
+        "rules_global": "قواعد عامة",
+        "min_off": "أقل عدد أيام إجازة/شهر",
+        "max_consec": "أقصى أيام عمل متتالية",
+        "min_rest": "أقل ساعات راحة بين الشفتات",
+        "adv_rules": "قيود متقدمة",
+        "max_night": "أقصى شفتات ليلية/شهر (للطبيب)",
+        "max_week": "أقصى شفتات/أسبوع (للطبيب)",
+        "max_hours": "أقصى ساعات/شهر (للطبيب)",
+        "max_hours_week": "أقصى ساعات في أي 7 أيام متتالية",
+        "zero_off": "0 = بدون حد",
+        "fairness": "مؤشرات العدالة",
+        "fairness_hint": "معامل جيني: 0 = توزيع متساوٍ تماماً. مخالفة الراحة = يومان متتاليان براحة أقل من الحد الأدنى.",
+        "gini_shifts": "جيني الشفتات",
+        "gini_nights": "جيني الليالي",
+        "gini_weekends": "جيني نهايات الأسبوع",
+        "rest_violations": "مخالفات الراحة",
+        "longest_streak": "أطول سلسلة أيام",
+        "fair_summary": "ملخص",
+        "fair_groups": "حسب المجموعة",
+        "fair_doctors": "حسب الطبيب",
+        "audit": "مخالفات القيود",
+        "audit_hint": "فحص الجدول كاملاً مقابل كل القيود (بما فيها التعديلات اليدوية القسرية).",
+        "audit_ok": "لا توجد مخالفات.",
+        "audit_rules": "حسب القيد",
+        "audit_list": "كل المخالفات",
+        "job_run": "توليد عشوائي",
+        "job_best": "أفضل N محاولة",
+        "job_balance": "موازنة",
+        "job_improve": "تحسين",
+        "job_solve": "الحل الأمثل",
+        "job_cancel": "إيقاف",
+        "job_cancelled": "تم الإيقاف — أُبقي أفضل جدول جزئي حتى الآن.",
+        "job_failed": "فشل التشغيل",
+        "slots_filled": "خانات مُعبّأة",
+        "debug_profile": "وضع التشخيص (قياس الأداء)",
+        "debug_profile_hint": "يقيس زمن كل مرحلة في كل إعادة تشغيل ويلتقط cProfile؛ يبطئ التطبيق قليلاً.",
+        "profile_last": "أداء آخر تشغيل",
+        "profile_json": "تنزيل القياسات (JSON)",
+        "profile_cprofile": "cProfile (حسب الزمن التراكمي)",
+        "session_memory": "ذاكرة الجلسة",
+        "session_memory_total": "المفاتيح: {keys} · الحجم التقريبي: {kb:.0f} ك.ب",
+        "holidays": "تواريخ العطل (أيام الشهر، مفصولة بفواصل)",
+        "avoid_holidays": "يفضّل عدم العمل في العطل",
+        "day": "اليوم",
+        "need_generate": "شغّل التوليد أولاً.",
+        "weekday": ["الاثنين","الثلاثاء","الأربعاء","الخميس","الجمعة","السبت","الأحد"],
+        "by_shift_grid": "شبكة يوم × شفت (بطاقات = أسماء الأطباء)",
+        "seed": "بذرة العشوائية (اختياري)",
+        "no_solution_warn": "تم التوليد العشوائي، قد تبقى نواقص إذا لم تتوافر أهلية كافية.",
+        "inline_edit": "التحرير داخل الجدول (Doctor×Day)",
+        "inline_hint": "حرّر الخلايا مباشرة؛ اتركها فارغة للراحة أو اختر كودًا (F1..C3).",
+        "apply_changes": "تطبيق التغييرات",
+        "validate_constraints": "التحقق من القيود قبل التطبيق",
+        "force_override": "تجاوز القيود (لا يُنصح)",
+        "invalid_edits": "تغييرات مرفوضة (مخالفة للقيود)",
+        "applied_ok": "تم تطبيق التغييرات.",
+        "daily_table": "جدول المناطق اليومي (قابل للسحب)",
+        "assigned": "مسند",
+        "required": "المطلوب",
+        "ok": "مكتمل",
+        "short": "نقص",
+        "off_calendar": "اختر أيام الإجازة لهذا الطبيب (حد أقصى 3)",
+        "clear_off": "مسح الإجازات",
+    },
+    "en": {
+        "general": "General",
+        "language": "Language",
+        "arabic": "Arabic",
+        "english": "English",
+        "year": "Year",
+        "month": "Month",
+        "days": "Days",
+        "rules": "Rules",
+        "coverage": "Coverage per area/shift",
+        "group_caps": "Group monthly caps (defaults for new doctors)",
+        "colors": "Colors",
+        "area_colors": "Area colors",
+        "templates": "Color template",
+        "calm": "Calm",
+        "contrast": "High Contrast",
+        "apply_template": "Apply template",
+        "yellow": "Yellow",
+        "green": "Green",
+        "blue": "Blue",
+        "red": "Red",
+        "reset_colors": "Reset to defaults",
+        "run_tab": "Generate",
+        "run": "Randomize (respect constraints)",
+        "balance": "Balance workload & fill gaps",
+        "balanced_ok": "Balancing complete where possible.",
+        "solve": "Solve optimally (OR-Tools)",
+        "restarts": "Restarts (N)",
+        "improve": "Improve with local search (move/swap)",
+        "improve_budget": "Improvement budget (seconds)",
+        "improve_done": "Improvement finished",
+        "best_of_n": "Best of N restarts",
+        "best_seed": "Winning seed (enter it in the seed box to reproduce)",
+        "restart_summary": "Restart summary",
+        "solve_time": "Solver time limit (seconds)",
+        "solve_ok": "Solved",
+        "solve_fail": "The solver found no solution within the time limit.",
+        "solve_kept": "The solver found nothing better than the current rota in time; kept the current rota.",
+        "ortools_na": "OR-Tools not available on server; optimal solving disabled.",
+        "view_mode": "View mode",
+        "view_day_doctor": "Day × Doctor",
+        "view_doctor_day": "Doctor × Day",
+        "view_day_shift": "Day × Shift",
+        "cards_view": "Cards grid",
+        "page": "Page",
+        "horizon": "Rolling horizon (several months)",
+        "horizon_months": "Months",
+        "horizon_improve": "Improve seconds per month",
+        "horizon_btn": "Plan months",
+        "horizon_hint": "Starts from the current month (the rota on screen, if any); each following month is seeded with the previous month's last days so consecutive-day, rest and weekly limits hold across boundaries.",
+        "download_csv": "Download CSV",
+        "repair": "Sick call / repair",
+        "repair_hint": "Removes the doctor from the chosen days and refills their shifts with as few changes as possible; the rest of the rota stays pinned.",
+        "repair_from": "From day",
+        "repair_to": "To day",
+        "repair_btn": "Repair",
+        "repair_done": "Repaired: changed cells",
+        "versions": "Saved versions",
+        "version_name": "Version name",
+        "save_version": "Save",
+        "load_version": "Load",
+        "delete_version": "Delete",
+        "saved_ok": "Saved",
+        "no_versions": "No saved versions for this month.",
+        "loaded_version": "Loaded version",
+        "import_roster": "Import roster (CSV / Excel)",
+        "import_hint": "Columns: name, group, cap, allowed_shifts, offdays, max_night, max_week, avoid_holidays, max_hours — separate multiple values with ;",
+        "import_replace": "Replace the current roster",
+        "import_btn": "Import",
+        "import_done": "Imported",
+        "import_rejected": "Rejected rows",
+        "download_roster": "Download current roster (CSV)",
+        "gaps": "Coverage gaps",
+        "remain": "Remaining capacity",
+        "export": "Export",
+        "download_xlsx": "Download Excel (styled)",
+        "download_pdf": "Download PDF (print)",
+        "pdf_na": "ReportLab not available on server; PDF export disabled.",
+        "doctors_tab": "Doctors & Preferences",
+        "add_list": "Add doctors (one per line)",
+        "append": "Append",
+        "remove_doc": "Remove doctor",
+        "remove": "Remove",
+        "edit_one": "Edit one doctor",
+        "doctor": "Doctor",
+        "group": "Group",
+        "cap": "Monthly cap (shifts)",
+        "allowed_shifts": "Allowed shifts",
+        "offdays": "Off-days (up to 3)",
+        "rules_global": "Global rules",
+        "min_off": "Min off-days / month",
+        "max_consec": "Max consecutive duty days",
+        "min_rest": "Min rest hours between shifts",
+        "adv_rules": "Advanced constraints",
+        "max_night": "Max night shifts / month (per doctor)",
+        "max_week": "Max shifts / week (per doctor)",
+        "max_hours": "Max hours / month (per doctor)",
+        "max_hours_week": "Max hours in any rolling 7 days",
+        "zero_off": "0 = no limit",
+        "fairness": "Fairness metrics",
+        "fairness_hint": "Gini: 0 = perfectly even. A rest violation is two consecutive worked days with less than the minimum rest.",
+        "gini_shifts": "Gini — shifts",
+        "gini_nights": "Gini — nights",
+        "gini_weekends": "Gini — weekends",
+        "rest_violations": "Rest violations",
+        "longest_streak": "Longest streak",
+        "fair_summary": "Summary",
+        "fair_groups": "By group",
+        "fair_doctors": "By doctor",
+        "audit": "Rule violations",
+        "audit_hint": "The whole rota checked against every constraint (forced manual edits included).",
+        "audit_ok": "No violations.",
+        "audit_rules": "By rule",
+        "audit_list": "All violations",
+        "job_run": "Random generation",
+        "job_best": "Best of N",
+        "job_balance": "Balancing",
+        "job_improve": "Improving",
+        "job_solve": "Optimal solve",
+        "job_cancel": "Cancel",
+        "job_cancelled": "Stopped — kept the best partial rota so far.",
+        "job_failed": "Run failed",
+        "slots_filled": "Slots filled",
+        "debug_profile": "Debug: profile reruns",
+        "debug_profile_hint": "Times every phase of each rerun and captures a cProfile; slows the app slightly.",
+        "profile_last": "Last rerun profile",
+        "profile_json": "Download metrics (JSON lines)",
+        "profile_cprofile": "cProfile (by cumulative time)",
+        "session_memory": "Session memory",
+        "session_memory_total": "Keys: {keys} · approx. size: {kb:.0f} KB",
+        "holidays": "Holiday dates (month days, comma-separated)",
+        "avoid_holidays": "Prefer off on holidays",
+        "day": "Day",
+        "need_generate": "Run the generator first.",
+        "weekday": ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"],
+        "by_shift_grid": "Day × Shift grid (cards = doctor names)",
+        "seed": "Random seed (optional)",
+        "no_solution_warn": "Randomized; gaps may remain if eligibility is insufficient.",
+        "inline_edit": "Inline edit (Doctor×Day)",
+        "inline_hint": "Edit cells directly; leave blank for off, or pick a code (F1..C3).",
+        "apply_changes": "Apply changes",
+        "validate_constraints": "Validate constraints before applying",
+        "force_override": "Force override (not recommended)",
+        "invalid_edits": "Rejected edits (constraint violations)",
+        "applied_ok": "Changes applied.",
+        "daily_table": "Daily area table (scrollable)",
+        "assigned": "Assigned",
+        "required": "Required",
+        "ok": "OK",
+        "short": "Short",
+        "off_calendar": "Pick off-days for this doctor (max 3)",
+        "clear_off": "Clear off-days",
+    }
+}
+
+AREA_LABEL = {
+    "en": {"fast":"Fast track","resp_triage":"Respiratory triage","acute":"Acute care unit","resus":"Resuscitation area"},
+    "ar": {"fast":"المسار السريع","resp_triage":"فرز تنفسي","acute":"العناية الحادة","resus":"الإنعاش"}
+}
+SHIFT_LABEL = {
+    "en": {"morning":"Morning 07:00–15:00","evening":"Evening 15:00–23:00","night":"Night 23:00–07:00"},
+    "ar": {"morning":"صباح 07:00–15:00","evening":"مساء 15:00–23:00","night":"ليل 23:00–07:00"}
+}
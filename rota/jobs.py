@@ -0,0 +1,75 @@
+# rota/jobs.py — one engine call running off the UI thread
+# -----------------------------------------
+# The app starts a Job from a button handler and returns at once; the job's thread runs
+# the engine with progress/cancel hooks (see engine.greedy_pass), and the page polls
+# snapshot() to draw progress until `done`, then applies `result` on the script thread.
+# The work function must not touch Streamlit: it gets plain inputs captured up front.
+# Threads share the interpreter, so the page stays responsive but a pure-Python pass
+# still competes with reruns for the GIL; best_of_n keeps its own process pool.
+
+import threading, time
+from typing import Callable, Optional
+
+from . import profiling
+
+class Job:
+    """A background run: fn(job) does the work, calling job.report(...) and passing job.cancel_event on.
+
+    report() fields are free-form; the engine hooks fill frac, filled and short. After
+    the thread ends exactly one of result / error is set, and `profile` holds its Recorder."""
+    def __init__(self, kind: str, fn: Callable[["Job"], object]):
+        self.kind = kind
+        self.cancel_event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.profile: Optional[profiling.Recorder] = None
+        self._fn = fn
+        self._lock = threading.Lock()
+        self._progress: dict = {}
+        self._t0 = time.perf_counter(); self._t1: Optional[float] = None
+        self._thread = threading.Thread(target=self._run, name=f"rota-{kind}", daemon=True)
+
+    def start(self) -> "Job":
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            with profiling.recording(f"job:{self.kind}") as rec:
+                self.profile = rec
+                self.result = self._fn(self)
+        except BaseException as e:  # surfaced to the page, never swallowed
+            self.error = e
+        finally:
+            self._t1 = time.perf_counter()
+
+    def report(self, **fields):
+        with self._lock: self._progress.update(fields)
+
+    def progress(self, frac: float, filled: int, short: int):
+        """The engine's progress(fraction, filled, short) hook."""
+        self.report(frac=float(frac), filled=int(filled), short=int(short))
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self._t1 is not None
+
+    @property
+    def elapsed(self) -> float:
+        return (self._t1 if self._t1 is not None else time.perf_counter()) - self._t0
+
+    def snapshot(self) -> dict:
+        with self._lock: out = dict(self._progress)
+        out["elapsed"] = round(self.elapsed, 1)
+        return out
+
+    def wait(self, timeout: float = None) -> bool:
+        self._thread.join(timeout)
+        return self.done
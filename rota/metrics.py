@@ -0,0 +1,87 @@
+# rota/metrics.py — how fair a finished rota is
+# -----------------------------------------
+# The long frame is turned once (CompactRota) into a doctor × day matrix of shift
+# indices (-1 = off); every per-doctor figure is a reduction over that matrix,
+# and the group and summary tables are aggregations of the per-doctor table. The app computes it
+# once per rota version; the Excel export writes it as the "Fairness" sheet.
+
+import numpy as np
+import pandas as pd
+
+from .engine import RotaConfig, is_weekend
+from .compact import CompactRota
+
+METRICS = ["shifts","hours","nights","weekends","holidays","longest_streak","rest_violations"]
+
+def gini(x) -> float:
+    """Gini coefficient of non-negative values: 0 = perfectly even, → 1 = one person has everything."""
+    x = np.sort(np.asarray(x, dtype=float))
+    n = len(x); total = x.sum()
+    if n == 0 or total <= 0: return 0.0
+    return float(((2*np.arange(1, n+1) - n - 1) @ x) / (n * total))
+
+def shift_matrix(cfg: RotaConfig, df: pd.DataFrame) -> np.ndarray:
+    """Doctors (cfg.doctors order) × days shift indices (int8 up to 128 shifts), -1 = off; rows off the roster or month are dropped."""
+    return CompactRota.from_frame(df, cfg.days, cfg.doctors, cfg.facility).shift_matrix()
+
+class FairnessStats:
+    """Per-doctor workload and fairness figures for one rota version.
+
+    `doctors` holds one row per doctor (group plus METRICS); groups() and summary()
+    aggregate it. A rest violation is a pair of consecutive worked days whose gap
+    (from the facility's rest matrix) is shorter than cfg.min_rest."""
+    def __init__(self, cfg: RotaConfig, df: pd.DataFrame):
+        fac = cfg.facility; days = int(cfg.days)
+        M = shift_matrix(cfg, df)
+        worked = M >= 0
+        idx = np.where(worked, M, 0)
+        weekend = np.array([is_weekend(cfg.year, cfg.month, d) for d in range(1, days+1)], dtype=bool)
+        holiday = np.isin(np.arange(1, days+1), list(cfg.holidays))
+        night = np.isin(M, [fac.shift_idx[s] for s in fac.night])
+        streak = np.zeros(len(M), dtype=np.int32); longest = np.zeros(len(M), dtype=np.int32)
+        for t in range(days):
+            streak = (streak + 1) * worked[:, t]
+            np.maximum(longest, streak, out=longest)
+        rest = np.zeros(len(M), dtype=np.int64)
+        if int(cfg.min_rest) > 0 and days > 1:
+            both = worked[:, :-1] & worked[:, 1:]
+            rest = (both & (fac.rest[idx[:, :-1], idx[:, 1:]] < int(cfg.min_rest))).sum(axis=1)
+        self.doctors = pd.DataFrame({
+            "doctor": list(cfg.doctors),
+            "group": [cfg.group_map.get(n, "") for n in cfg.doctors],
+            "shifts": worked.sum(axis=1),
+            "hours": np.where(worked, fac.hours[idx], 0).sum(axis=1),
+            "nights": night.sum(axis=1),
+            "weekends": (worked & weekend).sum(axis=1),
+            "holidays": (worked & holiday).sum(axis=1),
+            "longest_streak": longest,
+            "rest_violations": rest,
+        }, columns=["doctor","group"] + METRICS)
+
+    def groups(self) -> pd.DataFrame:
+        """Per group: size, mean of every metric, and the spread (std, Gini) of shifts, nights and weekends."""
+        g = self.doctors.groupby("group", sort=False)
+        out = g[METRICS].mean().round(2).add_suffix("_mean")
+        for m in ("shifts","nights","weekends"):
+            out[f"{m}_std"] = g[m].std(ddof=0).round(2)
+            out[f"{m}_gini"] = g[m].apply(gini).round(3)
+        out.insert(0, "doctors", g.size())
+        return out.reset_index()
+
+    def summary(self) -> pd.DataFrame:
+        """One row per metric over all doctors: total, mean, std, min, max, Gini."""
+        rows = []
+        for m in METRICS:
+            x = self.doctors[m].to_numpy()
+            rows.append({"metric": m, "total": int(x.sum()), "mean": round(float(x.mean()), 2) if len(x) else 0.0,
+                         "std": round(float(x.std()), 2) if len(x) else 0.0,
+                         "min": int(x.min()) if len(x) else 0, "max": int(x.max()) if len(x) else 0,
+                         "gini": round(gini(x), 3)})
+        return pd.DataFrame(rows, columns=["metric","total","mean","std","min","max","gini"])
+
+    def headline(self) -> dict:
+        """The few numbers the dashboard shows as metrics."""
+        d = self.doctors
+        return {"gini_shifts": round(gini(d["shifts"]), 3), "gini_nights": round(gini(d["nights"]), 3),
+                "gini_weekends": round(gini(d["weekends"]), 3), "rest_violations": int(d["rest_violations"].sum()),
+                "longest_streak": int(d["longest_streak"].max()) if len(d) else 0}
@@ -0,0 +1,125 @@
+# rota/profiling.py — per-phase timers and call counters
+# -----------------------------------------
+# A Recorder collects wall time per named phase and integer counters for one unit of
+# work (an app rerun, a CLI run). It is bound to the current thread by recording(),
+# or by begin()/end() when the work cannot be wrapped in a with-block (a Streamlit
+# script). phase(), timed() and count() are no-ops when nothing is recording, so the
+# engine can stay instrumented at no cost. Phases nest: the key of an inner phase is
+# its path ("tab_generate/greedy_pass") and times are inclusive of children.
+# Work done in other threads or processes (download callbacks, best_of_n workers)
+# is not seen unless the caller counts it explicitly.
+
+import cProfile, functools, io, json, pstats, threading, time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+_local = threading.local()
+
+class Recorder:
+    """Timings and counters for one run; cprofile=True also captures a cProfile of the thread."""
+    def __init__(self, label: str = "", cprofile: bool = False):
+        self.label = label
+        self.phases: Dict[str,float] = {}   # path → seconds (inclusive)
+        self.calls: Dict[str,int] = {}      # path → times entered
+        self.counts: Dict[str,int] = {}
+        self.total = 0.0
+        self._stack: List[str] = []
+        self._t0 = time.perf_counter()
+        self._prof = cProfile.Profile() if cprofile else None
+        if self._prof is not None:
+            try: self._prof.enable()
+            except ValueError: self._prof = None  # another profiler is already active in this process
+
+    @contextmanager
+    def phase(self, name: str):
+        path = "/".join(self._stack + [name])
+        self._stack.append(name); t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[path] = self.phases.get(path, 0.0) + time.perf_counter() - t
+            self.calls[path] = self.calls.get(path, 0) + 1
+            self._stack.pop()
+
+    def count(self, name: str, n: int = 1):
+        self.counts[name] = self.counts.get(name, 0) + int(n)
+
+    def stop(self) -> "Recorder":
+        if self._prof is not None: self._prof.disable()
+        self.total = time.perf_counter() - self._t0
+        return self
+
+    def as_dict(self) -> dict:
+        return {"label": self.label, "ts": round(time.time(), 3), "total_ms": round(self.total*1000, 2),
+                "phases": {p: {"ms": round(s*1000, 2), "calls": self.calls[p]} for p, s in self.phases.items()},
+                "counts": dict(self.counts)}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), ensure_ascii=False)
+
+    def log_line(self) -> str:
+        """One line: total, then top-level phases in run order, then counters."""
+        top = [f"{p}={s*1000:.0f}ms" for p, s in self.phases.items() if "/" not in p]
+        cnt = [f"{k}={v}" for k, v in self.counts.items()]
+        return " ".join([f"{self.label or 'run'} {self.total*1000:.0f}ms"] + top + cnt)
+
+    def table(self):
+        """Phases as a DataFrame (path, ms, calls), slowest first."""
+        import pandas as pd
+        rows = [{"phase": p, "ms": round(s*1000, 2), "calls": self.calls[p]} for p, s in self.phases.items()]
+        return pd.DataFrame(rows, columns=["phase","ms","calls"]).sort_values("ms", ascending=False, kind="stable")
+
+    def cprofile_text(self, limit: int = 40, sort: str = "cumulative") -> str:
+        """pstats report of the captured profile ("" if cProfile was not on)."""
+        if self._prof is None: return ""
+        out = io.StringIO()
+        pstats.Stats(self._prof, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+def current() -> Optional[Recorder]:
+    return getattr(_local, "rec", None)
+
+def begin(label: str = "", cprofile: bool = False) -> Recorder:
+    """Bind a fresh Recorder to this thread, dropping one left open by an interrupted run."""
+    old = current()
+    if old is not None: old.stop()
+    _local.rec = Recorder(label, cprofile)
+    return _local.rec
+
+def end() -> Optional[Recorder]:
+    rec = current()
+    _local.rec = None
+    return rec.stop() if rec is not None else None
+
+@contextmanager
+def recording(label: str = "", cprofile: bool = False):
+    prev = current()
+    _local.rec = rec = Recorder(label, cprofile)
+    try:
+        yield rec
+    finally:
+        rec.stop(); _local.rec = prev
+
+@contextmanager
+def phase(name: str):
+    rec = current()
+    if rec is None:
+        yield
+    else:
+        with rec.phase(name): yield
+
+def timed(name: str = None):
+    """Decorator: run the function as a phase (named after it unless `name` is given)."""
+    def wrap(fn):
+        key = name or fn.__name__
+        @functools.wraps(fn)
+        def inner(*a, **kw):
+            rec = current()
+            if rec is None: return fn(*a, **kw)
+            with rec.phase(key): return fn(*a, **kw)
+        return inner
+    return wrap
+
+def count(name: str, n: int = 1):
+    rec = current()
+    if rec is not None: rec.count(name, n)
@@ -0,0 +1,102 @@
+# rota/render.py — HTML tables for the card views
+# -----------------------------------------
+# Pure string builders (no Streamlit): the app memoises them with st.cache_data and
+# the benchmark times them directly. Colours come from the .area-* CSS classes.
+
+import calendar, html
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from .facility import Facility, DEFAULT_FACILITY
+from .i18n import I18N, AREA_LABEL
+
+def area_class(code: str, fac: Facility = DEFAULT_FACILITY) -> str:
+    """CSS class colouring a whole TD by the area of its code (see inject_css)."""
+    area = fac.area_of_code.get((code or "").strip().upper(), "")
+    return f"area-{area}" if area else ""
+
+def badge_html(code: str):
+    """Return colored badge containing the code itself."""
+    txt = html.escape((code or "").upper())
+    return f"<span class='badge-code' title='{txt}'>{txt}</span>"
+
+def _code_td(val, fac: Facility = DEFAULT_FACILITY) -> str:
+    if val is None or pd.isna(val) or str(val).strip()=="":
+        return "<td><div class='cell'></div></td>"
+    code = str(val).upper().strip()
+    return f"<td class='{area_class(code, fac)}'><div class='cell'>{badge_html(code)}</div></td>"
+
+def _weekday_labels(year:int, month:int, days: List[int], lang:str) -> Dict[int,str]:
+    names = I18N[lang]["weekday"]
+    return {d: html.escape(names[calendar.weekday(int(year), int(month), int(d))]) for d in days}
+
+def _table(thead: str, body_rows: List[str]) -> str:
+    return f"<div class='wrap'><table class='tbl'>{thead}<tbody>{''.join(body_rows)}</tbody></table></div>"
+
+def day_doctor_html(sheet: pd.DataFrame, year:int, month:int, doctors: Tuple[str,...], lang:str,
+                    fac: Facility = DEFAULT_FACILITY) -> str:
+    days = [int(d) for d in sheet.index]
+    wd = _weekday_labels(year, month, days, lang)
+    vals = sheet.reindex(columns=list(doctors)).to_numpy(dtype=object)
+    head = ["<th>"+html.escape(I18N[lang]["day"])+"</th>"] + [f"<th>{html.escape(doc)}</th>" for doc in doctors]
+    thead = "<thead><tr>" + "".join(head) + "</tr></thead>"
+    body_rows = []
+    for i, day in enumerate(days):
+        left = f"<th class='sticky'>{day} / {int(month)}<div class='sub'>{wd[day]}</div></th>"
+        body_rows.append("<tr>"+left+"".join(_code_td(v, fac) for v in vals[i])+"</tr>")
+    return _table(thead, body_rows)
+
+def doctor_day_html(sheet: pd.DataFrame, year:int, month:int, doctors: Tuple[str,...], lang:str,
+                    fac: Facility = DEFAULT_FACILITY) -> str:
+    days = [int(d) for d in sheet.index]
+    wd = _weekday_labels(year, month, days, lang)
+    vals = sheet.reindex(columns=list(doctors)).to_numpy(dtype=object).T
+    head = ["<th>"+html.escape(I18N[lang]["doctor"])+"</th>"] + [
+        f"<th>{d}/{int(month)}<div class='sub'>{wd[d]}</div></th>" for d in days
+    ]
+    thead = "<thead><tr>" + "".join(head) + "</tr></thead>"
+    body_rows = []
+    for i, doc in enumerate(doctors):
+        left = f"<th class='sticky'>{html.escape(doc)}</th>"
+        body_rows.append("<tr>"+left+"".join(_code_td(v, fac) for v in vals[i])+"</tr>")
+    return _table(thead, body_rows)
+
+def day_shift_html(day_map: Dict[int, Dict[str, List[str]]], year:int, month:int, lang:str,
+                   fac: Facility = DEFAULT_FACILITY) -> str:
+    days = sorted(day_map.keys())
+    wd = _weekday_labels(year, month, days, lang)
+    head = ["<th>"+html.escape(I18N[lang]["day"])+"</th>"]
+    head += [f"<th class='{area_class(code, fac)}'>{html.escape(code)}</th>" for code in fac.codes]
+    thead = "<thead><tr>" + "".join(head) + "</tr></thead>"
+    body_rows = []
+    for day in days:
+        left = f"<th class='sticky'>{int(day)} / {int(month)}<div class='sub'>{wd[day]}</div></th>"
+        cells = []
+        for code in fac.codes:
+            docs = day_map[day].get(code, [])
+            if not docs:
+                cells.append("<td><div class='cell'></div></td>")
+            else:
+                inner = " · ".join([html.escape(n) for n in docs])
+                cells.append(f"<td class='{area_class(code, fac)}'><div class='cell' style='font-size:12px'>{inner}</div></td>")
+        body_rows.append("<tr>"+left+"".join(cells)+"</tr>")
+    return _table(thead, body_rows)
+
+def daily_area_html(atotals: Dict[int, Dict[str, Tuple[int,int,int]]], year:int, month:int,
+                    days:int, lang:str) -> str:
+    dlist = list(range(1, days+1))
+    wd = _weekday_labels(year, month, dlist, lang)
+    head = ["<th>"+html.escape("Area" if lang=="en" else "القسم")+"</th>"]
+    head += [f"<th>{d}/{int(month)}<div class='sub'>{wd[d]}</div></th>" for d in dlist]
+    thead = "<thead><tr>" + "".join(head) + "</tr></thead>"
+    body_rows = []
+    for area in (atotals[dlist[0]] if dlist else ()):
+        left = f"<th class='sticky'>{html.escape(AREA_LABEL[lang].get(area, area))}</th>"
+        cells = []
+        for d in dlist:
+            a, r, short = atotals[d][area]
+            cls = "ok" if short==0 else "short"
+            cells.append(f"<td><div class='cell'><span class='badge-code {cls}'>{a}/{r}</span></div></td>")
+        body_rows.append("<tr>"+left+"".join(cells)+"</tr>")
+    return _table(thead, body_rows)
@@ -0,0 +1,131 @@
+# rota/roster.py — bulk roster import / export
+# -----------------------------------------
+# Rows are streamed (csv.DictReader, or openpyxl in read-only mode for .xlsx) and
+# validated one at a time against the config's facility (groups, shifts), so a file of any size is
+# checked in one pass; accepted rows then update every per-doctor map of the config.
+
+import csv, importlib.util, io
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .engine import GROUP_CAP, DEFAULT_MAX_NIGHT, DEFAULT_MAX_WEEK, RotaConfig
+from .facility import Facility, DEFAULT_FACILITY
+
+OPENPYXL_AVAILABLE = importlib.util.find_spec("openpyxl") is not None
+
+ROSTER_COLUMNS = ["name","group","cap","allowed_shifts","offdays","max_night","max_week","avoid_holidays","max_hours"]
+MAX_OFFDAYS = 3  # same limit as the off-day calendar
+ALIASES = {"doctor":"name", "grp":"group", "shifts":"allowed_shifts", "off_days":"offdays",
+           "max_nights":"max_night", "max_per_week":"max_week", "avoid_holiday":"avoid_holidays",
+           "hours_cap":"max_hours", "max_hours_month":"max_hours"}
+SHIFT_ALIASES = {"m":"morning", "e":"evening", "n":"night", "1":"morning", "2":"evening", "3":"night"}
+TRUE = {"1","true","yes","y","x","نعم"}
+FALSE = {"","0","false","no","n","لا"}
+
+def _header(name) -> str:
+    key = str(name or "").strip().lower().replace(" ", "_").replace("-", "_")
+    return ALIASES.get(key, key)
+
+def iter_rows(data, filename: str) -> Iterator[Tuple[int, Dict[str,str]]]:
+    """(line number, {column: text}) for each row of a CSV or .xlsx roster; `data` is bytes or a binary file."""
+    raw = data if isinstance(data, (bytes, bytearray)) else data.read()
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        if not OPENPYXL_AVAILABLE: raise ValueError("reading .xlsx rosters needs openpyxl")
+        import openpyxl
+        wb = openpyxl.load_workbook(io.BytesIO(raw), read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            head = [_header(h) for h in next(rows, ())]
+            for i, r in enumerate(rows, start=2):
+                if r is None or all(v is None for v in r): continue
+                yield i, {h: "" if v is None else str(v) for h, v in zip(head, r)}
+        finally:
+            wb.close()
+        return
+    text = io.TextIOWrapper(io.BytesIO(raw), encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    reader.fieldnames = [_header(h) for h in (reader.fieldnames or [])]
+    for row in reader:
+        if not any((v or "").strip() for v in row.values() if isinstance(v, str)): continue
+        yield reader.line_num, {k: (v or "") for k, v in row.items() if k}
+
+def _int(text: str, lo: int, hi: int, what: str) -> int:
+    try:
+        v = int(float(text))
+    except ValueError:
+        raise ValueError(f"{what}: not a number ({text!r})")
+    if not lo <= v <= hi: raise ValueError(f"{what}: {v} outside {lo}–{hi}")
+    return v
+
+def _list(text: str) -> List[str]:
+    return [t for t in text.replace(";", ",").replace("|", ",").replace(" ", ",").split(",") if t]
+
+def parse_row(row: Dict[str,str], days: int, group_caps: Dict[str,int], fac: Facility = DEFAULT_FACILITY) -> dict:
+    """One validated roster record; raises ValueError with the first problem found."""
+    name = (row.get("name") or "").strip()
+    if not name: raise ValueError("missing name")
+    group = (row.get("group") or "g3").strip().lower() or "g3"
+    if group not in fac.group_areas: raise ValueError(f"unknown group {group!r}")
+    cap = (row.get("cap") or "").strip()
+    cap = _int(cap, 0, 31, "cap") if cap else int(group_caps.get(group, GROUP_CAP.get(group, 18)))
+    allowed = set(); by_code = {c.lower(): k for k, c in fac.shift_code.items()}
+    for t in _list((row.get("allowed_shifts") or "").strip().lower()):
+        sh = t if t in fac.shift_idx else by_code.get(t) or SHIFT_ALIASES.get(t, t)
+        if sh not in fac.shift_idx: raise ValueError(f"unknown shift {t!r}")
+        allowed.add(sh)
+    off = {_int(t, 1, days, "off-day") for t in _list((row.get("offdays") or "").strip())}
+    if len(off) > MAX_OFFDAYS: raise ValueError(f"{len(off)} off-days (max {MAX_OFFDAYS})")
+    mn = (row.get("max_night") or "").strip(); mw = (row.get("max_week") or "").strip()
+    mh = (row.get("max_hours") or "").strip()
+    avoid = (row.get("avoid_holidays") or "").strip().lower()
+    if avoid not in TRUE | FALSE: raise ValueError(f"avoid_holidays: {avoid!r} is not yes/no")
+    return {"name": name, "group": group, "cap": cap, "allowed": allowed or set(fac.shifts), "offdays": off,
+            "max_night": _int(mn, 0, 31, "max_night") if mn else DEFAULT_MAX_NIGHT,
+            "max_week": _int(mw, 0, 7, "max_week") if mw else DEFAULT_MAX_WEEK,
+            "avoid_holidays": avoid in TRUE, "max_hours": _int(mh, 0, 744, "max_hours") if mh else 0}
+
+def import_roster(cfg: RotaConfig, data, filename: str, replace: bool = False,
+                  group_caps: Optional[Dict[str,int]] = None) -> dict:
+    """Stream a roster file into cfg in one pass.
+
+    Each valid row describes a doctor completely (missing columns take the defaults
+    a new doctor gets) and adds or updates all their per-doctor maps; with replace=True
+    doctors missing from the file are dropped. A duplicate name keeps its first row.
+    Returns {"added", "updated", "removed", "rejected": DataFrame(line, name, reason)}."""
+    group_caps = group_caps or GROUP_CAP
+    seen = set(); rejected = []; added = updated = 0
+    for line, row in iter_rows(data, filename):
+        try:
+            rec = parse_row(row, int(cfg.days), group_caps, cfg.facility)
+            if rec["name"] in seen: raise ValueError("duplicate name")
+        except ValueError as e:
+            rejected.append({"line": line, "name": (row.get("name") or "").strip(), "reason": str(e)})
+            continue
+        seen.add(rec["name"])
+        if rec["name"] in cfg.group_map: updated += 1
+        else: added += 1
+        cfg.add_doctor(rec["name"], rec["group"], rec["cap"], rec["allowed"], rec["offdays"],
+                       rec["max_night"], rec["max_week"], rec["avoid_holidays"], rec["max_hours"])
+    removed = 0
+    if replace and seen:
+        gone = [n for n in cfg.doctors if n not in seen]
+        removed = len(gone)
+        cfg.doctors[:] = [n for n in cfg.doctors if n in seen]
+        for m in (cfg.group_map, cfg.cap_map, cfg.allowed_shifts, cfg.offdays, cfg.max_night_map,
+                  cfg.max_week_map, cfg.avoid_holidays_map, cfg.max_hours_map):
+            for n in gone: m.pop(n, None)
+    return {"added": added, "updated": updated, "removed": removed,
+            "rejected": pd.DataFrame(rejected, columns=["line","name","reason"])}
+
+def roster_frame(cfg: RotaConfig) -> pd.DataFrame:
+    """The current roster in the import format (round-trips through import_roster)."""
+    shifts = cfg.facility.shifts
+    return pd.DataFrame([{"name": n, "group": cfg.group_map.get(n, "g3"), "cap": int(cfg.cap_map.get(n, 18)),
+                          "allowed_shifts": ";".join(s for s in shifts if s in cfg.allowed_shifts.get(n, shifts)),
+                          "offdays": ";".join(str(d) for d in sorted(cfg.offdays.get(n, ()))),
+                          "max_night": int(cfg.max_night_map.get(n, DEFAULT_MAX_NIGHT)),
+                          "max_week": int(cfg.max_week_map.get(n, DEFAULT_MAX_WEEK)),
+                          "avoid_holidays": "yes" if cfg.avoid_holidays_map.get(n, False) else "no",
+                          "max_hours": int(cfg.max_hours_map.get(n, 0))}
+                         for n in cfg.doctors], columns=ROSTER_COLUMNS)
@@ -0,0 +1,94 @@
+# rota/session.py — bounded per-doctor widget state
+# -----------------------------------------
+# Every per-doctor widget key lives under one namespace, "doc/<field>/<doctor>", with
+# month-scoped fields carrying their month ("off:2025-03-14"). The field never holds a
+# "/", so a key splits back into (field, doctor) even when the name itself has one.
+# Eviction is then a scan of the keys: a removed doctor's keys, keys of doctors no
+# longer on the roster, and off-day keys of other months. Works on any mutable mapping
+# (st.session_state in the app), so nothing here imports Streamlit.
+
+import sys
+from typing import Iterable, MutableMapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DOC_NS = "doc/"
+
+def doc_key(doc: str, field: str, *parts) -> str:
+    """Widget key for one doctor: doc_key(n, "cap"), doc_key(n, "allow", "night"), doc_key(n, "off", y, m, d)."""
+    if field == "off":
+        y, m, d = parts
+        field = f"off:{int(y)}-{int(m):02d}-{int(d):02d}"
+    elif parts:
+        field = ":".join([field] + [str(p) for p in parts])
+    return f"{DOC_NS}{field}/{doc}"
+
+def parse_doc_key(key: str) -> Optional[Tuple[str, str]]:
+    """(field, doctor) of a namespaced key, None for any other key."""
+    if not isinstance(key, str) or not key.startswith(DOC_NS): return None
+    field, sep, doc = key[len(DOC_NS):].partition("/")
+    return (field, doc) if sep else None
+
+def _period_of(field: str) -> Optional[Tuple[int,int]]:
+    if not field.startswith("off:"): return None
+    y, m, _d = field[4:].split("-")
+    return int(y), int(m)
+
+def evict_doctor(state: MutableMapping, doc: str) -> int:
+    """Drop every widget key of one doctor; returns how many went."""
+    stale = [k for k in list(state.keys()) if (p := parse_doc_key(k)) and p[1] == doc]
+    for k in stale: del state[k]
+    return len(stale)
+
+def sweep(state: MutableMapping, doctors: Iterable[str], period: Tuple[int,int]) -> int:
+    """Drop widget keys of doctors not in `doctors` and off-day keys of any month but `period`."""
+    keep = set(doctors); period = (int(period[0]), int(period[1]))
+    stale = []
+    for k in list(state.keys()):
+        p = parse_doc_key(k)
+        if p is None: continue
+        field, doc = p
+        if doc not in keep or _period_of(field) not in (None, period): stale.append(k)
+    for k in stale: del state[k]
+    return len(stale)
+
+def drop_widgets(state: MutableMapping) -> int:
+    """Drop every namespaced widget key (they re-read the config maps on their next render)."""
+    stale = [k for k in list(state.keys()) if parse_doc_key(k)]
+    for k in stale: del state[k]
+    return len(stale)
+
+def deep_size(obj, _seen: set = None) -> int:
+    """Approximate bytes held by obj: pandas/NumPy buffers plus containers, each object once."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen: return 0
+    seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame): return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series): return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, np.ndarray): return sys.getsizeof(obj) + (obj.nbytes if obj.base is not None else 0)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(v, seen) for v in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += deep_size(vars(obj), seen)
+    return size
+
+def footprint(state: MutableMapping) -> pd.DataFrame:
+    """Session memory by entry: namespaced widget keys are grouped per field, the rest listed by name.
+
+    Columns: entry, keys, bytes (deep_size; shared objects are counted under the first entry)."""
+    rows = {}; seen: set = set()
+    for k in list(state.keys()):
+        p = parse_doc_key(k)
+        name = f"{DOC_NS}{p[0].split(':')[0]}/*" if p else str(k)
+        try:
+            size = deep_size(state[k], seen)
+        except Exception:  # an entry that cannot be sized still counts as a key
+            size = 0
+        n, b = rows.get(name, (0, 0))
+        rows[name] = (n + 1, b + size)
+    out = pd.DataFrame([(n, c, b) for n, (c, b) in rows.items()], columns=["entry","keys","bytes"])
+    return out.sort_values(["bytes","entry"], ascending=[False, True], kind="stable").reset_index(drop=True)
@@ -0,0 +1,179 @@
+# rota/store.py — named rota versions in SQLite
+# -----------------------------------------
+# One row per saved version (name × year × month); its roster, rules and
+# assignments live in child tables keyed by version id, written with executemany in
+# a single transaction and read back with primary-key range scans. The one connection
+# is shared by the app's threads (Streamlit sessions, background jobs), so every method
+# holds the store's lock while it uses it.
+
+import functools, json, sqlite3, threading, time
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from .engine import COLUMNS, RotaConfig
+from .facility import Facility, DEFAULT_FACILITY
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    days INTEGER NOT NULL,
+    saved_at REAL NOT NULL,
+    UNIQUE (year, month, name)
+);
+CREATE INDEX IF NOT EXISTS versions_saved ON versions (saved_at);
+CREATE TABLE IF NOT EXISTS doctors (
+    version_id INTEGER NOT NULL REFERENCES versions(id) ON DELETE CASCADE,
+    pos INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    cap INTEGER NOT NULL,
+    allowed TEXT NOT NULL,
+    offdays TEXT NOT NULL,
+    max_night INTEGER NOT NULL,
+    max_week INTEGER NOT NULL,
+    avoid_holidays INTEGER NOT NULL,
+    max_hours INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (version_id, pos)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rules (
+    version_id INTEGER NOT NULL REFERENCES versions(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (version_id, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS assignments (
+    version_id INTEGER NOT NULL REFERENCES versions(id) ON DELETE CASCADE,
+    day INTEGER NOT NULL,
+    doctor TEXT NOT NULL,
+    area TEXT NOT NULL,
+    shift TEXT NOT NULL,
+    PRIMARY KEY (version_id, day, doctor)
+) WITHOUT ROWID;
+"""
+
+def _locked(fn):
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return fn(self, *args, **kwargs)
+    return wrapper
+
+class RotaStore:
+    """SQLite-backed store of named rota versions (config + assignments) per month."""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()  # reentrant: load() calls _version_id() and load_days()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        # files written before per-doctor hour caps existed
+        if "max_hours" not in {r[1] for r in self.conn.execute("PRAGMA table_info(doctors)")}:
+            self.conn.execute("ALTER TABLE doctors ADD COLUMN max_hours INTEGER NOT NULL DEFAULT 0")
+
+    @_locked
+    def close(self):
+        self.conn.close()
+
+    @_locked
+    def save(self, name: str, cfg: RotaConfig, df: pd.DataFrame) -> int:
+        """Write (or overwrite) version `name` for cfg's month; returns its id."""
+        fac = cfg.facility
+        with self.conn:
+            self.conn.execute("DELETE FROM versions WHERE year=? AND month=? AND name=?",
+                              (int(cfg.year), int(cfg.month), name))
+            vid = self.conn.execute("INSERT INTO versions (name, year, month, days, saved_at) VALUES (?,?,?,?,?)",
+                                    (name, int(cfg.year), int(cfg.month), int(cfg.days), time.time())).lastrowid
+            self.conn.executemany(
+                "INSERT INTO doctors VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                [(vid, i, n, cfg.group_map.get(n, "g3"), int(cfg.cap_map.get(n, 18)),
+                  ",".join(s for s in fac.shifts if s in cfg.allowed_shifts.get(n, set(fac.shifts))),
+                  ",".join(str(d) for d in sorted(cfg.offdays.get(n, ()))),
+                  int(cfg.max_night_map.get(n, 999)), int(cfg.max_week_map.get(n, 999)),
+                  int(bool(cfg.avoid_holidays_map.get(n, False))), int(cfg.max_hours_map.get(n, 0)))
+                 for i, n in enumerate(cfg.doctors)])
+            rules = {"min_off": cfg.min_off, "max_consec": cfg.max_consec, "min_rest": cfg.min_rest,
+                     "max_hours_week": cfg.max_hours_week,
+                     "holidays": sorted(cfg.holidays)}
+            rules.update({f"cov.{a}.{s}": cfg.cov.get((a, s), 0) for a in fac.areas for s in fac.shifts})
+            if fac != DEFAULT_FACILITY: rules["facility"] = fac.to_dict()
+            self.conn.executemany("INSERT INTO rules VALUES (?,?,?)",
+                                  [(vid, k, json.dumps(v)) for k, v in rules.items()])
+            if not df.empty:
+                self.conn.executemany(
+                    "INSERT INTO assignments VALUES (?,?,?,?,?)",
+                    zip([vid]*len(df), df["day"].astype(int).tolist(), df["doctor"].tolist(),
+                        df["area"].tolist(), df["shift"].tolist()))
+        return vid
+
+    @_locked
+    def versions(self, year: int = None, month: int = None) -> pd.DataFrame:
+        """Saved versions, newest first, optionally for one month."""
+        q = "SELECT id, name, year, month, days, saved_at FROM versions"
+        args: Tuple = ()
+        if year is not None and month is not None:
+            q += " WHERE year=? AND month=?"; args = (int(year), int(month))
+        return pd.read_sql_query(q + " ORDER BY saved_at DESC", self.conn, params=args)
+
+    @_locked
+    def _version_id(self, year: int = None, month: int = None, name: str = None) -> Optional[int]:
+        if year is None:
+            row = self.conn.execute("SELECT id FROM versions ORDER BY saved_at DESC LIMIT 1").fetchone()
+        elif name is None:
+            row = self.conn.execute("SELECT id FROM versions WHERE year=? AND month=? ORDER BY saved_at DESC LIMIT 1",
+                                    (int(year), int(month))).fetchone()
+        else:
+            row = self.conn.execute("SELECT id FROM versions WHERE year=? AND month=? AND name=?",
+                                    (int(year), int(month), name)).fetchone()
+        return row[0] if row else None
+
+    @_locked
+    def load(self, year: int = None, month: int = None, name: str = None) -> Optional[Tuple[RotaConfig, pd.DataFrame]]:
+        """(config, rota) of a version: the named one, else the newest for the month,
+        else the newest overall. None if nothing matches."""
+        vid = self._version_id(year, month, name)
+        if vid is None: return None
+        y, m, days = self.conn.execute("SELECT year, month, days FROM versions WHERE id=?", (vid,)).fetchone()
+        rules = {k: json.loads(v) for k, v in self.conn.execute("SELECT key, value FROM rules WHERE version_id=?", (vid,))}
+        fac = Facility.from_dict(rules.pop("facility")) if "facility" in rules else DEFAULT_FACILITY
+        cfg = RotaConfig(year=y, month=m, days=days, facility=fac)
+        if fac != DEFAULT_FACILITY: cfg.cov = {(a, s): 0 for a in fac.areas for s in fac.shifts}
+        for n, grp, cap, allowed, off, mn, mw, avoid, mh in self.conn.execute(
+                "SELECT name, grp, cap, allowed, offdays, max_night, max_week, avoid_holidays, max_hours "
+                "FROM doctors WHERE version_id=? ORDER BY pos", (vid,)):
+            cfg.add_doctor(n, grp, cap, allowed.split(",") if allowed else None,
+                           [int(d) for d in off.split(",") if d], mn, mw, bool(avoid), mh)
+        for k, v in rules.items():
+            if k.startswith("cov."):
+                _, a, s = k.split(".", 2); cfg.cov[(a, s)] = int(v)
+            elif k == "holidays":
+                cfg.holidays = set(v)
+            else:
+                setattr(cfg, k, int(v))
+        df = self.load_days(vid, fac=fac)
+        return cfg, df
+
+    @_locked
+    def load_days(self, version_id: int, first: int = 1, last: int = 31,
+                  fac: Facility = DEFAULT_FACILITY) -> pd.DataFrame:
+        """Assignments of one version for days first..last (a primary-key range scan)."""
+        rows = self.conn.execute("SELECT doctor, day, area, shift FROM assignments "
+                                 "WHERE version_id=? AND day BETWEEN ? AND ? ORDER BY day, doctor",
+                                 (int(version_id), int(first), int(last))).fetchall()
+        code = fac.code_of
+        return pd.DataFrame([(n, d, a, s, code[(a, s)]) for n, d, a, s in rows], columns=COLUMNS)
+
+    @_locked
+    def delete(self, year: int, month: int, name: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM versions WHERE year=? AND month=? AND name=?", (int(year), int(month), name))
+
+    @_locked
+    def names(self, year: int, month: int) -> List[str]:
+        return [r[0] for r in self.conn.execute(
+            "SELECT name FROM versions WHERE year=? AND month=? ORDER BY saved_at DESC", (int(year), int(month)))]
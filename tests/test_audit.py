@@ -0,0 +1,45 @@
+import pandas as pd
+
+from rota.engine import RotaConfig, COLUMNS, eligibility_matrix, greedy_pass
+from rota.audit import audit_rota, audit_summary
+
+CODE = {("fast", "morning"): "F1", ("fast", "night"): "F3", ("resus", "morning"): "C1"}
+
+def _frame(rows) -> pd.DataFrame:
+    return pd.DataFrame([(n, d, a, s, CODE[(a, s)]) for n, d, a, s in rows], columns=COLUMNS)
+
+def _cfg(**kw) -> RotaConfig:
+    cfg = RotaConfig(year=2025, month=9, days=30, **kw)
+    cfg.add_doctor("a", "g3", 30, offdays=[10], max_week=7)
+    cfg.add_doctor("b", "g3", 2, allowed=["morning"])
+    return cfg
+
+def _rules(res: pd.DataFrame):
+    return list(zip(res["doctor"], res["day"], res["rule"]))
+
+def test_clean_rota_has_no_violations():
+    cfg = RotaConfig.default()
+    assert audit_rota(cfg, greedy_pass(cfg, eligibility_matrix(cfg), 0).to_frame()).empty
+    assert audit_summary(audit_rota(cfg, pd.DataFrame(columns=COLUMNS))).empty
+
+def test_static_and_counting_rules():
+    rows = [("a", 10, "fast", "morning"), ("a", 12, "resus", "morning"),
+            ("b", 1, "fast", "morning"), ("b", 3, "fast", "night"), ("b", 5, "fast", "morning"),
+            ("b", 5, "fast", "morning")]
+    assert _rules(audit_rota(_cfg(), _frame(rows))) == [
+        ("b", 3, "shift not allowed"), ("b", 5, "already assigned"), ("b", 5, "cap reached"),
+        ("a", 10, "off-day"), ("a", 12, "area not allowed")]
+
+def test_sequence_rules():
+    # a: morning 1-4 (streak 4 > 3), then night 6 → morning 7 (0 h rest)
+    rows = [("a", d, "fast", "morning") for d in (1, 2, 3, 4, 7)] + [("a", 6, "fast", "night")]
+    res = audit_rota(_cfg(max_consec=3), _frame(rows))
+    assert _rules(res) == [("a", 4, "max consecutive days"), ("a", 7, "rest (prev→today)")]
+    assert res["detail"].tolist() == ["day 4 in a row", "0 h rest"]
+    assert audit_summary(res)["count"].tolist() == [1, 1]
+
+def test_hours_limits():
+    cfg = _cfg(max_hours_week=16, max_consec=7)
+    cfg.max_hours_map["a"] = 24
+    rows = [("a", d, "fast", "morning") for d in (1, 3, 5, 20)]
+    assert _rules(audit_rota(cfg, _frame(rows))) == [("a", 5, "7-day hours limit"), ("a", 20, "hour cap reached")]
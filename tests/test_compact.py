@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from rota.compact import CompactRota, index_dtype
+from rota.facility import Area, ShiftDef, Facility, DEFAULT_FACILITY
+
+def _wide_facility(n_areas: int) -> Facility:
+    areas = [Area(f"z{i}", f"Z{i:03d}") for i in range(n_areas)]
+    shifts = [ShiftDef("morning","1",7,15), ShiftDef("evening","2",15,23), ShiftDef("night","3",23,7)]
+    return Facility(areas, shifts, {"all": [a.key for a in areas]})
+
+def test_index_dtype_boundaries():
+    assert index_dtype(127) == np.int8
+    assert index_dtype(128) == np.int8   # indices 0..127 plus OFF
+    assert index_dtype(129) == np.int16
+    assert index_dtype(32768) == np.int16
+    assert index_dtype(32769) == np.int32
+
+def test_default_facility_stays_int8():
+    df = pd.DataFrame([("a", 1, "fast", "morning", "F1")], columns=["doctor","day","area","shift","code"])
+    assert CompactRota.from_frame(df, 3, ["a"], DEFAULT_FACILITY).codes.dtype == np.int8
+
+def test_codes_past_int8_do_not_wrap():
+    fac = _wide_facility(43)  # 129 codes
+    assert len(fac.codes) == 129
+    last = fac.codes[-1]; area, shift = fac.slot_of[last]
+    df = pd.DataFrame([("a", 1, area, shift, last), ("b", 2, *fac.slot_of[fac.codes[0]], fac.codes[0])],
+                      columns=["doctor","day","area","shift","code"])
+    cr = CompactRota.from_frame(df, 2, ["a", "b"], fac)
+    assert cr.codes.dtype == np.int16
+    assert cr.codes[0, 0] == 128 and cr.codes[1, 1] == 0 and cr.codes[0, 1] == -1
+    assert cr.sheet().loc[1, "a"] == last
+    assert cr.area_matrix()[0, 0] == fac.area_idx[area]
+    assert cr.by_shift()[1][last] == ["a"]
+    assert CompactRota.from_frame(df.iloc[:0], 2, ["a"], fac).codes.dtype == np.int16
@@ -0,0 +1,136 @@
+import pandas as pd
+import pytest
+
+from rota.engine import (RotaConfig, RotaState, EditBuffer, rules_ok, eligibility_matrix, greedy_pass, local_search, solve_optimal,
+                         repair, with_absences, CoverageStats, KEPT_CURRENT, ORTOOLS_AVAILABLE, COLUMNS)
+from rota.audit import audit_rota
+
+def _cfg(**kw) -> RotaConfig:
+    cfg = RotaConfig(year=2025, month=9, days=30, **kw)
+    cfg.add_doctor("a", "g3", 30, max_week=7)
+    return cfg
+
+def _state(cfg: RotaConfig, days) -> RotaState:
+    state = RotaState(cfg)
+    for d in days: state.assign("a", d, "fast", "morning")
+    return state
+
+def test_state_index_tracks_assign_and_unassign():
+    state = _state(_cfg(), [5, 6])
+    assert state.counts["a"] == 2 and state.hours["a"] == 16
+    assert state.shift_on("a", 5) == "morning" and state.shift_on("a", 7) is None
+    assert state.unassign("a", 5) == ("fast", "morning")
+    assert state.counts["a"] == 1 and state.hours["a"] == 8 and state.shift_on("a", 5) is None
+
+def test_streak_counts_the_run_after_the_day():
+    state = _state(_cfg(max_consec=3), [2, 3, 4])
+    assert rules_ok("a", 1, "morning", state) == (False, "max consecutive days")
+    assert rules_ok("a", 6, "morning", state) == (True, "ok")
+
+def test_streak_joining_two_runs():
+    state = _state(_cfg(max_consec=4), [1, 2, 4, 5])
+    assert rules_ok("a", 3, "morning", state) == (False, "max consecutive days")
+    state.unassign("a", 5)
+    assert rules_ok("a", 3, "morning", state) == (True, "ok")
+
+def test_greedy_leaves_no_violations():
+    cfg = RotaConfig.default(); elig = eligibility_matrix(cfg)
+    for seed in range(4):
+        assert audit_rota(cfg, greedy_pass(cfg, elig, seed).to_frame()).empty
+
+def test_local_search_adds_no_violations():
+    cfg = RotaConfig.default(); elig = eligibility_matrix(cfg)
+    for seed in range(3):
+        state = greedy_pass(cfg, elig, seed)
+        before = len(audit_rota(cfg, state.to_frame()))
+        state, stats = local_search(state, elig, budget_s=0.5, seed=seed)
+        assert len(audit_rota(cfg, state.to_frame())) <= before
+        assert stats["short_after"] <= stats["short_before"]
+
+@pytest.mark.skipif(not ORTOOLS_AVAILABLE, reason="needs OR-Tools")
+def test_solve_never_keeps_a_rule_breaking_warm_start():
+    cfg = RotaConfig(year=2025, month=9, days=10, max_consec=3, min_off=0)
+    cfg.cov = {k: 0 for k in cfg.cov}; cfg.cov[("fast", "morning")] = 1
+    cfg.add_doctor("a", "g3", 30, max_week=7)
+    # every day worked: full coverage, but a 10-day streak; the best legal rota is 2 short
+    current = pd.DataFrame([("a", d, "fast", "morning", "F1") for d in range(1, 11)], columns=COLUMNS)
+    status, df = solve_optimal(cfg, eligibility_matrix(cfg), current, time_limit=10, workers=1)
+    assert status != KEPT_CURRENT and len(df) == 8
+    assert audit_rota(cfg, df).empty
+
+def _frame(rows) -> pd.DataFrame:
+    code = {("fast", "morning"): "F1", ("fast", "evening"): "F2", ("acute", "night"): "A3"}
+    return pd.DataFrame([(n, d, a, s, code[(a, s)]) for n, d, a, s in rows], columns=COLUMNS)
+
+def test_edit_buffer_materialises_once():
+    base = _frame([("a", 1, "fast", "morning"), ("b", 1, "fast", "evening"), ("a", 2, "fast", "morning")])
+    edits = EditBuffer(base)
+    edits.remove("b", 1)
+    edits.add("c", 3, "acute", "night")
+    edits.add("d", 4, "fast", "morning"); edits.remove("d", 4)       # an add undone before materialising
+    edits.add("c", 5, "fast", "morning"); edits.add("c", 5, "acute", "night")  # the later add wins
+    out = edits.materialise()
+    assert list(zip(out["doctor"], out["day"], out["code"])) == [("a", 1, "F1"), ("a", 2, "F1"),
+                                                                 ("c", 3, "A3"), ("c", 5, "A3")]
+    assert len(base) == 3  # the base frame is left alone
+
+def test_edit_buffer_without_edits_returns_base():
+    base = _frame([("a", 1, "fast", "morning")])
+    assert EditBuffer(base).materialise() is base
+
+def test_carry_answers_for_days_before_the_month():
+    # October 2025 starts on a Wednesday: carried Mon 29 and Tue 30 Sep share ISO week 40 with day 1
+    cfg = RotaConfig(year=2025, month=10, days=31)
+    cfg.add_doctor("a", "g3", 30, max_week=3)
+    carry = {"a": [None, None, None, None, None, "morning", "night"]}
+    state = RotaState(cfg, carry=carry)
+    assert state.shift_on("a", 0) == "night" and state.shift_on("a", -1) == "morning"
+    assert state.shift_on("a", -6) is None and state.shift_on("a", -7) is None
+    assert state.week_count("a", 1) == 2
+    assert rules_ok("a", 1, "morning", state) == (False, "rest (prev→today)")
+    state.assign("a", 2, "fast", "morning")
+    assert rules_ok("a", 3, "morning", state) == (False, "weekly limit")
+
+def test_carry_streak_and_tail():
+    cfg = RotaConfig(year=2025, month=9, days=30, max_consec=3)
+    cfg.add_doctor("a", "g3", 30, max_week=7)
+    state = RotaState(cfg, carry={"a": [None, None, None, None, "morning", "morning", "morning"]})
+    assert rules_ok("a", 1, "morning", state) == (False, "max consecutive days")
+    assert rules_ok("a", 2, "morning", state) == (True, "ok")
+    for d in (28, 30): state.assign("a", d, "fast", "evening")
+    assert state.tail(3) == {"a": ["evening", None, "evening"]}
+
+def test_hours7_rolling_window():
+    cfg = _cfg(max_hours_week=24, max_consec=7)
+    state = _state(cfg, [1, 3, 9])                          # 8 h each
+    assert state.hours7["a"][1:11] == [8, 8, 16, 16, 16, 16, 16, 8, 16, 8]
+    assert state.peak_hours7("a", 5) == 16                  # windows ending on days 5..11
+    state.assign("a", 5, "fast", "morning")
+    assert rules_ok("a", 7, "morning", state) == (False, "7-day hours limit")
+    assert rules_ok("a", 11, "morning", state) == (True, "ok")
+    state.unassign("a", 5)
+    assert state.hours7["a"][5:12] == [16, 16, 16, 8, 16, 8, 8]
+
+def test_hours7_counts_carried_days_and_monthly_cap():
+    cfg = RotaConfig(year=2025, month=9, days=30, max_hours_week=16)
+    cfg.add_doctor("a", "g3", 30, max_week=7, max_hours=16)
+    state = RotaState(cfg, carry={"a": [None, None, None, None, None, "morning", None]})
+    assert state.hours7["a"][1:7] == [8, 8, 8, 8, 8, 0]  # day -1 sits in the windows ending on days 1..5
+    state.assign("a", 3, "fast", "morning")
+    assert rules_ok("a", 5, "morning", state) == (False, "7-day hours limit")
+    state.assign("a", 12, "fast", "morning")
+    assert rules_ok("a", 25, "morning", state) == (False, "hour cap reached")
+
+def test_repair_pins_cells_outside_the_absence():
+    cfg = RotaConfig.default(); elig = eligibility_matrix(cfg)
+    df = greedy_pass(cfg, elig, 3).to_frame()
+    doc = df["doctor"].iloc[0]
+    off = set(df.loc[df["doctor"] == doc, "day"].astype(int).tolist()[:2])
+    new, diff = repair(cfg, df, {doc: off}, elig, radius=2)
+    touched = {t for d in off for t in range(d-2, d+3)}
+    assert set(diff["day"]) <= touched
+    assert not ((new["doctor"] == doc) & new["day"].isin(off)).any()
+    keep = lambda f: f[~f["day"].isin(touched)].sort_values(["day", "doctor"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(keep(new), keep(df))
+    assert audit_rota(with_absences(cfg, {doc: off}), new).empty
+    assert CoverageStats(new, cfg.days, cfg.cov).total_short <= CoverageStats(df, cfg.days, cfg.cov).total_short + len(off)
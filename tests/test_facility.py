@@ -0,0 +1,16 @@
+import numpy as np
+
+from rota.facility import Area, ShiftDef, Facility, DEFAULT_FACILITY
+
+def test_rest_default_shifts():
+    # morning 07-15, evening 15-23, night 23-07; rows = previous day's shift
+    assert DEFAULT_FACILITY.shifts == ["morning", "evening", "night"]
+    np.testing.assert_array_equal(DEFAULT_FACILITY.rest, [[16, 24, 32],
+                                                          [ 8, 16, 24],
+                                                          [ 0,  8, 16]])
+
+def test_rest_twelve_hour_pattern():
+    fac = Facility([Area("main", "M")], [ShiftDef("day", "1", 7, 19), ShiftDef("night", "2", 19, 7)],
+                   {"all": ["main"]})
+    np.testing.assert_array_equal(fac.rest, [[12, 24],
+                                             [ 0, 12]])
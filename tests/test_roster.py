@@ -0,0 +1,46 @@
+from rota.engine import RotaConfig, DEFAULT_MAX_WEEK
+from rota.roster import import_roster, roster_frame
+
+CSV = """Doctor,Group,Cap,Shifts,Off Days,Max Nights,Avoid Holiday,Hours Cap
+Dr. A,g4,12,m;n,3;17,2,yes,120
+Dr. B,,,,,,,
+Dr. C,g9,10,,,,,
+Dr. D,g3,40,,,,,
+Dr. E,g3,,x,,,,
+Dr. F,g3,,,1;2;3;4,,,
+Dr. A,g3,10,,,,,
+,g3,10,,,,,
+""".encode()
+
+def _cfg() -> RotaConfig:
+    cfg = RotaConfig(year=2025, month=9, days=30)
+    cfg.add_doctor("Dr. B", "g1", 5); cfg.add_doctor("Dr. Old", "g2", 18)
+    return cfg
+
+def test_import_adds_updates_and_rejects():
+    cfg = _cfg()
+    rep = import_roster(cfg, CSV, "roster.csv", group_caps={"g3": 11})
+    assert (rep["added"], rep["updated"], rep["removed"]) == (1, 1, 0)
+    assert cfg.doctors == ["Dr. B", "Dr. Old", "Dr. A"]
+    assert (cfg.group_map["Dr. A"], cfg.cap_map["Dr. A"]) == ("g4", 12)
+    assert cfg.allowed_shifts["Dr. A"] == {"morning", "night"} and cfg.offdays["Dr. A"] == {3, 17}
+    assert (cfg.max_night_map["Dr. A"], cfg.max_week_map["Dr. A"]) == (2, DEFAULT_MAX_WEEK)
+    assert cfg.avoid_holidays_map["Dr. A"] and cfg.max_hours_map["Dr. A"] == 120
+    # a row with only a name resets the doctor to a new doctor's defaults (group g3, its group cap)
+    assert (cfg.group_map["Dr. B"], cfg.cap_map["Dr. B"]) == ("g3", 11)
+    rej = rep["rejected"]
+    assert rej["line"].tolist() == [4, 5, 6, 7, 8, 9]
+    assert [r.split(" ")[0] for r in rej["reason"]] == ["unknown", "cap:", "unknown", "4", "duplicate", "missing"]
+
+def test_replace_drops_doctors_missing_from_the_file():
+    cfg = _cfg()
+    rep = import_roster(cfg, CSV, "roster.csv", replace=True)
+    assert rep["removed"] == 1 and cfg.doctors == ["Dr. B", "Dr. A"]
+    assert "Dr. Old" not in cfg.cap_map and "Dr. Old" not in cfg.allowed_shifts
+
+def test_roster_frame_round_trip():
+    cfg = _cfg(); import_roster(cfg, CSV, "roster.csv")
+    data = roster_frame(cfg).to_csv(index=False).encode()
+    again = RotaConfig(year=2025, month=9, days=30)
+    rep = import_roster(again, data, "roster.csv")
+    assert rep["rejected"].empty and again.to_dict()["doctors"] == cfg.to_dict()["doctors"]
@@ -0,0 +1,67 @@
+import threading, time
+
+import pandas as pd
+
+from rota.engine import RotaConfig, eligibility_matrix, greedy_pass
+from rota.facility import Area, ShiftDef, Facility
+from rota.store import RotaStore
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(["day", "doctor"]).reset_index(drop=True)
+
+def _cfg() -> RotaConfig:
+    cfg = RotaConfig.default()
+    cfg.year, cfg.month, cfg.days = 2025, 10, 31
+    cfg.add_doctor("Dr. New", "g4", 12, ["morning", "night"], [3, 17], 2, 4, True, 120)
+    cfg.holidays = {5, 6}; cfg.min_rest = 12; cfg.max_hours_week = 60
+    cfg.cov[("fast", "night")] = 1
+    return cfg
+
+def test_save_load_round_trip(tmp_path):
+    store = RotaStore(str(tmp_path / "rota.sqlite"))
+    cfg = _cfg(); df = greedy_pass(cfg, eligibility_matrix(cfg), 1).to_frame()
+    store.save("draft", cfg, df)
+    cfg2, df2 = store.load(2025, 10, "draft")
+    assert cfg2.to_dict() == cfg.to_dict()
+    pd.testing.assert_frame_equal(_sorted(df2), _sorted(df), check_dtype=False)
+    first = store.load_days(store.versions(2025, 10)["id"].iloc[0], 3, 4)
+    assert set(first["day"]) == {3, 4} and len(first) == int(df["day"].isin([3, 4]).sum())
+
+def test_overwrite_delete_and_newest(tmp_path):
+    store = RotaStore(str(tmp_path / "rota.sqlite"))
+    cfg = _cfg(); df = greedy_pass(cfg, eligibility_matrix(cfg), 1).to_frame()
+    store.save("a", cfg, df); time.sleep(0.01)
+    store.save("b", cfg, df.iloc[:10]); time.sleep(0.01)
+    store.save("a", cfg, df.iloc[:5])                       # same name: replaced, now the newest
+    assert store.names(2025, 10) == ["a", "b"]
+    assert len(store.load(2025, 10)[1]) == 5
+    store.delete(2025, 10, "a")
+    assert store.names(2025, 10) == ["b"] and store.load(2025, 10, "a") is None
+    assert store.load(2025, 11) is None and len(store.load()[1]) == 10
+
+def test_custom_facility_round_trip(tmp_path):
+    store = RotaStore(str(tmp_path / "rota.sqlite"))
+    fac = Facility([Area("main", "M")], [ShiftDef("day", "1", 7, 19), ShiftDef("night", "2", 19, 7)],
+                   {"all": ["main"]})
+    cfg = RotaConfig(year=2025, month=9, days=30, facility=fac, cov={("main", "day"): 1, ("main", "night"): 1})
+    for n in ("x", "y", "z"): cfg.add_doctor(n, "all", 15, max_week=7)
+    df = greedy_pass(cfg, eligibility_matrix(cfg), 2).to_frame()
+    store.save("12h", cfg, df)
+    cfg2, df2 = store.load(2025, 9, "12h")
+    assert cfg2.facility == fac and cfg2.to_dict() == cfg.to_dict()
+    assert sorted(df2["code"].unique()) == sorted(df["code"].unique())
+
+def test_shared_store_across_threads(tmp_path):
+    store = RotaStore(str(tmp_path / "rota.sqlite"))
+    cfg = _cfg(); df = greedy_pass(cfg, eligibility_matrix(cfg), 1).to_frame()
+    errors = []
+    def work(k):
+        try:
+            for j in range(5):
+                store.save(f"v{k}-{j % 2}", cfg, df); store.load(2025, 10); store.names(2025, 10)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=work, args=(k,)) for k in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert errors == [] and len(store.names(2025, 10)) == 8